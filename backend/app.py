@@ -3,63 +3,172 @@ AgriSmart 2.0 - AI-Powered Farmer Assistant Platform
 Main Flask Application
 """
 
-from flask import Flask, request, jsonify
+from flask import Blueprint, Flask, current_app, request, jsonify, Response
 from flask_cors import CORS
 from flask_socketio import SocketIO, emit, join_room, leave_room
-from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
+from flask_jwt_extended import JWTManager, create_access_token, decode_token, jwt_required, get_jwt_identity
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
 from datetime import datetime, timedelta
 import sqlite3
 import os
 import json
-import requests
 from functools import wraps
 import secrets
-import os
 import base64
+import threading
 from dotenv import load_dotenv
-import openai
+import archive
+import counters
+import http_cache
+import metrics
+import notifications
+import outbreaks
+import profiler
+import retrieval
+import schemes
+import serialization
+import sync
+import translation
 
-# Load .env file from root directory
-load_dotenv()  # Automatically loads .env from current working directory
+# Importing this module must stay cheap and side-effect free: it runs on
+# every serverless cold start and in every forked worker. Heavy SDKs
+# (openai, requests, numpy via irrigation/replan) are imported inside the
+# handlers that use them, configuration happens in create_app(), and the
+# schema is created by `flask init-db`, by `python app.py` at startup, or
+# once per process on first request when AUTO_INIT_DB=1 (off by default so
+# WSGI and serverless cold starts never run the full schema setup).
 
-# Set OpenAI API key
-openai.api_key = os.getenv("OPENAI_API_KEY")
+OPENWEATHER_URL = 'https://api.openweathermap.org/data/2.5'
 
-# DEBUG: Print whether keys are loaded
-print("✅ ELEVENLABS_API_KEY loaded:", os.getenv("ELEVENLABS_API_KEY") is not None)
-print("✅ OPENAI_API_KEY loaded:", os.getenv("OPENAI_API_KEY") is not None)
-print("📁 Current working directory:", os.getcwd())
+api = Blueprint('api', __name__, cli_group=None)
+socketio = SocketIO()
+jwt = JWTManager()
 
-# Initialize Flask app
-app = Flask(__name__)
-app.config['SECRET_KEY'] = secrets.token_hex(32)
-app.config['JWT_SECRET_KEY'] = secrets.token_hex(32)
-app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(days=7)
-app.config['UPLOAD_FOLDER'] = 'uploads'
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+def create_app(config=None):
+    """Application factory"""
+    load_dotenv()  # Automatically loads .env from current working directory
+    
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = os.getenv('SECRET_KEY') or secrets.token_hex(32)
+    app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY') or secrets.token_hex(32)
+    app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(days=7)
+    app.config['UPLOAD_FOLDER'] = os.getenv('UPLOAD_FOLDER', 'uploads')
+    app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+    app.config['AUTO_INIT_DB'] = os.getenv('AUTO_INIT_DB', '0') == '1'
+    if config:
+        app.config.update(config)
+    
+    # Initialize extensions
+    CORS(app, resources={r"/*": {"origins": "*"}})
+    # A message queue (e.g. redis://) lets CLI jobs and other workers emit to clients
+    socketio.init_app(app, cors_allowed_origins="*", message_queue=os.getenv('SOCKETIO_MESSAGE_QUEUE'),
+                      async_mode=os.getenv('SOCKETIO_ASYNC_MODE') or None)
+    jwt.init_app(app)
+    metrics.init_app(app)
+    serialization.init_app(app)
+    app.register_blueprint(api)
+    
+    # Production profiling: the slow-query log is on by default, the sampling
+    # profiler only when asked for (here or via /api/debug/profiler)
+    profiler.slow_query_log.install(
+        threshold_ms=float(os.getenv('SLOW_QUERY_MS', 200)),
+        explain_rate=float(os.getenv('SLOW_QUERY_EXPLAIN_RATE', 0.2))
+    )
+    # View/like counters are flushed from memory every few seconds per worker
+    counters.accumulator.interval = float(os.getenv('COUNTER_FLUSH_SECONDS', counters.FLUSH_SECONDS))
+    translation.translation_queue.configure(os.getenv('TRANSLATOR') or None)
+    archive.ARCHIVE_DIR = os.getenv('ARCHIVE_DIR', archive.ARCHIVE_DIR)
+    
+    if os.getenv('PROFILER_ENABLED') == '1':
+        profiler.profiler.start(interval=float(os.getenv('PROFILER_INTERVAL_MS', 20)) / 1000)
+    
+    if app.config['AUTO_INIT_DB']:
+        app.before_request(_ensure_schema)
+    
+    return app
 
-# Initialize extensions
-CORS(app, resources={r"/*": {"origins": "*"}})
-socketio = SocketIO(app, cors_allowed_origins="*")
-jwt = JWTManager(app)
+_schema_lock = threading.Lock()
+_schema_ready = False
 
-# Create upload folders
-os.makedirs('uploads/crops', exist_ok=True)
-os.makedirs('uploads/products', exist_ok=True)
-os.makedirs('uploads/profiles', exist_ok=True)
+def _ensure_schema():
+    """Create the schema once per process, on the first request"""
+    global _schema_ready
+    if _schema_ready:
+        return
+    with _schema_lock:
+        if not _schema_ready:
+            init_db()
+            _schema_ready = True
 
 # Database connection helper
 def get_db():
-    conn = sqlite3.connect('agrismart.db')
+    # Not shared between requests, but under gevent its calls may run on
+    # different pool threads (see metrics.offload)
+    conn = sqlite3.connect('agrismart.db', factory=metrics.InstrumentedConnection, check_same_thread=False)
     conn.row_factory = sqlite3.Row
     return conn
 
+# Tables whose writes bump a row in table_versions (via triggers), so caches
+# in any worker can cheaply detect changes. Only user columns that cached
+# responses join on count; registrations and logins don't invalidate anything.
+# View and like counts are flushed by counters.py without a version bump, so
+# the endpoints showing them re-render on a ttl instead.
+VERSIONED_TABLES = {
+    'government_schemes': ('INSERT', 'UPDATE', 'DELETE'),
+    'farming_tips': ('INSERT', 'UPDATE OF title, category, content, author_id, tags, language, image, video_url',
+                     'DELETE'),
+    'products': ('INSERT', 'UPDATE', 'DELETE'),
+    'forum_posts': ('INSERT', 'UPDATE OF user_id, title, content, category, tags, is_pinned', 'DELETE'),
+    'forum_comments': ('INSERT', 'DELETE'),
+    'users': ('UPDATE OF name, role, profile_image', 'DELETE'),
+    'outbreak_cells': ('INSERT', 'UPDATE', 'DELETE'),
+    'translations': ('INSERT',),
+}
+
+def get_table_version(cursor, table):
+    cursor.execute('SELECT version FROM table_versions WHERE name = ?', (table,))
+    row = cursor.fetchone()
+    return row['version'] if row else 0
+
+def get_table_versions(tables):
+    """Current version counters for several tables, in the order given"""
+    conn = get_db()
+    rows = conn.execute(
+        f'SELECT name, version FROM table_versions WHERE name IN ({",".join("?" * len(tables))})', tables
+    ).fetchall()
+    conn.close()
+    versions = {row['name']: row['version'] for row in rows}
+    return tuple(versions.get(table, 0) for table in tables)
+
+http_cache.cache.versions = get_table_versions
+counters.accumulator.connect = get_db
+translation.translation_queue.connect = get_db
+retrieval.index.connect = get_db
+retrieval.index.versions = get_table_versions
+
+def admin_required(fn):
+    """Restrict an endpoint to users with the admin role"""
+    @wraps(fn)
+    @jwt_required()
+    def wrapper(*args, **kwargs):
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute('SELECT role FROM users WHERE id = ?', (get_jwt_identity(),))
+        user = cursor.fetchone()
+        conn.close()
+        if not user or user['role'] != 'admin':
+            return jsonify({'error': 'Admin access required'}), 403
+        return fn(*args, **kwargs)
+    return wrapper
+
 # Initialize database
 def init_db():
     conn = get_db()
     cursor = conn.cursor()
+    # Lets archival hand freed pages back; only takes effect on a new database
+    # file (archive.compact converts existing ones)
+    cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
     
     # Users table
     cursor.execute('''
@@ -257,11 +366,44 @@ def init_db():
         )
     ''')
     
+    # Indexes
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_reviews_product ON reviews(product_id, id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_irrigation_plans_user ON irrigation_plans(user_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_forum_comments_post ON forum_comments(post_id)')
+    notifications.init_tables(cursor)
+    outbreaks.init_tables(cursor)
+    counters.init_tables(cursor)
+    translation.init_tables(cursor)
+    sync.init_tables(cursor)
+    archive.init_tables(cursor)
+    
+    # Table version counters
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS table_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER DEFAULT 0
+        )
+    ''')
+    for table, ops in VERSIONED_TABLES.items():
+        cursor.execute('INSERT OR IGNORE INTO table_versions (name, version) VALUES (?, 0)', (table,))
+        for op in ops:
+            name = f'{table}_{op.split()[0].lower()}_version'
+            sql = (f"CREATE TRIGGER {name} AFTER {op} ON {table} "
+                   f"BEGIN UPDATE table_versions SET version = version + 1 WHERE name = '{table}'; END")
+            # Recreate triggers whose definition changed (e.g. narrowed to
+            # content columns) in databases created by an older version
+            cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = ?", (name,))
+            existing = cursor.fetchone()
+            if existing and existing[0] != sql:
+                cursor.execute(f'DROP TRIGGER {name}')
+            if not existing or existing[0] != sql:
+                cursor.execute(sql)
+    
     conn.commit()
     conn.close()
 
 # Authentication endpoints
-@app.route('/api/auth/register', methods=['POST'])
+@api.route('/api/auth/register', methods=['POST'])
 def register():
     data = request.json
     
@@ -314,7 +456,7 @@ def register():
         }
     }), 201
 
-@app.route('/api/auth/login', methods=['POST'])
+@api.route('/api/auth/login', methods=['POST'])
 def login():
     data = request.json
     
@@ -347,7 +489,7 @@ def login():
         }
     }), 200
 
-@app.route('/api/auth/google', methods=['POST'])
+@api.route('/api/auth/google', methods=['POST'])
 def google_auth():
     """Google OAuth authentication"""
     data = request.json
@@ -387,7 +529,7 @@ def google_auth():
     }), 200
 
 # User profile endpoints
-@app.route('/api/user/profile', methods=['GET'])
+@api.route('/api/user/profile', methods=['GET'])
 @jwt_required()
 def get_profile():
     user_id = get_jwt_identity()
@@ -414,22 +556,30 @@ def get_profile():
     }), 200
 
 # Weather API
-@app.route('/api/weather', methods=['GET'])
+@api.route('/api/weather', methods=['GET'])
 @jwt_required()
 def get_weather():
+    import requests
     location = request.args.get('location', 'Delhi')
     
     # Using OpenWeatherMap API (you'll need to add your API key)
     API_KEY = os.environ.get('OPENWEATHER_API_KEY', 'demo_key')
+    base_url = os.environ.get('OPENWEATHER_URL', OPENWEATHER_URL)
     
     try:
         # Current weather
-        current_url = f'https://api.openweathermap.org/data/2.5/weather?q={location}&appid={API_KEY}&units=metric'
-        current_response = requests.get(current_url, timeout=5)
+        current_url = f'{base_url}/weather?q={location}&appid={API_KEY}&units=metric'
+        with metrics.upstream('openweather') as call:
+            current_response = requests.get(current_url, timeout=5)
+            if current_response.status_code != 200:
+                call.outcome = f'http_{current_response.status_code}'
         
         # 7-day forecast
-        forecast_url = f'https://api.openweathermap.org/data/2.5/forecast?q={location}&appid={API_KEY}&units=metric'
-        forecast_response = requests.get(forecast_url, timeout=5)
+        forecast_url = f'{base_url}/forecast?q={location}&appid={API_KEY}&units=metric'
+        with metrics.upstream('openweather') as call:
+            forecast_response = requests.get(forecast_url, timeout=5)
+            if forecast_response.status_code != 200:
+                call.outcome = f'http_{forecast_response.status_code}'
         
         return jsonify({
             'current': current_response.json() if current_response.status_code == 200 else {},
@@ -437,6 +587,7 @@ def get_weather():
         }), 200
     except Exception as e:
         # Return mock data if API fails
+        metrics.fallback('openweather')
         return jsonify({
             'current': {
                 'temp': 28,
@@ -449,7 +600,7 @@ def get_weather():
         }), 200
 
 # Crop disease detection endpoint
-@app.route('/api/disease/detect', methods=['POST'])
+@api.route('/api/disease/detect', methods=['POST'])
 @jwt_required()
 def detect_disease():
     user_id = get_jwt_identity()
@@ -463,7 +614,9 @@ def detect_disease():
     
     # Save image
     filename = secure_filename(f"{user_id}_{datetime.now().timestamp()}_{file.filename}")
-    filepath = os.path.join(app.config['UPLOAD_FOLDER'], 'crops', filename)
+    upload_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], 'crops')
+    os.makedirs(upload_dir, exist_ok=True)
+    filepath = os.path.join(upload_dir, filename)
     file.save(filepath)
     
     # Mock AI detection (replace with actual TensorFlow model)
@@ -476,14 +629,16 @@ def detect_disease():
     
     import random
     detected = random.choice(mock_diseases)
+    crop = request.form.get('crop', '')
     
-    # Save to database
+    # Save to database, counting it towards the regional outbreak heatmap
     conn = get_db()
     cursor = conn.cursor()
     cursor.execute('''
-        INSERT INTO disease_detections (user_id, disease_name, confidence, image, treatment, preventive_measures)
-        VALUES (?, ?, ?, ?, ?, ?)
-    ''', (user_id, detected['name'], detected['confidence'], filename, detected['treatment'], detected['prevention']))
+        INSERT INTO disease_detections (user_id, crop_name, disease_name, confidence, image, treatment, preventive_measures)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', (user_id, crop, detected['name'], detected['confidence'], filename, detected['treatment'], detected['prevention']))
+    outbreaks.record(cursor, user_id, crop, detected['name'])
     conn.commit()
     detection_id = cursor.lastrowid
     conn.close()
@@ -497,8 +652,74 @@ def detect_disease():
         'image': filename
     }), 200
 
+@api.route('/api/disease/outbreaks', methods=['GET'])
+@http_cache.cached(('outbreak_cells',), args={'days': '14', 'precision': '4', 'disease': '', 'crop': '', 'state': ''},
+                   max_age=300)
+def get_disease_outbreaks():
+    """Heatmap of detections per geohash cell and disease over the last ?days="""
+    days = request.args.get('days', 14, type=int)
+    precision = request.args.get('precision', 4, type=int)
+    state = request.args.get('state', '')
+    
+    if not 1 <= days <= outbreaks.MAX_WINDOW_DAYS:
+        return jsonify({'error': f'days must be between 1 and {outbreaks.MAX_WINDOW_DAYS}'}), 400
+    if not 2 <= precision <= outbreaks.PRECISION:
+        return jsonify({'error': f'precision must be between 2 and {outbreaks.PRECISION}'}), 400
+    if state:
+        state = schemes.state_from_location(state)
+        if not state:
+            return jsonify({'error': 'Unknown state'}), 400
+    
+    conn = get_db()
+    cells = outbreaks.heatmap(conn.cursor(), days, precision, request.args.get('disease'),
+                              request.args.get('crop'), state)
+    conn.close()
+    
+    return jsonify({'days': days, 'precision': precision, 'cells': cells}), 200
+
+@api.route('/api/disease/history', methods=['GET'])
+@jwt_required()
+def get_disease_history():
+    return _history_response('disease_detections', get_jwt_identity())
+
+# History reads (recent rows from the hot tables, older ones from archive/)
+def _history_response(table, key_value):
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+    before = request.args.get('before', type=int)
+    
+    conn = get_db()
+    items = archive.history(conn, table, key_value, limit, before)
+    conn.close()
+    
+    return jsonify({'items': items, 'next_before': items[-1]['id'] if len(items) == limit else None}), 200
+
+@api.cli.command('archive-history')
+def archive_history_command():
+    """Move chat, AI chat and detection history past its retention into archive/ (run daily)"""
+    conn = get_db()
+    moved, mode = archive.run(conn)
+    conn.close()
+    print(f"✅ Archived {sum(moved.values())} rows {moved}" + (f", {mode} done" if mode else ''))
+
+@api.cli.command('rebuild-outbreaks')
+def rebuild_outbreaks_command():
+    """Backfill outbreak aggregates from all recent disease detections"""
+    conn = get_db()
+    result = outbreaks.rebuild(conn)
+    conn.close()
+    print(json.dumps(result, indent=2))
+
+@api.cli.command('prune-outbreaks')
+def prune_outbreaks_command():
+    """Drop outbreak buckets older than the retention window (run daily)"""
+    conn = get_db()
+    pruned = outbreaks.prune(conn)
+    conn.close()
+    print(f"✅ Pruned {pruned} outbreak buckets")
+
 # Marketplace endpoints
-@app.route('/api/products', methods=['GET'])
+@api.route('/api/products', methods=['GET'])
+@http_cache.cached(('products', 'users'), args={'category': '', 'search': ''}, max_age=60)
 def get_products():
     category = request.args.get('category', '')
     search = request.args.get('search', '')
@@ -519,13 +740,9 @@ def get_products():
     
     query += ' ORDER BY p.created_at DESC LIMIT 50'
     
-    cursor.execute(query, params)
-    products = [dict(row) for row in cursor.fetchall()]
-    conn.close()
-    
-    return jsonify(products), 200
+    return serialization.rows_response(conn, cursor, query, params)
 
-@app.route('/api/products', methods=['POST'])
+@api.route('/api/products', methods=['POST'])
 @jwt_required()
 def create_product():
     user_id = get_jwt_identity()
@@ -553,11 +770,173 @@ def create_product():
     
     return jsonify({'id': product_id, 'message': 'Product created successfully'}), 201
 
+# Product reviews endpoints
+@api.route('/api/products/<int:product_id>/reviews', methods=['GET'])
+def get_reviews(product_id):
+    """Keyset-paginated reviews, newest first. Pass next_cursor back as ?before="""
+    before = request.args.get('before', type=int)
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+    
+    conn = get_db()
+    cursor = conn.cursor()
+    
+    query = '''
+        SELECT r.*, u.name as user_name
+        FROM reviews r
+        JOIN users u ON r.user_id = u.id
+        WHERE r.product_id = ?
+    '''
+    params = [product_id]
+    
+    if before:
+        query += ' AND r.id < ?'
+        params.append(before)
+    
+    # Fetch one extra row to know whether another page exists
+    query += ' ORDER BY r.id DESC LIMIT ?'
+    params.append(limit + 1)
+    
+    cursor.execute(query, params)
+    reviews = [dict(row) for row in cursor.fetchall()]
+    conn.close()
+    
+    next_cursor = None
+    if len(reviews) > limit:
+        reviews = reviews[:limit]
+        next_cursor = reviews[-1]['id']
+    
+    return jsonify({'reviews': reviews, 'next_cursor': next_cursor}), 200
+
+@api.route('/api/products/<int:product_id>/reviews', methods=['POST'])
+@jwt_required()
+def create_review(product_id):
+    user_id = get_jwt_identity()
+    data = request.json
+    
+    try:
+        rating = int(data.get('rating'))
+    except (TypeError, ValueError):
+        rating = 0
+    if rating < 1 or rating > 5:
+        return jsonify({'error': 'Rating must be between 1 and 5'}), 400
+    
+    conn = get_db()
+    cursor = conn.cursor()
+    
+    cursor.execute('SELECT id FROM products WHERE id = ?', (product_id,))
+    if not cursor.fetchone():
+        conn.close()
+        return jsonify({'error': 'Product not found'}), 404
+    
+    cursor.execute('''
+        INSERT INTO reviews (product_id, user_id, rating, comment)
+        VALUES (?, ?, ?, ?)
+    ''', (product_id, user_id, rating, data.get('comment', '')))
+    review_id = cursor.lastrowid
+    
+    # Fold the new rating into the running average in the same transaction,
+    # so rating a product costs the same regardless of how many reviews it has
+    cursor.execute('''
+        UPDATE products
+        SET rating = (rating * reviews_count + ?) / (reviews_count + 1),
+            reviews_count = reviews_count + 1
+        WHERE id = ?
+    ''', (rating, product_id))
+    
+    cursor.execute('SELECT rating, reviews_count FROM products WHERE id = ?', (product_id,))
+    product = cursor.fetchone()
+    conn.commit()
+    conn.close()
+    
+    return jsonify({
+        'id': review_id,
+        'message': 'Review added successfully',
+        'rating': product['rating'],
+        'reviews_count': product['reviews_count']
+    }), 201
+
+def repair_product_ratings(conn):
+    """Recompute rating/reviews_count from the reviews table, fixing drifted rows"""
+    cursor = conn.cursor()
+    cursor.execute('SELECT product_id, AVG(rating) as rating, COUNT(*) as count FROM reviews GROUP BY product_id')
+    actual = {row['product_id']: (row['rating'], row['count']) for row in cursor.fetchall()}
+    
+    cursor.execute('SELECT id, rating, reviews_count FROM products')
+    fixes = []
+    for row in cursor.fetchall():
+        rating, count = actual.get(row['id'], (0, 0))
+        if row['reviews_count'] != count or abs((row['rating'] or 0) - rating) > 1e-9:
+            fixes.append((rating, count, row['id']))
+    
+    cursor.executemany('UPDATE products SET rating = ?, reviews_count = ? WHERE id = ?', fixes)
+    conn.commit()
+    return len(fixes)
+
+@api.cli.command('repair-ratings')
+def repair_ratings_command():
+    """Rebuild product rating aggregates from the reviews table"""
+    conn = get_db()
+    fixed = repair_product_ratings(conn)
+    conn.close()
+    print(f"✅ Repaired ratings for {fixed} products")
+
+# Translated content (see translation.py). Lists are served from translation
+# memory only; anything not translated yet is queued, never waited on.
+TRANSLATION_WINDOW = 200
+
+def _localized_rows(cursor, query, params, table, language):
+    """Column names and dict rows of ``query``, with text swapped for cached translations"""
+    cursor.execute(query, params)
+    names = [column[0] for column in cursor.description] + ['translated']
+    rows = translation.localize(cursor, [dict(row) for row in cursor.fetchall()],
+                                translation.CONTENT[table], language)
+    return names, rows
+
+def _localized_response(conn, cursor, query, params, table, language):
+    if not language:
+        return serialization.rows_response(conn, cursor, query, params)
+    names, rows = _localized_rows(cursor, query, params, table, language)
+    conn.close()
+    return serialization.list_response(names, [tuple(row[name] for name in names) for row in rows])
+
+# Delta sync for offline-first clients (see sync.py)
+@api.route('/api/sync', methods=['GET'])
+def get_sync():
+    """Tips, schemes, products and forum posts changed since ``since``"""
+    since = request.args.get('since', 0, type=int)
+    domains = [d.strip() for d in request.args.get('domains', '').split(',') if d.strip()]
+    
+    if since < 0:
+        return jsonify({'error': 'since must be a sequence number'}), 400
+    unknown = [domain for domain in domains if domain not in sync.DOMAINS]
+    if unknown:
+        return jsonify({'error': f"Unknown domains: {', '.join(unknown)}"}), 400
+    
+    conn = get_db()
+    payload = sync.changes(conn.cursor(), since, domains or None)
+    conn.close()
+    
+    return Response(serialization.dumps(payload), mimetype='application/json')
+
+@api.cli.command('prune-sync-log')
+def prune_sync_log_command():
+    """Drop sync tombstones older than the retention window"""
+    conn = get_db()
+    removed = sync.prune_tombstones(conn)
+    conn.close()
+    print(f"✅ Pruned {removed} sync tombstones")
+
 # Farming tips endpoints
-@app.route('/api/tips', methods=['GET'])
+@api.route('/api/tips', methods=['GET'])
+@http_cache.cached(('farming_tips', 'users', 'translations'), args={'category': '', 'language': 'en'}, max_age=300,
+                   ttl=300)
 def get_tips():
+    """Newest tips in ``language``: those written in it plus, among the
+    newest TRANSLATION_WINDOW others, the ones already translated"""
     category = request.args.get('category', '')
     language = request.args.get('language', 'en')
+    if language and language not in translation.LANGUAGES:
+        return jsonify({'error': f"language must be one of: {', '.join(translation.LANGUAGES)}"}), 400
     
     conn = get_db()
     cursor = conn.cursor()
@@ -569,23 +948,94 @@ def get_tips():
         query += ' AND t.category = ?'
         params.append(category)
     
-    if language:
-        query += ' AND t.language = ?'
-        params.append(language)
+    if not language:
+        query += ' ORDER BY t.created_at DESC LIMIT 30'
+        return serialization.rows_response(conn, cursor, query, params)
     
-    query += ' ORDER BY t.created_at DESC LIMIT 30'
+    names, native = _localized_rows(cursor, query + ' AND t.language = ? ORDER BY t.created_at DESC LIMIT 30',
+                                    params + [language], 'farming_tips', language)
+    _, others = _localized_rows(cursor, query + ' AND t.language != ? ORDER BY t.created_at DESC LIMIT ?',
+                                params + [language, TRANSLATION_WINDOW], 'farming_tips', language)
+    conn.close()
     
-    cursor.execute(query, params)
-    tips = [dict(row) for row in cursor.fetchall()]
+    tips = native + [tip for tip in others if tip['translated']]
+    tips.sort(key=lambda tip: tip['created_at'], reverse=True)
+    return serialization.list_response(names, [tuple(tip[name] for name in names) for tip in tips[:30]])
+
+# View/like counters (coalesced in memory, see counters.py)
+def _record_view(kind, item_id):
+    conn = get_db()
+    exists = conn.execute(f'SELECT 1 FROM {counters.KINDS[kind]} WHERE id = ?', (item_id,)).fetchone()
+    conn.close()
+    
+    if not exists:
+        return jsonify({'error': 'Not found'}), 404
+    
+    counters.accumulator.view(kind, item_id)
+    return jsonify({'message': 'View recorded'}), 202
+
+def _set_like(kind, item_id, liked):
+    user_id = int(get_jwt_identity())
+    
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute(f'SELECT likes FROM {counters.KINDS[kind]} WHERE id = ?', (item_id,))
+    item = cursor.fetchone()
+    
+    if not item:
+        conn.close()
+        return jsonify({'error': 'Not found'}), 404
+    
+    changed, pending = counters.accumulator.like(cursor, kind, item_id, user_id, liked)
+    conn.close()
+    
+    return jsonify({'liked': liked, 'changed': changed, 'likes': max(item['likes'] + pending, 0)}), 200
+
+def _trending(kind, author_column):
+    hours = min(max(request.args.get('hours', 24, type=int), 1), counters.TRENDING_RETENTION_HOURS)
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 50)
+    table = counters.KINDS[kind]
+    
+    conn = get_db()
+    cursor = conn.cursor()
+    ranked = counters.trending(cursor, kind, hours, limit)
+    items = {}
+    if ranked:
+        cursor.execute(f'''
+            SELECT t.id, t.title, t.category, t.views, t.likes, u.name as author_name
+            FROM {table} t LEFT JOIN users u ON t.{author_column} = u.id
+            WHERE t.id IN ({','.join('?' * len(ranked))})
+        ''', [item_id for item_id, *_ in ranked])
+        items = {row['id']: dict(row) for row in cursor.fetchall()}
     conn.close()
     
-    return jsonify(tips), 200
+    trending = [dict(items[item_id], window_views=views, window_likes=likes, score=score)
+                for item_id, views, likes, score in ranked if item_id in items]
+    return jsonify({'hours': hours, 'items': trending}), 200
+
+@api.route('/api/tips/<int:tip_id>/view', methods=['POST'])
+def view_tip(tip_id):
+    return _record_view('tip', tip_id)
+
+@api.route('/api/tips/<int:tip_id>/like', methods=['POST', 'DELETE'])
+@jwt_required()
+def like_tip(tip_id):
+    return _set_like('tip', tip_id, request.method == 'POST')
+
+@api.route('/api/tips/trending', methods=['GET'])
+def get_trending_tips():
+    return _trending('tip', 'author_id')
 
 # Government schemes endpoints
-@app.route('/api/schemes', methods=['GET'])
+@api.route('/api/schemes', methods=['GET'])
+@http_cache.cached(('government_schemes', 'translations'), args={'category': '', 'state': '', 'language': ''},
+                   max_age=300)
 def get_schemes():
     category = request.args.get('category', '')
     state = request.args.get('state', '')
+    language = request.args.get('language', '')
+    if language and language not in translation.LANGUAGES:
+        return jsonify({'error': f"language must be one of: {', '.join(translation.LANGUAGES)}"}), 400
     
     conn = get_db()
     cursor = conn.cursor()
@@ -603,16 +1053,48 @@ def get_schemes():
     
     query += ' ORDER BY created_at DESC'
     
-    cursor.execute(query, params)
-    schemes = [dict(row) for row in cursor.fetchall()]
+    return _localized_response(conn, cursor, query, params, 'government_schemes', language)
+
+@api.route('/api/schemes/for-me', methods=['GET'])
+@jwt_required()
+def get_schemes_for_me():
+    """Active schemes whose parsed eligibility matches the user's profile.
+    Crops come from ?crops=wheat,rice or else the user's irrigation plans."""
+    user_id = get_jwt_identity()
+    category = request.args.get('category', '')
+    
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute('SELECT role, location, farm_size FROM users WHERE id = ?', (user_id,))
+    user = cursor.fetchone()
+    
+    if not user:
+        conn.close()
+        return jsonify({'error': 'User not found'}), 404
+    
+    crops = [c for c in request.args.get('crops', '').split(',') if c.strip()]
+    if not crops:
+        cursor.execute('SELECT DISTINCT crop_name FROM irrigation_plans WHERE user_id = ?', (user_id,))
+        crops = [row['crop_name'] for row in cursor.fetchall()]
+    
+    profile = schemes.build_profile(user, crops)
+    matched = schemes.matcher.for_profile(conn, profile, get_table_version(cursor, 'government_schemes'))
     conn.close()
     
-    return jsonify(schemes), 200
+    if category:
+        matched = [scheme for scheme in matched if scheme['category'] == category]
+    
+    return jsonify(matched), 200
 
 # Forum endpoints
-@app.route('/api/forum/posts', methods=['GET'])
+@api.route('/api/forum/posts', methods=['GET'])
+@http_cache.cached(('forum_posts', 'forum_comments', 'users', 'translations'), args={'category': '', 'language': ''},
+                   max_age=60, ttl=60)
 def get_forum_posts():
     category = request.args.get('category', '')
+    language = request.args.get('language', '')
+    if language and language not in translation.LANGUAGES:
+        return jsonify({'error': f"language must be one of: {', '.join(translation.LANGUAGES)}"}), 400
     
     conn = get_db()
     cursor = conn.cursor()
@@ -633,13 +1115,9 @@ def get_forum_posts():
     
     query += ' GROUP BY p.id ORDER BY p.is_pinned DESC, p.created_at DESC LIMIT 30'
     
-    cursor.execute(query, params)
-    posts = [dict(row) for row in cursor.fetchall()]
-    conn.close()
-    
-    return jsonify(posts), 200
+    return _localized_response(conn, cursor, query, params, 'forum_posts', language)
 
-@app.route('/api/forum/posts', methods=['POST'])
+@api.route('/api/forum/posts', methods=['POST'])
 @jwt_required()
 def create_forum_post():
     user_id = get_jwt_identity()
@@ -655,10 +1133,245 @@ def create_forum_post():
     post_id = cursor.lastrowid
     conn.close()
     
+    translation.enqueue_content([data['title'], data['content']],
+                                translation.detect_language(data['title'] + ' ' + data['content']))
+    
     return jsonify({'id': post_id, 'message': 'Post created successfully'}), 201
 
+@api.route('/api/forum/posts/<int:post_id>/view', methods=['POST'])
+def view_forum_post(post_id):
+    return _record_view('post', post_id)
+
+@api.route('/api/forum/posts/<int:post_id>/like', methods=['POST', 'DELETE'])
+@jwt_required()
+def like_forum_post(post_id):
+    return _set_like('post', post_id, request.method == 'POST')
+
+@api.route('/api/forum/trending', methods=['GET'])
+def get_trending_posts():
+    return _trending('post', 'user_id')
+
+@api.route('/api/forum/posts/<int:post_id>/comments', methods=['POST'])
+@jwt_required()
+def create_forum_comment(post_id):
+    user_id = get_jwt_identity()
+    data = request.json or {}
+    content = (data.get('content') or '').strip()
+    
+    if not content:
+        return jsonify({'error': 'Content is required'}), 400
+    
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute('SELECT user_id, title FROM forum_posts WHERE id = ?', (post_id,))
+    post = cursor.fetchone()
+    
+    if not post:
+        conn.close()
+        return jsonify({'error': 'Post not found'}), 404
+    
+    cursor.execute('INSERT INTO forum_comments (post_id, user_id, content) VALUES (?, ?, ?)',
+                   (post_id, user_id, content))
+    comment_id = cursor.lastrowid
+    conn.commit()
+    
+    if post['user_id'] != int(user_id):
+        cursor.execute('SELECT name FROM users WHERE id = ?', (user_id,))
+        author = cursor.fetchone()
+        notifications.send(conn, [(post['user_id'], 'New reply to your post',
+                                   f"{author['name'] if author else 'Someone'} replied to \"{post['title']}\"",
+                                   'forum_reply')], emit=emit_to_room)
+    conn.close()
+    
+    return jsonify({'id': comment_id, 'message': 'Comment added successfully'}), 201
+
+# Irrigation planner endpoints
+MAX_BATCH_PLOTS = 10000
+
+def _plan_response(row):
+    import irrigation
+    plan = dict(row)
+    plan['schedule'] = irrigation.decode_schedule(plan['schedule']) if plan.get('schedule') else None
+    return plan
+
+@api.route('/api/irrigation/plans', methods=['GET'])
+@jwt_required()
+def get_irrigation_plans():
+    user_id = get_jwt_identity()
+    
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute('SELECT * FROM irrigation_plans WHERE user_id = ? ORDER BY created_at DESC', (user_id,))
+    plans = [_plan_response(row) for row in cursor.fetchall()]
+    conn.close()
+    
+    return jsonify(plans), 200
+
+@api.route('/api/irrigation/plans', methods=['POST'])
+@jwt_required()
+def create_irrigation_plan():
+    """Compute a season schedule for one plot and save it. Optional et0/rain
+    are daily forecast series in mm starting on start_date."""
+    import irrigation
+    user_id = get_jwt_identity()
+    data = request.json
+    
+    if not data.get('crop_name'):
+        return jsonify({'error': 'Crop name is required'}), 400
+    
+    try:
+        plan = irrigation.build_plans([data], et0=data.get('et0'), rain=data.get('rain'))[0]
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Invalid area, start_date or forecast values'}), 400
+    
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute('''
+        INSERT INTO irrigation_plans (user_id, crop_name, area, soil_type, water_requirement,
+        irrigation_method, schedule, start_date, end_date)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (user_id, plan['crop_name'], plan['area'], plan['soil_type'], plan['water_requirement'],
+          plan['irrigation_method'], plan['schedule'], plan['start_date'], plan['end_date']))
+    conn.commit()
+    plan['id'] = cursor.lastrowid
+    conn.close()
+    
+    return jsonify(_plan_response(plan)), 201
+
+@api.route('/api/irrigation/plan-batch', methods=['POST'])
+@jwt_required()
+def plan_irrigation_batch():
+    """Plan many plots in one call without saving. Schedules are returned in
+    their compact serialized form."""
+    import irrigation
+    data = request.json
+    plots = data.get('plots') or []
+    
+    if not plots:
+        return jsonify({'error': 'At least one plot is required'}), 400
+    if len(plots) > MAX_BATCH_PLOTS:
+        return jsonify({'error': f'At most {MAX_BATCH_PLOTS} plots per batch'}), 400
+    
+    try:
+        plans = irrigation.build_plans(plots, et0=data.get('et0'), rain=data.get('rain'))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Invalid area, start_date or forecast values'}), 400
+    
+    return jsonify(plans), 200
+
+@api.cli.command('replan-irrigation')
+def replan_irrigation_command():
+    """Re-plan all active irrigation plans against the latest forecasts"""
+    import replan
+    base_url = os.environ.get('OPENWEATHER_URL', OPENWEATHER_URL)
+    conn = get_db()
+    result = replan.run(conn, fetch=lambda location: replan.fetch_forecast(location, base_url), emit=emit_to_room)
+    conn.close()
+    print(json.dumps(result, indent=2))
+
+# Notification endpoints
+@api.route('/api/notifications', methods=['GET'])
+@jwt_required()
+def get_notifications():
+    """Keyset-paginated notifications, newest first. Pass next_cursor back as ?before="""
+    user_id = get_jwt_identity()
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+    before = request.args.get('before', type=int)
+    
+    conn = get_db()
+    cursor = conn.cursor()
+    query = 'SELECT * FROM notifications WHERE user_id = ?'
+    params = [user_id]
+    
+    if before:
+        query += ' AND id < ?'
+        params.append(before)
+    
+    query += ' ORDER BY id DESC LIMIT ?'
+    params.append(limit + 1)
+    
+    cursor.execute(query, params)
+    items = [dict(row) for row in cursor.fetchall()]
+    unread = notifications.unread_count(cursor, user_id)
+    conn.close()
+    
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = items[-1]['id']
+    
+    return jsonify({'notifications': items, 'next_cursor': next_cursor, 'unread': unread}), 200
+
+@api.route('/api/notifications/unread-count', methods=['GET'])
+@jwt_required()
+def get_unread_count():
+    conn = get_db()
+    unread = notifications.unread_count(conn.cursor(), get_jwt_identity())
+    conn.close()
+    return jsonify({'unread': unread}), 200
+
+@api.route('/api/notifications/read', methods=['POST'])
+@jwt_required()
+def mark_notifications_read():
+    """Mark {"ids": [...]} or {"all": true} as read"""
+    user_id = get_jwt_identity()
+    data = request.json or {}
+    ids = data.get('ids')
+    
+    if not data.get('all') and not isinstance(ids, list):
+        return jsonify({'error': 'Provide ids or all'}), 400
+    
+    conn = get_db()
+    try:
+        marked = notifications.mark_read(conn, user_id, None if data.get('all') else ids)
+    except (TypeError, ValueError):
+        conn.close()
+        return jsonify({'error': 'ids must be integers'}), 400
+    unread = notifications.unread_count(conn.cursor(), user_id)
+    conn.close()
+    
+    return jsonify({'marked': marked, 'unread': unread}), 200
+
+@api.route('/api/notifications/broadcast', methods=['POST'])
+@admin_required
+def broadcast_notification():
+    """Send one alert to every farmer in a state"""
+    data = request.json or {}
+    state = schemes.state_from_location(data.get('state', ''))
+    kind = data.get('type', 'general')
+    
+    if not state or not data.get('title') or not data.get('message'):
+        return jsonify({'error': 'state, title and message are required'}), 400
+    if kind not in notifications.KINDS:
+        return jsonify({'error': f"type must be one of {', '.join(notifications.KINDS)}"}), 400
+    
+    conn = get_db()
+    count = notifications.broadcast_region(conn, state, data['title'], data['message'], kind, emit=emit_to_room)
+    conn.close()
+    
+    return jsonify({'state': state, 'recipients': count}), 200
+
+@api.cli.command('translate-backlog')
+def translate_backlog_command():
+    """Translate all existing tips, schemes and forum posts into every language"""
+    if translation.translation_queue.translator is None:
+        print("❌ No translation backend configured (set TRANSLATOR)")
+        return
+    conn = get_db()
+    written = translation.translate_backlog(conn)
+    conn.close()
+    print(f"✅ Stored {written} translations")
+
+@api.cli.command('repair-notification-counts')
+def repair_notification_counts_command():
+    """Rebuild unread notification counters from the notifications table"""
+    conn = get_db()
+    users = notifications.repair_counts(conn)
+    conn.close()
+    print(f"✅ Rebuilt unread counts for {users} users")
+
 # AI Chatbot endpoint
-@app.route('/api/ai/chat', methods=['POST'])
+@api.route('/api/ai/chat', methods=['POST'])
 @jwt_required()
 def ai_chat():
     user_id = get_jwt_identity()
@@ -669,7 +1382,44 @@ def ai_chat():
     if not question.strip():
         return jsonify({'error': 'Question is required'}), 400
 
+    # Look the question up in local tips and schemes first: a confident match
+    # is answered directly, otherwise the best passages go into the prompt
+    retrieval.index.refresh()
+    results = retrieval.index.search(question)
+    answer = retrieval.local_answer(results, language)
+    source = 'local'
+
+    if answer is None:
+        answer, source = _llm_answer(question, language, retrieval.context_prompt(results))
+    retrieval.record_answer(source)
+
+    # Save to database
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute('''
+        INSERT INTO ai_chat_history (user_id, question, answer, language)
+        VALUES (?, ?, ?, ?)
+    ''', (user_id, question, answer, language))
+    conn.commit()
+    conn.close()
+
+    return jsonify({
+        'question': question,
+        'answer': answer,
+        'language': language,
+        'source': source,
+        'references': [
+            {'type': passage['source'], 'id': passage['id'], 'title': passage['title'], 'score': round(score, 3)}
+            for score, passage in results if score >= retrieval.CONTEXT_THRESHOLD
+        ]
+    }), 200
+
+def _llm_answer(question, language, context=''):
+    """(answer, 'llm'), or a canned (answer, 'fallback') if the API fails"""
     try:
+        import openai
+        client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        
         # Create system prompt for farming context
         system_prompt = """You are Ayushmann, an expert AI farming assistant for AgriSmart platform.
         You provide helpful, accurate information about agriculture, farming practices, crop management, soil health, irrigation, pest control, and related topics.
@@ -679,22 +1429,25 @@ def ai_chat():
         # Add language instruction if Hindi
         if language == 'hi':
             system_prompt += " Respond in Hindi language."
+        system_prompt += context
 
         # Call OpenAI API
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": question}
-            ],
-            max_tokens=500,
-            temperature=0.7
-        )
+        with metrics.upstream('openai'):
+            response = client.chat.completions.create(
+                model="gpt-3.5-turbo",
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": question}
+                ],
+                max_tokens=500,
+                temperature=0.7
+            )
 
-        answer = response.choices[0].message.content.strip()
+        return response.choices[0].message.content.strip(), 'llm'
 
     except Exception as e:
         print(f"OpenAI API error: {e}")
+        metrics.fallback('openai')
         # Fallback to mock response if API fails
         responses = {
             'en': [
@@ -710,26 +1463,22 @@ def ai_chat():
             ]
         }
         import random
-        answer = random.choice(responses.get(language, responses['en']))
+        return random.choice(responses.get(language, responses['en'])), 'fallback'
 
-    # Save to database
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO ai_chat_history (user_id, question, answer, language)
-        VALUES (?, ?, ?, ?)
-    ''', (user_id, question, answer, language))
-    conn.commit()
-    conn.close()
+@api.route('/api/ai/history', methods=['GET'])
+@jwt_required()
+def get_ai_history():
+    return _history_response('ai_chat_history', get_jwt_identity())
 
-    return jsonify({
-        'question': question,
-        'answer': answer,
-        'language': language
-    }), 200
+@api.route('/api/chat/rooms/<room>/messages', methods=['GET'])
+@jwt_required()
+def get_room_messages(room):
+    if room.startswith(('user_', 'region_')):
+        return jsonify({'error': 'Not a chat room'}), 404
+    return _history_response('chat_messages', room)
 
 # Dashboard stats endpoint
-@app.route('/api/dashboard/stats', methods=['GET'])
+@api.route('/api/dashboard/stats', methods=['GET'])
 @jwt_required()
 def get_dashboard_stats():
     user_id = get_jwt_identity()
@@ -737,9 +1486,9 @@ def get_dashboard_stats():
     conn = get_db()
     cursor = conn.cursor()
     
-    # Get various stats
+    # Get various stats (history counts include rows moved to the archive)
     cursor.execute('SELECT COUNT(*) as count FROM disease_detections WHERE user_id = ?', (user_id,))
-    disease_scans = cursor.fetchone()['count']
+    disease_scans = cursor.fetchone()['count'] + archive.archived_count(cursor, 'disease_detections', user_id)
     
     cursor.execute('SELECT COUNT(*) as count FROM irrigation_plans WHERE user_id = ?', (user_id,))
     irrigation_plans = cursor.fetchone()['count']
@@ -748,7 +1497,7 @@ def get_dashboard_stats():
     products_listed = cursor.fetchone()['count']
     
     cursor.execute('SELECT COUNT(*) as count FROM ai_chat_history WHERE user_id = ?', (user_id,))
-    ai_chats = cursor.fetchone()['count']
+    ai_chats = cursor.fetchone()['count'] + archive.archived_count(cursor, 'ai_chat_history', user_id)
     
     conn.close()
     
@@ -760,19 +1509,51 @@ def get_dashboard_stats():
     }), 200
 
 # Socket.IO events for real-time chat
+def emit_to_room(event, data, room):
+    socketio.emit(event, data, room=room)
+
+@socketio.on('connect')
+def on_connect(auth=None):
+    """Clients passing {token: <JWT>} as auth join their private notification
+    room and their state's regional alert room"""
+    metrics.registry.add_gauge('socketio_connections', 1)
+    token = (auth or {}).get('token') if isinstance(auth, dict) else None
+    if not token:
+        return
+    try:
+        user_id = decode_token(token)['sub']
+    except Exception:
+        return
+    join_room(notifications.user_room(user_id))
+    conn = get_db()
+    user = conn.execute('SELECT location FROM users WHERE id = ?', (user_id,)).fetchone()
+    conn.close()
+    state = schemes.state_from_location(user['location']) if user else None
+    if state:
+        join_room(notifications.region_room(state))
+
+@socketio.on('disconnect')
+def on_disconnect():
+    metrics.registry.add_gauge('socketio_connections', -1)
+
 @socketio.on('join')
+@metrics.socket_event('join')
 def on_join(data):
     room = data.get('room', 'general')
+    if room.startswith(('user_', 'region_')):
+        return  # notification rooms are joined on authenticated connect only
     join_room(room)
     emit('user_joined', {'message': f"User joined {room}"}, room=room)
 
 @socketio.on('leave')
+@metrics.socket_event('leave')
 def on_leave(data):
     room = data.get('room', 'general')
     leave_room(room)
     emit('user_left', {'message': f"User left {room}"}, room=room)
 
 @socketio.on('send_message')
+@metrics.socket_event('send_message')
 def handle_message(data):
     room = data.get('room', 'general')
     message = data.get('message', '')
@@ -802,24 +1583,76 @@ def handle_message(data):
     }, room=room)
 
 @socketio.on('typing')
+@metrics.socket_event('typing')
 def handle_typing(data):
     room = data.get('room', 'general')
     username = data.get('username', 'User')
     emit('user_typing', {'username': username}, room=room, include_self=False)
 
 # Health check
-@app.route('/api/health', methods=['GET'])
+@api.route('/api/health', methods=['GET'])
 def health_check():
     return jsonify({'status': 'healthy', 'service': 'AgriSmart 2.0 API'}), 200
 
+# Prometheus metrics
+metrics.registry.describe('scheme_match_cache_profiles', 'gauge', 'Profiles cached by the scheme matcher')
+metrics.registry.gauge_callback('scheme_match_cache_profiles', lambda: len(schemes.matcher.cache))
+
+@api.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
+
+# Profiling endpoints (per worker process)
+@api.route('/api/debug/profiler', methods=['GET'])
+@admin_required
+def get_profile_stacks():
+    """Collapsed stacks for flamegraph.pl / speedscope; ?format=json for status"""
+    if request.args.get('format') == 'json':
+        return jsonify(profiler.profiler.status()), 200
+    return Response(profiler.profiler.collapsed(), mimetype='text/plain')
+
+@api.route('/api/debug/profiler', methods=['POST'])
+@admin_required
+def control_profiler():
+    data = request.json or {}
+    action = data.get('action')
+    
+    if action == 'start':
+        try:
+            interval_ms = float(data.get('interval_ms', 20))
+        except (TypeError, ValueError):
+            interval_ms = None
+        if interval_ms is None or not 1 <= interval_ms <= 1000:
+            return jsonify({'error': 'interval_ms must be a number between 1 and 1000'}), 400
+        if not profiler.profiler.start(interval=interval_ms / 1000) and profiler.profiler.unavailable:
+            return jsonify(dict(profiler.profiler.status(), error=profiler.profiler.unavailable)), 409
+    elif action == 'stop':
+        profiler.profiler.stop()
+    elif action == 'reset':
+        profiler.profiler.reset()
+    else:
+        return jsonify({'error': 'Action must be start, stop or reset'}), 400
+    
+    return jsonify(profiler.profiler.status()), 200
+
+@api.route('/api/debug/slow-queries', methods=['GET'])
+@admin_required
+def get_slow_queries():
+    limit = min(max(request.args.get('limit', 50, type=int), 0), profiler.slow_query_log.entries.maxlen)
+    return jsonify({
+        'threshold_ms': profiler.slow_query_log.threshold_ms,
+        'queries': profiler.slow_query_log.recent(limit)
+    }), 200
+
 # 👇 ADD THIS NEW ROUTE 👇
-@app.route('/')
+@api.route('/')
 def home():
     return jsonify({"message": "AgriSmart 2.0 Backend is running!"})
 
-@app.route('/api/ai/speak', methods=['POST'])
+@api.route('/api/ai/speak', methods=['POST'])
 def elevenlabs_tts():
     try:
+        import requests
         data = request.get_json()
         text = data.get("text", "").strip()
         
@@ -848,7 +1681,10 @@ def elevenlabs_tts():
             }
         }
 
-        response = requests.post(url, json=payload, headers=headers)
+        with metrics.upstream('elevenlabs') as call:
+            response = requests.post(url, json=payload, headers=headers, timeout=30)
+            if response.status_code != 200:
+                call.outcome = f'http_{response.status_code}'
 
         if response.status_code == 200:
             audio_base64 = base64.b64encode(response.content).decode('utf-8')
@@ -859,9 +1695,20 @@ def elevenlabs_tts():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-# Initialize database on startup
-with app.app_context():
+@api.cli.command('init-db')
+def init_db_command():
+    """Create tables, indexes and triggers"""
     init_db()
+    print("✅ Database initialized")
 
 if __name__ == '__main__':
+    app = create_app()
+    
+    # DEBUG: Print whether keys are loaded
+    print("✅ ELEVENLABS_API_KEY loaded:", os.getenv("ELEVENLABS_API_KEY") is not None)
+    print("✅ OPENAI_API_KEY loaded:", os.getenv("OPENAI_API_KEY") is not None)
+    print("📁 Current working directory:", os.getcwd())
+    
+    init_db()
+    # Development server; in production use `gunicorn -c gunicorn.conf.py wsgi:app`
     socketio.run(app, debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,219 @@
+"""
+AgriSmart 2.0 - History Retention and Archival
+Moves old chat messages, AI chat history and disease detections out of the
+hot database into compressed monthly archive files that stay queryable
+
+Each table has a policy: how many days rows stay hot and the column history
+is looked up by (a user or a chat room). Older rows are moved a batch at a
+time into archive/<table>/<YYYY-MM>.sqlite, where each batch's rows for one
+key are stored as a single zlib-compressed block. The partition is attached
+to the hot connection so the copy and the delete commit together.
+
+history() reads newest-first from the hot table and falls through to the
+archive partitions, newest month first, decompressing only the blocks for
+the requested key. archive_counts keeps per-key totals of archived rows so
+dashboard counts stay right without touching the archive.
+"""
+
+from datetime import datetime, timedelta
+import json
+import logging
+import os
+import sqlite3
+import time
+import zlib
+
+import metrics
+import serialization
+
+# table -> (days kept in the hot database, column history is read by)
+POLICIES = {
+    'chat_messages': (90, 'room'),
+    'ai_chat_history': (180, 'user_id'),
+    'disease_detections': (365, 'user_id'),
+}
+ARCHIVE_DIR = 'archive'
+BATCH_SIZE = 5000
+VACUUM_PAGES = 2000
+
+logger = logging.getLogger('agrismart.archive')
+metrics.registry.describe('archive_rows_total', 'counter', 'Rows moved from the hot database to the archive')
+metrics.registry.describe('archive_read_duration_seconds', 'histogram', 'Time spent reading archive partitions')
+
+
+def init_tables(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS archive_counts (
+            tbl TEXT NOT NULL,
+            key TEXT NOT NULL,
+            rows INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (tbl, key)
+        ) WITHOUT ROWID
+    ''')
+    for table, (_, key) in POLICIES.items():
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_created ON {table}(created_at)')
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_{key} ON {table}({key}, id)')
+
+
+def partition_path(table, month):
+    return os.path.join(ARCHIVE_DIR, table, f'{month}.sqlite')
+
+
+def _next_month(month):
+    year, number = map(int, month.split('-'))
+    return f'{year + number // 12}-{number % 12 + 1:02d}'
+
+
+def archive_table(conn, table, days=None, batch_size=BATCH_SIZE):
+    """Move rows older than the policy (or ``days``) into the archive; returns rows moved"""
+    keep_days, key = POLICIES[table]
+    cutoff = (datetime.utcnow() - timedelta(days=keep_days if days is None else days)).strftime('%Y-%m-%d %H:%M:%S')
+    cursor = conn.cursor()
+    moved = 0
+    while True:
+        cursor.execute(f'SELECT MIN(created_at) FROM {table} WHERE created_at < ?', (cutoff,))
+        oldest = cursor.fetchone()[0]
+        if oldest is None:
+            return moved
+        # One partition per batch, so one ATTACH covers the whole transaction
+        month = oldest[:7]
+        bound = min(cutoff, _next_month(month) + '-01 00:00:00')
+        cursor.execute(f'SELECT * FROM {table} WHERE created_at < ? ORDER BY created_at LIMIT ?',
+                       (bound, batch_size))
+        rows = cursor.fetchall()
+        fields = [column[0] for column in cursor.description]
+        moved += _move(conn, table, key, month, fields, rows)
+
+
+def _move(conn, table, key, month, fields, rows):
+    index = fields.index(key)
+    blocks = {}
+    for row in rows:
+        blocks.setdefault(str(row[index]), []).append(tuple(row))
+
+    path = partition_path(table, month)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn.execute('ATTACH DATABASE ? AS part', (path,))
+    try:
+        cursor = conn.cursor()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS part.blocks (
+                key TEXT NOT NULL,
+                first_id INTEGER NOT NULL,
+                last_id INTEGER NOT NULL,
+                rows INTEGER NOT NULL,
+                data BLOB NOT NULL,
+                PRIMARY KEY (key, last_id)
+            ) WITHOUT ROWID
+        ''')
+        cursor.executemany('INSERT INTO part.blocks (key, first_id, last_id, rows, data) VALUES (?, ?, ?, ?, ?)', [
+            (value, min(row[0] for row in block), max(row[0] for row in block), len(block),
+             zlib.compress(serialization.dumps({'fields': fields, 'rows': sorted(block)}), 9))
+            for value, block in blocks.items()
+        ])
+        cursor.executemany(f'DELETE FROM {table} WHERE id = ?', [(row[0],) for row in rows])
+        cursor.executemany('''
+            INSERT INTO archive_counts (tbl, key, rows) VALUES (?, ?, ?)
+            ON CONFLICT(tbl, key) DO UPDATE SET rows = rows + excluded.rows
+        ''', [(table, value, len(block)) for value, block in blocks.items()])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.execute('DETACH DATABASE part')
+    metrics.registry.inc('archive_rows_total', (('table', table),), len(rows))
+    return len(rows)
+
+
+def compact(conn, pages=VACUUM_PAGES):
+    """Return free pages to the filesystem, ``pages`` per transaction so
+    writers are never blocked for long.
+
+    Databases created before auto_vacuum was enabled are converted with one
+    full VACUUM; returns 'vacuum' or 'incremental'.
+    """
+    mode = conn.execute('PRAGMA auto_vacuum').fetchone()[0]
+    if mode != 2:
+        conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        conn.execute('VACUUM')
+        return 'vacuum'
+    while conn.execute('PRAGMA freelist_count').fetchone()[0]:
+        # Each step frees one page and execute() only takes the first step;
+        # executescript() runs the pragma to completion
+        metrics.blocking(conn.executescript, f'PRAGMA incremental_vacuum({int(pages)});')
+    return 'incremental'
+
+
+def run(conn, pages=VACUUM_PAGES):
+    """Archive every table per its policy, then reclaim the freed pages"""
+    start = time.perf_counter()
+    moved = {table: archive_table(conn, table) for table in POLICIES}
+    mode = compact(conn, pages) if any(moved.values()) else None
+    logger.info('archived %s in %.1fs (%s)', moved, time.perf_counter() - start, mode or 'no vacuum')
+    return moved, mode
+
+
+def archived_count(cursor, table, key_value):
+    cursor.execute('SELECT rows FROM archive_counts WHERE tbl = ? AND key = ?', (table, str(key_value)))
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+
+def history(conn, table, key_value, limit=50, before=None):
+    """Newest-first rows (dicts) for one key, hot table first, then archived
+    months. ``before`` is an id for keyset pagination."""
+    key = POLICIES[table][1]
+    query = f'SELECT * FROM {table} WHERE {key} = ?'
+    params = [key_value]
+    if before is not None:
+        query += ' AND id < ?'
+        params.append(before)
+    cursor = conn.execute(query + ' ORDER BY id DESC LIMIT ?', params + [limit])
+    fields = [column[0] for column in cursor.description]
+    items = [dict(zip(fields, row)) for row in cursor.fetchall()]
+    if len(items) < limit:
+        items.extend(_archived(table, str(key_value), limit - len(items),
+                               items[-1]['id'] if items else before))
+    return items
+
+
+def _archived(table, key_value, limit, before):
+    directory = os.path.join(ARCHIVE_DIR, table)
+    if not os.path.isdir(directory):
+        return []
+    start = time.perf_counter()
+    # Plain sqlite3 connections and zlib, so offload like get_db() cursors
+    items = metrics.blocking(_read_partitions, directory, key_value, limit, before)
+    metrics.registry.observe('archive_read_duration_seconds', time.perf_counter() - start)
+    items.sort(key=lambda item: item['id'], reverse=True)
+    return items
+
+
+def _read_partitions(directory, key_value, limit, before):
+    """Up to ``limit`` rows for the key, newest month file first"""
+    items = []
+    for name in sorted(os.listdir(directory), reverse=True):
+        if not name.endswith('.sqlite'):
+            continue
+        part = sqlite3.connect(f'file:{os.path.join(directory, name)}?mode=ro', uri=True)
+        try:
+            query = 'SELECT data FROM blocks WHERE key = ?'
+            params = [key_value]
+            if before is not None:
+                query += ' AND first_id < ?'
+                params.append(before)
+            for (data,) in part.execute(query + ' ORDER BY last_id DESC', params):
+                block = json.loads(zlib.decompress(data))
+                for row in reversed(block['rows']):
+                    if before is None or row[0] < before:
+                        items.append(dict(zip(block['fields'], row)))
+                        if len(items) == limit:
+                            break
+                if len(items) == limit:
+                    break
+        finally:
+            part.close()
+        if len(items) == limit:
+            break
+    return items
@@ -0,0 +1,115 @@
+"""
+Benchmark for history archival
+Fills chat messages, AI chat history and disease detections with two years
+of rows, runs the archiver, and compares hot database size and read latency
+before and after, including history pages served from the archive
+
+Usage: python benchmarks/bench_archive.py [--messages 300000] [--ai-chats 200000]
+"""
+
+import argparse
+from datetime import datetime, timedelta
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def timed(client, url, headers, repeat=20):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.get(url, headers=headers)
+        samples.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.get_data(as_text=True)
+    samples.sort()
+    return samples[len(samples) // 2] * 1000, response.get_json()
+
+
+def report(label, client, headers):
+    conn = sqlite3.connect('agrismart.db')
+    free = conn.execute('PRAGMA freelist_count').fetchone()[0] * conn.execute('PRAGMA page_size').fetchone()[0]
+    conn.close()
+    print(f"\n{label}: hot database {os.path.getsize('agrismart.db') / 2 ** 20:.1f} MB "
+          f"({free / 2 ** 20:.1f} MB free pages)")
+    for name, url in (('dashboard stats', '/api/dashboard/stats'),
+                      ('chat room, page 1', '/api/chat/rooms/general/messages?limit=50'),
+                      ('AI history, page 1', '/api/ai/history?limit=50')):
+        p50, _ = timed(client, url, headers)
+        print(f"  {name:24} p50 {p50:7.2f} ms")
+
+    # Walk back to the oldest page, the part that moves to the archive
+    url, pages, start = '/api/ai/history?limit=50', 0, time.perf_counter()
+    while url:
+        body = client.get(url, headers=headers).get_json()
+        pages += 1
+        url = f"/api/ai/history?limit=50&before={body['next_before']}" if body['next_before'] else None
+    elapsed = time.perf_counter() - start
+    print(f"  {'AI history, all pages':24} {pages} pages in {elapsed * 1000:7.0f} ms "
+          f"({elapsed / pages * 1000:.2f} ms/page)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--messages', type=int, default=300000)
+    parser.add_argument('--ai-chats', type=int, default=200000)
+    parser.add_argument('--detections', type=int, default=100000)
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp())
+    import app
+    import archive
+    import seed_data
+    app.init_db()
+    seed_data.seed_database()
+    seed_data.generate_database(users=args.users, products=0, posts=0, comments=0,
+                                messages=args.messages, detections=args.detections)
+
+    # Two years of AI chat in insert order (ids follow created_at, as in
+    # production), with one heavy user whose history is paged through
+    rng = random.Random(7)
+    now = datetime.utcnow()
+    ages = sorted((rng.randint(0, 730 * 86400) for _ in range(args.ai_chats)), reverse=True)
+    conn = app.get_db()
+    heavy = conn.execute("SELECT id FROM users WHERE email = 'loadtest1@example.com'").fetchone()[0]
+    conn.executemany('INSERT INTO ai_chat_history (user_id, question, answer, language, created_at) '
+                     'VALUES (?, ?, ?, ?, ?)', (
+                         (heavy if i % 20 == 0 else rng.randint(heavy, heavy + args.users - 1),
+                          f'Question {i}: when should I irrigate wheat after sowing?',
+                          'Give the first irrigation at crown root initiation, 20-25 days after sowing. ' * 3,
+                          'en', (now - timedelta(seconds=age)).strftime('%Y-%m-%d %H:%M:%S'))
+                         for i, age in enumerate(ages)))
+    conn.commit()
+    conn.close()
+
+    client = app.create_app().test_client()
+    token = client.post('/api/auth/login', json={
+        'email': 'loadtest1@example.com', 'password': seed_data.LOAD_TEST_PASSWORD
+    }).get_json()['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+    report('before archiving', client, headers)
+
+    conn = app.get_db()
+    start = time.perf_counter()
+    moved, mode = archive.run(conn)
+    elapsed = time.perf_counter() - start
+    conn.close()
+    archived = sum(os.path.getsize(os.path.join(root, name))
+                   for root, _, names in os.walk(archive.ARCHIVE_DIR) for name in names) / 2 ** 20
+    print(f"\narchived {moved} in {elapsed:.1f}s ({mode}), archive files {archived:.1f} MB")
+
+    conn = app.get_db()
+    start = time.perf_counter()
+    archive.run(conn)
+    print(f"second run (nothing to move) in {(time.perf_counter() - start) * 1000:.0f} ms")
+    conn.close()
+    report('after archiving', client, headers)
+
+
+if __name__ == '__main__':
+    main()
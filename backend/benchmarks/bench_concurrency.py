@@ -0,0 +1,141 @@
+"""
+Benchmark for concurrent slow-upstream requests
+Runs a fake weather upstream that answers after --delay seconds, then sends
+--concurrency simultaneous /api/weather requests to the threaded development
+server and to a gunicorn gevent worker, one process each
+
+Usage: python benchmarks/bench_concurrency.py [--concurrency 100,500,1000] [--delay 1]
+Needs gevent and gunicorn (requirements.txt); Linux for the memory column.
+"""
+
+from gevent import monkey
+monkey.patch_all()
+
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import gevent
+from gevent.pywsgi import WSGIServer
+import requests
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+DEV_SERVER = '''
+import sys
+sys.path.insert(0, {backend!r})
+from app import create_app, socketio
+socketio.run(create_app(), host='127.0.0.1', port={port}, allow_unsafe_werkzeug=True)
+'''
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def slow_upstream(delay):
+    def application(environ, start_response):
+        gevent.sleep(delay)
+        start_response('200 OK', [('Content-Type', 'application/json')])
+        return [b'{"main": {"temp": 28}, "list": []}']
+    return application
+
+
+def rss_mb(pid):
+    """Resident memory of a process and its children, in MB (Linux only)"""
+    try:
+        with open(f'/proc/{pid}/status') as status:
+            kb = next(int(line.split()[1]) for line in status if line.startswith('VmRSS'))
+        with open(f'/proc/{pid}/task/{pid}/children') as children:
+            return kb / 1024 + sum(rss_mb(int(child)) or 0 for child in children.read().split())
+    except (OSError, StopIteration):
+        return None
+
+
+def start_server(mode, port, env):
+    if mode == 'threaded':
+        command = [sys.executable, '-c', DEV_SERVER.format(backend=BACKEND, port=port)]
+        env = dict(env, SOCKETIO_ASYNC_MODE='threading')
+    else:
+        command = [sys.executable, '-m', 'gunicorn', '-c', os.path.join(BACKEND, 'gunicorn.conf.py'),
+                   '--pythonpath', BACKEND, 'wsgi:app']
+        env = dict(env, PORT=str(port), WEB_CONCURRENCY='1', WORKER_CONNECTIONS='10000')
+    server = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base = f'http://127.0.0.1:{port}'
+    for _ in range(100):
+        try:
+            requests.get(base + '/', timeout=1)
+            return server, base
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError(f'{mode} server did not start')
+
+
+def load(base, token, concurrency):
+    latencies, failures = [], 0
+
+    def one():
+        nonlocal failures
+        start = time.perf_counter()
+        try:
+            response = requests.get(base + '/api/weather', headers={'Authorization': f'Bearer {token}'},
+                                    timeout=60)
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+        except requests.RequestException:
+            failures += 1
+
+    start = time.perf_counter()
+    gevent.joinall([gevent.spawn(one) for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return elapsed, latencies, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--concurrency', default='100,500,1000')
+    parser.add_argument('--delay', type=float, default=1.0)
+    parser.add_argument('--modes', default='threaded,gevent')
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp())
+    import app
+    app.init_db()
+
+    upstream_port = free_port()
+    upstream = WSGIServer(('127.0.0.1', upstream_port), slow_upstream(args.delay), log=None, spawn=20000)
+    upstream.start()
+    env = dict(os.environ, OPENWEATHER_URL=f'http://127.0.0.1:{upstream_port}', AUTO_INIT_DB='0',
+               JWT_SECRET_KEY='bench', SECRET_KEY='bench', COUNTER_FLUSH_SECONDS='60')
+
+    print(f"\nupstream delay {args.delay:.1f}s, two upstream calls per request")
+    for mode in args.modes.split(','):
+        server, base = start_server(mode, free_port(), env)
+        try:
+            token = requests.post(base + '/api/auth/register', json={
+                'name': mode, 'email': f'{mode}@example.com', 'password': 'pw'
+            }).json()['access_token']
+            for concurrency in map(int, args.concurrency.split(',')):
+                elapsed, latencies, failures = load(base, token, concurrency)
+                memory = rss_mb(server.pid)
+                p50 = latencies[len(latencies) // 2] if latencies else float('nan')
+                p99 = latencies[int(len(latencies) * 0.99)] if latencies else float('nan')
+                print(f"{mode:9} x{concurrency:5}: {len(latencies) / elapsed:7.1f} req/s, p50 {p50:5.2f}s, "
+                      f"p99 {p99:5.2f}s, {failures} failed"
+                      + (f", server RSS {memory:.0f} MB" if memory else ''))
+        finally:
+            server.terminate()
+            server.wait(timeout=60)
+
+
+if __name__ == '__main__':
+    main()
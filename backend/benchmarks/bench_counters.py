@@ -0,0 +1,78 @@
+"""
+Benchmark for write-coalescing view/like counters
+Compares one UPDATE + commit per view against the in-memory accumulator
+under concurrent writers, and the memory of the like dedup set
+
+Usage: python benchmarks/bench_counters.py [--views 50000] [--threads 8]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def hammer(func, views, threads, posts):
+    def worker(seed):
+        rng = random.Random(seed)
+        for _ in range(views // threads):
+            func(rng.randint(1, posts))
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(worker, range(threads)))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--views', type=int, default=50000)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--posts', type=int, default=2000)
+    parser.add_argument('--likers', type=int, default=100000)
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp())
+    import app
+    import counters
+    import seed_data
+    app.init_db()
+    seed_data.generate_database(users=1000, products=0, posts=args.posts, comments=0, messages=0, detections=0)
+
+    def naive(post_id):
+        conn = app.get_db()
+        conn.execute('UPDATE forum_posts SET views = views + 1 WHERE id = ?', (post_id,))
+        conn.commit()
+        conn.close()
+
+    naive_seconds = hammer(naive, args.views, args.threads, args.posts)
+    print(f"UPDATE per view:     {args.views / naive_seconds:10,.0f} views/s")
+
+    accumulator = counters.CounterAccumulator()
+    accumulator.connect = app.get_db
+    accumulator._pid = os.getpid()  # flush by hand below instead of on the timer
+    coalesced_seconds = hammer(lambda post_id: accumulator.view('post', post_id), args.views, args.threads,
+                               args.posts)
+    start = time.perf_counter()
+    items = accumulator.flush()
+    flush_seconds = time.perf_counter() - start
+    print(f"accumulator:         {args.views / coalesced_seconds:10,.0f} views/s "
+          f"(one flush of {items} items in {flush_seconds * 1000:.1f} ms)")
+
+    ids = random.Random(1).sample(range(1, 10 * args.likers), args.likers)
+    for label, build in (('python set', lambda: set(ids)), ('UserSet', lambda: counters.UserSet(ids))):
+        tracemalloc.start()
+        members = build()
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        print(f"{label + ' memory:':20} {size / args.likers:6.1f} bytes per like ({len(ids)} likers)")
+        del members
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Benchmark for the irrigation planning engine
+Reports plots planned per second for the vectorized core and full serialization
+
+Usage: python benchmarks/bench_irrigation.py [--plots 10000] [--repeat 5]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import irrigation
+
+
+def make_plots(count, seed=42):
+    rng = random.Random(seed)
+    crops = [c for c in irrigation.CROPS if c != 'default']
+    soils = [s for s in irrigation.SOILS if s != 'default']
+    methods = [m for m in irrigation.METHODS if m != 'default']
+    return [{
+        'crop_name': rng.choice(crops),
+        'area': round(rng.uniform(0.5, 20), 2),
+        'soil_type': rng.choice(soils),
+        'irrigation_method': rng.choice(methods),
+        'start_date': '2026-11-01',
+    } for _ in range(count)]
+
+
+def best_of(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--plots', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    plots = make_plots(args.plots)
+    rng = random.Random(1)
+    et0 = [rng.uniform(3, 7) for _ in range(7)]  # one-week forecast
+
+    core = best_of(args.repeat, lambda: irrigation.plan_plots(
+        [p['crop_name'] for p in plots], [p['area'] for p in plots],
+        [p['soil_type'] for p in plots], [p['irrigation_method'] for p in plots], et0=et0))
+    full = best_of(args.repeat, lambda: irrigation.build_plans(plots, et0=et0))
+
+    sample = irrigation.build_plans(plots[:1], et0=et0)[0]['schedule']
+    print(f"plots:                 {args.plots}")
+    print(f"engine (plan_plots):   {args.plots / core:,.0f} plots/s ({core * 1000:.1f} ms)")
+    print(f"engine + serialize:    {args.plots / full:,.0f} plots/s ({full * 1000:.1f} ms)")
+    print(f"schedule size:         {len(sample)} bytes")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Benchmark for the instrumentation layer's hot-path overhead
+Times raw metric operations and compares plain vs instrumented SQLite
+statements and Flask requests
+
+Usage: python benchmarks/bench_metrics.py [--iterations 200000]
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, jsonify
+
+import metrics
+
+
+def per_call_ns(func, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=200000)
+    args = parser.parse_args()
+    n = args.iterations
+
+    registry = metrics.Registry()
+    labels = (('route', '/api/products'),)
+    print(f"counter inc:             {per_call_ns(lambda: registry.inc('c', labels), n):8.0f} ns")
+    print(f"histogram observe:       {per_call_ns(lambda: registry.observe('h', 0.003, labels), n):8.0f} ns")
+
+    plain = sqlite3.connect(':memory:')
+    instrumented = sqlite3.connect(':memory:', factory=metrics.InstrumentedConnection)
+    for conn in (plain, instrumented):
+        conn.execute('CREATE TABLE t (id INTEGER PRIMARY KEY, v TEXT)')
+        conn.execute("INSERT INTO t (v) VALUES ('x')")
+    plain_cursor, instrumented_cursor = plain.cursor(), instrumented.cursor()
+    base = per_call_ns(lambda: plain_cursor.execute('SELECT v FROM t WHERE id = ?', (1,)).fetchone(), n)
+    timed = per_call_ns(lambda: instrumented_cursor.execute('SELECT v FROM t WHERE id = ?', (1,)).fetchone(), n)
+    print(f"sqlite point query:      {base:8.0f} ns plain, {timed:8.0f} ns instrumented (+{timed - base:.0f} ns)")
+
+    results = {}
+    for name, instrument in (('plain', False), ('instrumented', True)):
+        app = Flask(name)
+        if instrument:
+            metrics.init_app(app)
+
+        @app.route('/ping')
+        def ping():
+            return jsonify({'ok': True})
+
+        client = app.test_client()
+        results[name] = per_call_ns(lambda: client.get('/ping'), max(n // 50, 1000))
+    print(f"flask request:           {results['plain'] / 1000:8.1f} us plain, "
+          f"{results['instrumented'] / 1000:8.1f} us instrumented "
+          f"(+{(results['instrumented'] - results['plain']) / 1000:.1f} us)")
+
+
+if __name__ == '__main__':
+    main()
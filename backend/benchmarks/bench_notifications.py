@@ -0,0 +1,67 @@
+"""
+Benchmark for notification fan-out
+Times a regional alert to every farmer in a state (set-based insert plus one
+room emit), personalized batched sends, unread-count reads and bulk
+mark-as-read against a generated user base
+
+Usage: python benchmarks/bench_notifications.py [--users 100000]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--state', default='Punjab', help='region for the broadcast; all generated users live here')
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp())
+    import app
+    import notifications
+    import seed_data
+    app.init_db()
+    seed_data.generate_database(users=args.users, products=0, posts=0, comments=0, messages=0, detections=0)
+    conn = app.get_db()
+    conn.execute("UPDATE users SET location = 'Ludhiana, ' || ?", (args.state,))
+    conn.commit()
+
+    emitted = []
+    emit = lambda event, data, room: emitted.append(room)
+
+    start = time.perf_counter()
+    count = notifications.broadcast_region(conn, args.state, 'Locust alert', 'Swarm expected within 48h', 'outbreak', emit)
+    elapsed = time.perf_counter() - start
+    print(f"regional broadcast:  {count} recipients in {elapsed:.3f}s ({len(emitted)} emit)")
+
+    emitted.clear()
+    user_ids = [row[0] for row in conn.execute('SELECT id FROM users')]
+    rows = [(user_id, 'Price alert', f'Wheat is up 4% near you ({user_id})', 'price_alert') for user_id in user_ids]
+    start = time.perf_counter()
+    notifications.send(conn, rows, emit)
+    elapsed = time.perf_counter() - start
+    print(f"personalized send:   {len(rows)} notifications in {elapsed:.3f}s "
+          f"({len(rows) / elapsed:,.0f}/s, {len(emitted)} emits)")
+
+    cursor = conn.cursor()
+    reads = 10000
+    start = time.perf_counter()
+    for i in range(reads):
+        notifications.unread_count(cursor, user_ids[i % len(user_ids)])
+    print(f"unread count:        {(time.perf_counter() - start) / reads * 1e6:.1f} us per read")
+
+    start = time.perf_counter()
+    for user_id in user_ids[:1000]:
+        notifications.mark_read(conn, user_id)
+    print(f"mark all read:       {(time.perf_counter() - start):.3f}s for 1000 users")
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Benchmark for outbreak aggregation
+Generates users and detections, then times the one-off backfill, the
+per-detection incremental update and the heatmap query against a naive
+rescan of disease_detections
+
+Usage: python benchmarks/bench_outbreaks.py [--users 100000] [--detections 1000000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def per_call_ms(func, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--detections', type=int, default=1000000)
+    parser.add_argument('--updates', type=int, default=10000)
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp())
+    import app
+    import outbreaks
+    import seed_data
+    app.init_db()
+    seed_data.generate_database(users=args.users, products=0, posts=0, comments=0, messages=0,
+                                detections=args.detections)
+    conn = app.get_db()
+    cursor = conn.cursor()
+
+    result = outbreaks.rebuild(conn)
+    print(f"\nbackfill:            {result['detections']} detections -> {result['cells']} cells, "
+          f"{result['buckets']} crop buckets in {result['seconds']:.2f}s")
+
+    rng = random.Random(1)
+    start = time.perf_counter()
+    for _ in range(args.updates):
+        outbreaks.record(cursor, rng.randint(1, args.users), rng.choice(seed_data.CROPS),
+                         rng.choice(seed_data.DISEASES)[0])
+    conn.commit()
+    print(f"incremental update:  {(time.perf_counter() - start) / args.updates * 1e6:.1f} us per detection "
+          f"(first-use geocoding included)")
+
+    for days, precision in ((14, 4), (60, 4), (60, 2)):
+        ms = per_call_ms(lambda: outbreaks.heatmap(cursor, days, precision), 20)
+        print(f"heatmap {days:2}d p{precision}:      {ms:8.2f} ms from aggregates")
+    ms = per_call_ms(lambda: outbreaks.heatmap(cursor, 60, 4, crop='wheat'), 20)
+    print(f"heatmap 60d wheat:   {ms:8.2f} ms from aggregates")
+
+    rescan = '''
+        SELECT u.location, d.disease_name, COUNT(*) FROM disease_detections d
+        JOIN users u ON d.user_id = u.id
+        WHERE d.created_at >= date('now', '-59 days') GROUP BY u.location, d.disease_name
+    '''
+    print(f"naive rescan 60d:    {per_call_ms(lambda: cursor.execute(rescan).fetchall(), 3):8.2f} ms "
+          f"(before geocoding)")
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
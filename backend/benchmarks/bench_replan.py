@@ -0,0 +1,88 @@
+"""
+Benchmark for the forecast-aware irrigation re-planning job
+Seeds a scratch database with many plans spread over many locations and times
+a full replan run against a synthetic forecast source
+
+Usage: python benchmarks/bench_replan.py [--plans 100000] [--locations 500]
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import numpy as np
+
+import irrigation
+import replan
+from benchmarks.bench_irrigation import make_plots
+
+
+def seed(conn, plans, locations):
+    cursor = conn.cursor()
+    cursor.executemany(
+        'INSERT INTO users (name, email, location) VALUES (?, ?, ?)',
+        [(f'Farmer {i}', f'farmer{i}@example.com', f'Town {i % locations}') for i in range(plans)]
+    )
+    today = date.today()
+    plots = make_plots(plans)
+    for i, plot in enumerate(plots):
+        plot['start_date'] = (today - timedelta(days=i % 30)).isoformat()
+    rows = irrigation.build_plans(plots)
+    cursor.executemany('''
+        INSERT INTO irrigation_plans (user_id, crop_name, area, soil_type, water_requirement,
+        irrigation_method, schedule, start_date, end_date)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', [(i + 1, r['crop_name'], r['area'], r['soil_type'], r['water_requirement'],
+           r['irrigation_method'], r['schedule'], r['start_date'], r['end_date'])
+          for i, r in enumerate(rows)])
+    conn.commit()
+
+
+def synthetic_fetch(latency):
+    def fetch(location):
+        time.sleep(latency)
+        rng = np.random.default_rng(abs(hash(location)) % 2**32)
+        return {
+            'start': date.today(),
+            'et0': rng.uniform(3, 7, 5).astype(np.float32),
+            'rain': rng.choice([0.0, 0.0, 12.0], 5).astype(np.float32),
+        }
+    return fetch
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--plans', type=int, default=100000)
+    parser.add_argument('--locations', type=int, default=500)
+    parser.add_argument('--latency', type=float, default=0.2, help='simulated upstream seconds per forecast')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    os.chdir(workdir)
+    import app
+    app.init_db()
+
+    conn = sqlite3.connect(os.path.join(workdir, 'agrismart.db'))
+    conn.row_factory = sqlite3.Row
+    start = time.perf_counter()
+    seed(conn, args.plans, args.locations)
+    print(f"seeded {args.plans} plans in {time.perf_counter() - start:.1f}s")
+
+    fetch = synthetic_fetch(args.latency)
+    print("first run (forecast changed):")
+    print(json.dumps(replan.run(conn, fetch=fetch), indent=2))
+    print("second run (same forecast, nothing to write):")
+    print(json.dumps(replan.run(conn, fetch=fetch), indent=2))
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
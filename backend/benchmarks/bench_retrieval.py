@@ -0,0 +1,88 @@
+"""
+Benchmark for the local retrieval index behind the AI assistant
+Times a full build, an incremental refresh after new tips and top-k search
+over the seeded tips and schemes padded with synthetic tips
+
+Usage: python benchmarks/bench_retrieval.py [--tips 50000] [--queries 2000]
+"""
+
+import argparse
+import itertools
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--tips', type=int, default=50000)
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--new', type=int, default=500)
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp())
+    import app
+    import retrieval
+    import seed_data
+    app.init_db()
+    seed_data.seed_database()
+    conn = app.get_db()
+
+    # Synthetic tips drawn Zipf-like from the seeded vocabulary
+    vocabulary = sorted({token for row in conn.execute('SELECT title, content FROM farming_tips')
+                         for token in retrieval.tokenize(row['title'] + ' ' + row['content'])})
+    rng = random.Random(1)
+    vocabulary += [''.join(rng.choices('abcdefghijklmnop', k=7)) for _ in range(20000)]
+    weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(vocabulary))))
+
+    def tips(count):
+        return [(' '.join(rng.choices(vocabulary, cum_weights=weights, k=4)), 'Crops',
+                 ' '.join(rng.choices(vocabulary, cum_weights=weights, k=40)), 'en') for _ in range(count)]
+
+    insert = 'INSERT INTO farming_tips (title, category, content, language) VALUES (?, ?, ?, ?)'
+    conn.executemany(insert, tips(args.tips))
+    conn.commit()
+
+    index = retrieval.KnowledgeIndex()
+    index.connect = app.get_db
+    index.versions = app.get_table_versions
+    start = time.perf_counter()
+    index.refresh(background=False)
+    print(f"\nfull build:          {len(index)} passages, {len(index.vocabulary)} terms "
+          f"in {time.perf_counter() - start:.2f}s")
+
+    conn.executemany(insert, tips(args.new))
+    conn.commit()
+    start = time.perf_counter()
+    index.refresh()
+    print(f"incremental refresh: {args.new} new tips in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    conn.execute('UPDATE farming_tips SET views = views + 1 WHERE id % 10 = 0')
+    conn.commit()
+    start = time.perf_counter()
+    index.refresh()
+    print(f"counter flush:       {(time.perf_counter() - start) * 1000:.1f} ms (no rebuild)")
+
+    questions = [' '.join(rng.choices(vocabulary, cum_weights=weights, k=rng.randint(3, 8)))
+                 for _ in range(args.queries)]
+    timings = []
+    for question in questions:
+        start = time.perf_counter()
+        index.search(question)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    print(f"search top-{retrieval.CONTEXT_PASSAGES}:        p50 {timings[len(timings) // 2] * 1000:.2f} ms, "
+          f"p95 {timings[int(len(timings) * 0.95)] * 1000:.2f} ms")
+
+    seeded = conn.execute('SELECT title, language FROM farming_tips ORDER BY id LIMIT 8').fetchall()
+    local = sum(retrieval.local_answer(index.search(row['title']), row['language']) is not None for row in seeded)
+    print(f"seeded tip titles:   {local}/{len(seeded)} answered locally")
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark for list-response serialization
+Compares the old fetchall + dict(row) + jsonify path with the streaming
+encoder (objects and compact fields+rows) under identity, gzip and brotli,
+reporting bytes on the wire and server CPU per response
+
+Usage: python benchmarks/bench_serialization.py [--rows 50 1000 10000]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import jsonify
+
+QUERY = '''
+    SELECT p.*, u.name as seller_name FROM products p JOIN users u ON p.seller_id = u.id
+    WHERE p.status = "active" ORDER BY p.created_at DESC LIMIT ?
+'''
+
+
+def cpu_ms(func, iterations):
+    start = time.process_time()
+    for _ in range(iterations):
+        body = func()
+    return (time.process_time() - start) / iterations * 1000, body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[50, 1000, 10000])
+    parser.add_argument('--iterations', type=int, default=20)
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp())
+    import app
+    import seed_data
+    import serialization
+    app.init_db()
+    seed_data.generate_database(users=1000, products=max(args.rows), posts=0, comments=0, messages=0,
+                                detections=0)
+    flask_app = app.create_app({'AUTO_INIT_DB': False})
+    print(f"JSON encoder: {'orjson' if serialization.orjson else 'json'}, "
+          f"brotli: {'yes' if serialization.brotli else 'no'}\n")
+
+    def baseline(limit):
+        conn = app.get_db()
+        cursor = conn.cursor()
+        cursor.execute(QUERY, (limit,))
+        rows = [dict(row) for row in cursor.fetchall()]
+        conn.close()
+        return jsonify(rows).get_data()
+
+    def streamed(limit):
+        conn = app.get_db()
+        return serialization.rows_response(conn, conn.cursor(), QUERY, (limit,)).get_data()
+
+    print(f"{'rows':>6} {'variant':10} {'encoding':9} {'bytes':>10} {'cpu ms':>9}")
+    for limit in args.rows:
+        iterations = max(1, args.iterations * 50 // max(limit, 50))
+        for variant, query_string, render in (('jsonify', '', baseline), ('stream', '', streamed),
+                                              ('compact', 'format=compact', streamed)):
+            with flask_app.test_request_context(f'/?{query_string}'):
+                encode_ms, body = cpu_ms(lambda: render(limit), iterations)
+            for encoding in (None, 'gzip', 'br'):
+                if encoding == 'br' and serialization.brotli is None:
+                    continue
+                extra_ms, wire = (0.0, body) if encoding is None else cpu_ms(
+                    lambda: serialization.compress(body, encoding), iterations)
+                print(f"{limit:6} {variant:10} {encoding or 'identity':9} {len(wire):10} {encode_ms + extra_ms:9.3f}")
+
+
+if __name__ == '__main__':
+    main()
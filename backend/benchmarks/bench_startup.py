@@ -0,0 +1,84 @@
+"""
+Cold-start benchmark for the backend
+Times `import app`, create_app() and the first request in fresh interpreters,
+and lists the slowest imports reported by `python -X importtime`
+
+Usage: python benchmarks/bench_startup.py [--runs 10] [--output startup.json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = '''
+import json, time
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+flask_app = app.create_app()
+t2 = time.perf_counter()
+flask_app.test_client().get('/api/health')
+t3 = time.perf_counter()
+print(json.dumps({'import_ms': (t1 - t0) * 1000, 'create_app_ms': (t2 - t1) * 1000,
+                  'first_request_ms': (t3 - t2) * 1000}))
+'''
+
+
+def run_probe(workdir):
+    env = dict(os.environ, PYTHONPATH=BACKEND_DIR)
+    output = subprocess.check_output([sys.executable, '-c', PROBE], cwd=workdir, env=env, text=True)
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def slowest_imports(workdir, top):
+    env = dict(os.environ, PYTHONPATH=BACKEND_DIR)
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'],
+                            cwd=workdir, env=env, capture_output=True, text=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        # "import time:  self [us] | cumulative | imported package"
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append((int(cumulative_us), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--output', help='write results as JSON for tracking over time')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    run_probe(workdir)  # warm the bytecode cache; later runs measure a warm-disk cold start
+    runs = [run_probe(workdir) for _ in range(args.runs)]
+
+    result = {}
+    for key in ('import_ms', 'create_app_ms', 'first_request_ms'):
+        values = [r[key] for r in runs]
+        result[key] = {'median': round(statistics.median(values), 2), 'min': round(min(values), 2),
+                       'max': round(max(values), 2)}
+        print(f"{key:18} median {result[key]['median']:8.2f} ms  (min {result[key]['min']:.2f}, "
+              f"max {result[key]['max']:.2f})")
+
+    result['slowest_imports'] = [{'module': name, 'cumulative_ms': round(us / 1000, 2)}
+                                 for us, name in slowest_imports(workdir, args.top)]
+    print("\nslowest imports (cumulative):")
+    for entry in result['slowest_imports']:
+        print(f"  {entry['cumulative_ms']:8.2f} ms  {entry['module']}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Benchmark for delta sync
+Compares the bytes a client downloads for a full sync against a sync after a
+simulated day of activity, both gzip-compressed as served
+
+Usage: python benchmarks/bench_sync.py [--posts 20000] [--products 20000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def fetch(client, url):
+    start = time.perf_counter()
+    response = client.get(url, headers={'Accept-Encoding': 'gzip'})
+    body = response.get_data()
+    elapsed = time.perf_counter() - start
+    return response, len(body), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--posts', type=int, default=20000)
+    parser.add_argument('--products', type=int, default=20000)
+    parser.add_argument('--comments', type=int, default=50000)
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp())
+    import app
+    import seed_data
+    app.init_db()
+    seed_data.seed_database()
+    seed_data.generate_database(users=args.users, products=args.products, posts=args.posts,
+                                comments=args.comments, messages=0, detections=0)
+    client = app.create_app().test_client()
+
+    response, size, elapsed = fetch(client, '/api/sync')
+    full = client.get('/api/sync').get_json()
+    since = full['seq']
+    counts = {domain: len(data['rows']) for domain, data in full['domains'].items()}
+    print(f"\nfull sync:   {size / 1024:9.1f} KB gzip in {elapsed * 1000:6.0f} ms  {counts}")
+
+    # A day away: new posts and comments, repriced and sold products, removed posts
+    rng = random.Random(1)
+    conn = app.get_db()
+    conn.executemany('INSERT INTO forum_posts (user_id, title, content, category) VALUES (?, ?, ?, ?)',
+                     [(rng.randint(1, args.users), f'Question {i}', 'Leaves turning yellow after rain, what to do?',
+                       'Crops') for i in range(100)])
+    conn.executemany('INSERT INTO forum_comments (post_id, user_id, content) VALUES (?, ?, ?)',
+                     [(rng.randint(1, args.posts), rng.randint(1, args.users), 'Try neem oil spray')
+                      for _ in range(400)])
+    conn.executemany('UPDATE products SET price = price * 1.05 WHERE id = ?',
+                     [(rng.randint(1, args.products),) for _ in range(200)])
+    conn.executemany("UPDATE products SET status = 'sold' WHERE id = ?",
+                     [(rng.randint(1, args.products),) for _ in range(50)])
+    conn.executemany('DELETE FROM forum_posts WHERE id = ?', [(rng.randint(1, args.posts),) for _ in range(20)])
+    conn.executemany('UPDATE forum_posts SET views = views + 1 WHERE id = ?',
+                     [(rng.randint(1, args.posts),) for _ in range(5000)])
+    conn.commit()
+    conn.close()
+
+    response, size, elapsed = fetch(client, f'/api/sync?since={since}')
+    delta = client.get(f'/api/sync?since={since}').get_json()
+    counts = {domain: (len(data['rows']), len(data['deleted'])) for domain, data in delta['domains'].items()}
+    print(f"delta sync:  {size / 1024:9.1f} KB gzip in {elapsed * 1000:6.0f} ms  {counts} (changed, deleted)")
+
+
+if __name__ == '__main__':
+    main()
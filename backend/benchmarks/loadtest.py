@@ -0,0 +1,291 @@
+"""
+Load-test harness for the AgriSmart API
+Drives the Flask endpoints and Socket.IO chat events with a weighted,
+seeded request mix and reports throughput and p50/p95/p99 latency per route
+
+In-process (default) it runs the real app through Flask/Socket.IO test
+clients against a scratch database, optionally generated at scale first.
+With --url it targets a running server over HTTP and Socket.IO instead.
+
+Usage:
+    python benchmarks/loadtest.py --generate --users 100000 --requests 20000 \\
+        --output baseline.json
+    python benchmarks/loadtest.py --db-dir /tmp/lt --requests 20000 --compare baseline.json
+    python benchmarks/loadtest.py --url http://localhost:5000 --concurrency 16
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# (weight, label, method, path, needs_auth)
+SCENARIOS = [
+    (15, 'GET /api/products', 'GET', '/api/products', False),
+    (5, 'GET /api/products?search', 'GET', '/api/products?search=wheat', False),
+    (5, 'GET /api/products?category', 'GET', '/api/products?category=Grains', False),
+    (10, 'GET /api/tips', 'GET', '/api/tips', False),
+    (10, 'GET /api/schemes', 'GET', '/api/schemes', False),
+    (5, 'GET /api/schemes/for-me', 'GET', '/api/schemes/for-me', True),
+    (15, 'GET /api/forum/posts', 'GET', '/api/forum/posts', False),
+    (5, 'GET /api/forum/posts?category', 'GET', '/api/forum/posts?category=Crops', False),
+    (10, 'GET /api/dashboard/stats', 'GET', '/api/dashboard/stats', True),
+    (5, 'GET /api/products/<id>/reviews', 'GET', '/api/products/{product_id}/reviews', False),
+    (3, 'POST /api/products/<id>/reviews', 'POST', '/api/products/{product_id}/reviews', True),
+    (2, 'POST /api/forum/posts', 'POST', '/api/forum/posts', True),
+    (10, 'SOCKET send_message', 'SOCKET', 'send_message', True),
+]
+
+
+class InProcessTransport:
+    """Runs requests through the app's own test clients"""
+
+    def __init__(self, app, socketio):
+        self.app = app
+        self.socketio = socketio
+        self.local = threading.local()
+
+    def _client(self):
+        if not hasattr(self.local, 'client'):
+            self.local.client = self.app.test_client()
+        return self.local.client
+
+    def request(self, method, path, headers=None, body=None):
+        response = self._client().open(path, method=method, headers=headers, json=body)
+        return response.status_code, response.get_json(silent=True)
+
+    def socket(self):
+        if not hasattr(self.local, 'socket'):
+            self.local.socket = self.socketio.test_client(self.app, flask_test_client=self._client())
+            self.local.socket.emit('join', {'room': 'general'})
+        return self.local.socket
+
+    def send_message(self, payload):
+        client = self.socket()
+        client.emit('send_message', payload)
+        return any(event['name'] == 'new_message' for event in client.get_received())
+
+
+class HttpTransport:
+    """Runs requests against a live server"""
+
+    def __init__(self, base_url):
+        import requests
+        self.requests = requests
+        self.base_url = base_url.rstrip('/')
+        self.local = threading.local()
+
+    def _session(self):
+        if not hasattr(self.local, 'session'):
+            self.local.session = self.requests.Session()
+        return self.local.session
+
+    def request(self, method, path, headers=None, body=None):
+        response = self._session().request(method, self.base_url + path, headers=headers, json=body, timeout=30)
+        try:
+            return response.status_code, response.json()
+        except ValueError:
+            return response.status_code, None
+
+    def socket(self):
+        if not hasattr(self.local, 'socket'):
+            import socketio
+            client = socketio.Client()
+            received = threading.Event()
+            client.on('new_message', lambda data: received.set())
+            client.connect(self.base_url)
+            client.emit('join', {'room': 'general'})
+            self.local.socket = (client, received)
+        return self.local.socket
+
+    def send_message(self, payload):
+        client, received = self.socket()
+        received.clear()
+        client.emit('send_message', payload)
+        return received.wait(timeout=10)
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100
+    lower = int(k)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (k - lower)
+
+
+def summarize(samples, wall_seconds):
+    latencies = sorted(s for s, _ in samples)
+    errors = sum(1 for _, ok in samples if not ok)
+    return {
+        'count': len(samples),
+        'errors': errors,
+        'throughput_rps': round(len(samples) / wall_seconds, 1) if wall_seconds else 0.0,
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+def create_accounts(transport, count, run_id):
+    accounts = []
+    for i in range(count):
+        status, body = transport.request('POST', '/api/auth/register', body={
+            'name': f'Load Test {i}', 'email': f'lt-{run_id}-{i}@example.com', 'password': 'password123',
+            'location': 'Ludhiana, Punjab', 'farm_size': 3,
+        })
+        if status != 201:
+            raise SystemExit(f"Could not register load-test account: {status} {body}")
+        accounts.append(({'Authorization': f"Bearer {body['access_token']}"}, body['user']['id']))
+    return accounts
+
+
+def run_load(transport, total, concurrency, seed, accounts, product_ids):
+    weights = [s[0] for s in SCENARIOS]
+    samples = {s[1]: [] for s in SCENARIOS}
+    lock = threading.Lock()
+
+    def worker(index, count):
+        rng = random.Random(seed * 1000 + index)
+        local = {label: [] for label in samples}
+        for _ in range(count):
+            _, label, method, path, needs_auth = rng.choices(SCENARIOS, weights=weights)[0]
+            headers, user_id = rng.choice(accounts) if needs_auth else (None, None)
+            path = path.format(product_id=rng.choice(product_ids) if product_ids else 1)
+            start = time.perf_counter()
+            try:
+                if method == 'SOCKET':
+                    ok = transport.send_message({'room': 'general', 'message': 'load test', 'user_id': user_id})
+                elif method == 'POST' and 'reviews' in path:
+                    ok = transport.request(method, path, headers, {'rating': rng.randint(1, 5), 'comment': 'ok'})[0] < 400
+                elif method == 'POST':
+                    ok = transport.request(method, path, headers, {
+                        'title': 'Load test question', 'content': 'How much water does wheat need?'
+                    })[0] < 400
+                else:
+                    ok = transport.request(method, path, headers)[0] < 400
+            except Exception:
+                ok = False
+            local[label].append((time.perf_counter() - start, ok))
+        with lock:
+            for label, values in local.items():
+                samples[label].extend(values)
+
+    per_worker = [total // concurrency + (1 if i < total % concurrency else 0) for i in range(concurrency)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, range(concurrency), per_worker))
+    wall = time.perf_counter() - start
+
+    routes = {label: summarize(values, wall) for label, values in samples.items() if values}
+    overall = summarize([s for values in samples.values() for s in values], wall)
+    return routes, overall, wall
+
+
+def compare(result, baseline_path, threshold):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nComparison against {baseline_path} (regression threshold {threshold:.0%}):")
+    regressions = 0
+    for label, stats in result['routes'].items():
+        old = baseline.get('routes', {}).get(label)
+        if not old or not old['p95_ms']:
+            continue
+        change = (stats['p95_ms'] - old['p95_ms']) / old['p95_ms']
+        flag = 'REGRESSION' if change > threshold else ''
+        regressions += bool(flag)
+        print(f"  {label:36} p95 {old['p95_ms']:9.2f} -> {stats['p95_ms']:9.2f} ms ({change:+.1%}) {flag}")
+    return regressions
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=BACKEND_DIR, text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='AgriSmart load-test harness')
+    parser.add_argument('--url', help='target a running server instead of the in-process app')
+    parser.add_argument('--db-dir', help='directory holding agrismart.db for in-process runs')
+    parser.add_argument('--generate', action='store_true', help='generate synthetic data before the run')
+    parser.add_argument('--users', type=int, default=10000, help='generated users; other tables scale from it')
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--accounts', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write the machine-readable baseline JSON here')
+    parser.add_argument('--compare', help='baseline JSON to compare p95 latencies against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='p95 increase that counts as a regression')
+    args = parser.parse_args()
+    if args.generate and args.users < 1:
+        parser.error('--users must be at least 1')
+    # The in-process mode changes into the database directory below
+    output = os.path.abspath(args.output) if args.output else None
+    baseline = os.path.abspath(args.compare) if args.compare else None
+
+    if args.url:
+        transport = HttpTransport(args.url)
+    else:
+        os.chdir(args.db_dir or tempfile.mkdtemp())
+        import app
+        app.init_db()
+        if args.generate:
+            import seed_data
+            seed_data.seed_database()
+            seed_data.generate_database(
+                users=args.users, products=args.users * 2, posts=args.users * 2,
+                comments=args.users * 10, messages=args.users * 10, detections=args.users * 5,
+                seed=args.seed,
+            )
+        transport = InProcessTransport(app.create_app({'AUTO_INIT_DB': False}), app.socketio)
+
+    accounts = create_accounts(transport, args.accounts, f'{int(time.time())}-{os.getpid()}')
+    status, products = transport.request('GET', '/api/products')
+    product_ids = [p['id'] for p in products] if status == 200 and isinstance(products, list) else []
+
+    routes, overall, wall = run_load(transport, args.requests, args.concurrency, args.seed, accounts, product_ids)
+    result = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'commit': git_commit(),
+            'mode': 'http' if args.url else 'in-process',
+            'target': args.url,
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+            'seed': args.seed,
+            'python': platform.python_version(),
+            'wall_seconds': round(wall, 3),
+        },
+        'overall': overall,
+        'routes': routes,
+    }
+
+    print(f"{'route':36} {'count':>7} {'err':>5} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for label, stats in sorted(routes.items()) + [('TOTAL', overall)]:
+        print(f"{label:36} {stats['count']:7} {stats['errors']:5} {stats['throughput_rps']:8.1f} "
+              f"{stats['p50_ms']:9.2f} {stats['p95_ms']:9.2f} {stats['p99_ms']:9.2f}")
+
+    if output:
+        with open(output, 'w') as f:
+            json.dump(result, f, indent=2)
+        print(f"\nBaseline written to {output}")
+    if baseline and compare(result, baseline, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
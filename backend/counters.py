@@ -0,0 +1,234 @@
+"""
+AgriSmart 2.0 - Write-coalescing Counters
+View and like counters for forum posts and farming tips
+
+Requests only touch memory: views add to a per-item delta, likes are checked
+against a compact per-item set of user ids and queued. A daemon thread
+flushes everything every few seconds (and once more at exit) in a single
+transaction, so a burst of page views costs one UPDATE per item per flush
+instead of one write lock per view.
+
+Like counts are recomputed from the likes table for the items touched in a
+flush, so they stay exact even when several workers accept likes for the
+same item. Hourly view/like buckets written by the flush feed trending.
+"""
+
+from array import array
+import atexit
+from bisect import bisect_left
+from collections import Counter, OrderedDict
+import logging
+import os
+import threading
+import time
+
+import metrics
+
+KINDS = {'post': 'forum_posts', 'tip': 'farming_tips'}
+FLUSH_SECONDS = 5.0
+MAX_CACHED_ITEMS = 10000
+TRENDING_RETENTION_HOURS = 72
+LIKE_WEIGHT = 5
+
+logger = logging.getLogger('agrismart.counters')
+metrics.registry.describe('counter_flushes_total', 'counter', 'Counter accumulator flushes by outcome')
+metrics.registry.describe('counter_flush_duration_seconds', 'histogram', 'Time to write one counter flush')
+metrics.registry.describe('counter_pending_items', 'gauge', 'Items with unflushed view or like changes')
+
+
+def init_tables(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS likes (
+            kind TEXT NOT NULL,
+            item_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (kind, item_id, user_id)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS counter_windows (
+            kind TEXT NOT NULL,
+            hour INTEGER NOT NULL,
+            item_id INTEGER NOT NULL,
+            views INTEGER NOT NULL DEFAULT 0,
+            likes INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (kind, hour, item_id)
+        ) WITHOUT ROWID
+    ''')
+
+
+class UserSet:
+    """Sorted array of 32-bit user ids: 4 bytes per member, O(log n) lookups"""
+
+    __slots__ = ('ids',)
+
+    def __init__(self, ids=()):
+        self.ids = array('I', sorted(ids))
+
+    def __contains__(self, user_id):
+        index = bisect_left(self.ids, user_id)
+        return index < len(self.ids) and self.ids[index] == user_id
+
+    def add(self, user_id):
+        index = bisect_left(self.ids, user_id)
+        if index < len(self.ids) and self.ids[index] == user_id:
+            return False
+        self.ids.insert(index, user_id)
+        return True
+
+    def discard(self, user_id):
+        index = bisect_left(self.ids, user_id)
+        if index < len(self.ids) and self.ids[index] == user_id:
+            del self.ids[index]
+            return True
+        return False
+
+
+class CounterAccumulator:
+    """Per-process accumulator. ``connect`` returns a new database connection;
+    app.py wires it to get_db()."""
+
+    def __init__(self, interval=FLUSH_SECONDS):
+        self.interval = interval
+        self.connect = None
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.views = Counter()    # (kind, item_id) -> views since last flush
+        self.likes = {}           # (kind, item_id, user_id) -> True (like) / False (unlike)
+        self.like_deltas = Counter()  # (kind, item_id) -> net likes since last flush, for trending
+        self.likers = OrderedDict()   # (kind, item_id) -> UserSet, LRU
+        self._pid = None
+
+    def _ensure_flusher(self):
+        # Started lazily so importing stays side-effect free, and again in
+        # each forked worker (threads do not survive fork)
+        if self._pid == os.getpid():
+            return
+        with self.lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name='counter-flusher', daemon=True).start()
+            atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('counter flush failed; deltas kept for the next attempt')
+
+    def view(self, kind, item_id):
+        self._ensure_flusher()
+        with self.lock:
+            self.views[(kind, item_id)] += 1
+
+    def _likers(self, cursor, kind, item_id):
+        """The item's UserSet, loading it (outside the lock) on a cache miss"""
+        key = (kind, item_id)
+        with self.lock:
+            users = self.likers.get(key)
+            if users is not None:
+                self.likers.move_to_end(key)
+                return users
+        cursor.execute('SELECT user_id FROM likes WHERE kind = ? AND item_id = ?', key)
+        loaded = UserSet(row[0] for row in cursor.fetchall())
+        with self.lock:
+            users = self.likers.get(key)
+            if users is None:
+                users = self.likers[key] = loaded
+                for (pending_kind, pending_item, user_id), liked in self.likes.items():
+                    if (pending_kind, pending_item) == key:
+                        (users.add if liked else users.discard)(user_id)
+                while len(self.likers) > MAX_CACHED_ITEMS:
+                    self.likers.popitem(last=False)
+            return users
+
+    def like(self, cursor, kind, item_id, user_id, liked=True):
+        """Like (or unlike) once per user; returns (changed, net likes pending
+        for the item in this process)"""
+        self._ensure_flusher()
+        users = self._likers(cursor, kind, item_id)
+        with self.lock:
+            changed = users.add(user_id) if liked else users.discard(user_id)
+            if changed:
+                self.likes[(kind, item_id, user_id)] = liked
+                self.like_deltas[(kind, item_id)] += 1 if liked else -1
+            return changed, self.like_deltas.get((kind, item_id), 0)
+
+    def pending(self):
+        with self.lock:
+            return len(self.views.keys() | self.like_deltas.keys())
+
+    def flush(self):
+        """Write all pending deltas in one transaction; returns items written"""
+        if self.connect is None:
+            return 0
+        with self.flush_lock:
+            with self.lock:
+                views, self.views = self.views, Counter()
+                likes, self.likes = self.likes, {}
+                like_deltas, self.like_deltas = self.like_deltas, Counter()
+            if not views and not likes:
+                return 0
+
+            start = time.perf_counter()
+            conn = self.connect()
+            try:
+                self._write(conn, views, likes, like_deltas)
+            except Exception:
+                conn.rollback()
+                with self.lock:
+                    self.views.update(views)
+                    self.like_deltas.update(like_deltas)
+                    for key, liked in likes.items():
+                        self.likes.setdefault(key, liked)
+                metrics.registry.inc('counter_flushes_total', (('outcome', 'error'),))
+                raise
+            finally:
+                conn.close()
+            metrics.registry.observe('counter_flush_duration_seconds', time.perf_counter() - start)
+            metrics.registry.inc('counter_flushes_total', (('outcome', 'ok'),))
+            return len(views.keys() | like_deltas.keys())
+
+    def _write(self, conn, views, likes, like_deltas):
+        cursor = conn.cursor()
+        for kind, table in KINDS.items():
+            cursor.executemany(f'UPDATE {table} SET views = views + ? WHERE id = ?',
+                               [(count, item_id) for (k, item_id), count in views.items() if k == kind])
+        cursor.executemany('INSERT OR IGNORE INTO likes (kind, item_id, user_id) VALUES (?, ?, ?)',
+                           [key for key, liked in likes.items() if liked])
+        cursor.executemany('DELETE FROM likes WHERE kind = ? AND item_id = ? AND user_id = ?',
+                           [key for key, liked in likes.items() if not liked])
+        for kind, table in KINDS.items():
+            cursor.executemany(f'''
+                UPDATE {table} SET likes = (SELECT COUNT(*) FROM likes WHERE kind = ? AND item_id = ?)
+                WHERE id = ?
+            ''', [(kind, item_id, item_id) for (k, item_id) in {key[:2] for key in likes} if k == kind])
+
+        hour = int(time.time() // 3600)
+        cursor.executemany('''
+            INSERT INTO counter_windows (kind, hour, item_id, views, likes) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(kind, hour, item_id) DO UPDATE SET
+                views = views + excluded.views, likes = likes + excluded.likes
+        ''', [(kind, hour, item_id, views.get((kind, item_id), 0), like_deltas.get((kind, item_id), 0))
+              for kind, item_id in views.keys() | like_deltas.keys()])
+        cursor.execute('DELETE FROM counter_windows WHERE hour < ?', (hour - TRENDING_RETENTION_HOURS,))
+        conn.commit()
+
+
+def trending(cursor, kind, hours=24, limit=10):
+    """(item_id, views, likes, score) for the items with the most activity in
+    the last ``hours`` hours, weighting a like as LIKE_WEIGHT views"""
+    cursor.execute('''
+        SELECT item_id, SUM(views) AS views, SUM(likes) AS likes, SUM(views) + ? * SUM(likes) AS score
+        FROM counter_windows WHERE kind = ? AND hour > ?
+        GROUP BY item_id ORDER BY score DESC LIMIT ?
+    ''', (LIKE_WEIGHT, kind, int(time.time() // 3600) - hours, limit))
+    return [tuple(row) for row in cursor.fetchall()]
+
+
+accumulator = CounterAccumulator()
+metrics.registry.gauge_callback('counter_pending_items', accumulator.pending)
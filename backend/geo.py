@@ -0,0 +1,149 @@
+"""
+AgriSmart 2.0 - Offline Geocoding
+Resolves free-text user locations ('Ludhiana, Punjab', 'near Karnal') to
+coordinates and geohash cells using a bundled gazetteer of agricultural
+district towns, falling back to state centroids. No network calls.
+"""
+
+import re
+
+import schemes
+
+# town -> (state, latitude, longitude); district headquarters and market towns
+GAZETTEER = {
+    'ludhiana': ('Punjab', 30.90, 75.85), 'amritsar': ('Punjab', 31.63, 74.87),
+    'jalandhar': ('Punjab', 31.33, 75.58), 'patiala': ('Punjab', 30.34, 76.39),
+    'bathinda': ('Punjab', 30.21, 74.95), 'moga': ('Punjab', 30.82, 75.17),
+    'karnal': ('Haryana', 29.69, 76.99), 'hisar': ('Haryana', 29.15, 75.72),
+    'panipat': ('Haryana', 29.39, 76.97), 'rohtak': ('Haryana', 28.90, 76.61),
+    'ambala': ('Haryana', 30.38, 76.78), 'kurukshetra': ('Haryana', 29.97, 76.85),
+    'sirsa': ('Haryana', 29.53, 75.03),
+    'meerut': ('Uttar Pradesh', 28.98, 77.71), 'lucknow': ('Uttar Pradesh', 26.85, 80.95),
+    'varanasi': ('Uttar Pradesh', 25.32, 82.97), 'kanpur': ('Uttar Pradesh', 26.45, 80.33),
+    'agra': ('Uttar Pradesh', 27.18, 78.01), 'prayagraj': ('Uttar Pradesh', 25.44, 81.85),
+    'allahabad': ('Uttar Pradesh', 25.44, 81.85), 'gorakhpur': ('Uttar Pradesh', 26.76, 83.37),
+    'bareilly': ('Uttar Pradesh', 28.37, 79.43), 'aligarh': ('Uttar Pradesh', 27.88, 78.08),
+    'moradabad': ('Uttar Pradesh', 28.84, 78.77), 'saharanpur': ('Uttar Pradesh', 29.96, 77.55),
+    'muzaffarnagar': ('Uttar Pradesh', 29.47, 77.70), 'jhansi': ('Uttar Pradesh', 25.45, 78.57),
+    'patna': ('Bihar', 25.59, 85.14), 'gaya': ('Bihar', 24.79, 85.00),
+    'muzaffarpur': ('Bihar', 26.12, 85.39), 'bhagalpur': ('Bihar', 25.25, 86.97),
+    'darbhanga': ('Bihar', 26.15, 85.90), 'purnia': ('Bihar', 25.78, 87.47),
+    'indore': ('Madhya Pradesh', 22.72, 75.86), 'bhopal': ('Madhya Pradesh', 23.26, 77.41),
+    'jabalpur': ('Madhya Pradesh', 23.18, 79.99), 'gwalior': ('Madhya Pradesh', 26.22, 78.18),
+    'ujjain': ('Madhya Pradesh', 23.18, 75.78), 'sagar': ('Madhya Pradesh', 23.84, 78.74),
+    'jaipur': ('Rajasthan', 26.91, 75.79), 'kota': ('Rajasthan', 25.21, 75.86),
+    'jodhpur': ('Rajasthan', 26.24, 73.02), 'bikaner': ('Rajasthan', 28.02, 73.31),
+    'udaipur': ('Rajasthan', 24.59, 73.71), 'ajmer': ('Rajasthan', 26.45, 74.64),
+    'sri ganganagar': ('Rajasthan', 29.90, 73.88), 'alwar': ('Rajasthan', 27.55, 76.60),
+    'nashik': ('Maharashtra', 20.00, 73.79), 'pune': ('Maharashtra', 18.52, 73.86),
+    'nagpur': ('Maharashtra', 21.15, 79.09), 'mumbai': ('Maharashtra', 19.08, 72.88),
+    'aurangabad': ('Maharashtra', 19.88, 75.34), 'solapur': ('Maharashtra', 17.66, 75.91),
+    'kolhapur': ('Maharashtra', 16.70, 74.24), 'amravati': ('Maharashtra', 20.93, 77.75),
+    'ahmednagar': ('Maharashtra', 19.09, 74.74), 'jalgaon': ('Maharashtra', 21.01, 75.56),
+    'latur': ('Maharashtra', 18.40, 76.56), 'sangli': ('Maharashtra', 16.85, 74.58),
+    'rajkot': ('Gujarat', 22.30, 70.80), 'anand': ('Gujarat', 22.56, 72.95),
+    'ahmedabad': ('Gujarat', 23.02, 72.57), 'surat': ('Gujarat', 21.17, 72.83),
+    'vadodara': ('Gujarat', 22.31, 73.18), 'junagadh': ('Gujarat', 21.52, 70.46),
+    'bhavnagar': ('Gujarat', 21.76, 72.15), 'mehsana': ('Gujarat', 23.59, 72.37),
+    'guntur': ('Andhra Pradesh', 16.31, 80.44), 'vijayawada': ('Andhra Pradesh', 16.51, 80.65),
+    'visakhapatnam': ('Andhra Pradesh', 17.69, 83.22), 'kurnool': ('Andhra Pradesh', 15.83, 78.04),
+    'anantapur': ('Andhra Pradesh', 14.68, 77.60), 'nellore': ('Andhra Pradesh', 14.44, 79.99),
+    'warangal': ('Telangana', 17.97, 79.59), 'hyderabad': ('Telangana', 17.39, 78.49),
+    'karimnagar': ('Telangana', 18.44, 79.13), 'nizamabad': ('Telangana', 18.67, 78.09),
+    'khammam': ('Telangana', 17.25, 80.15), 'nalgonda': ('Telangana', 17.05, 79.27),
+    'mysuru': ('Karnataka', 12.30, 76.64), 'mysore': ('Karnataka', 12.30, 76.64),
+    'belagavi': ('Karnataka', 15.85, 74.50), 'belgaum': ('Karnataka', 15.85, 74.50),
+    'bengaluru': ('Karnataka', 12.97, 77.59), 'bangalore': ('Karnataka', 12.97, 77.59),
+    'hubballi': ('Karnataka', 15.36, 75.12), 'davangere': ('Karnataka', 14.46, 75.92),
+    'mandya': ('Karnataka', 12.52, 76.90), 'raichur': ('Karnataka', 16.21, 77.36),
+    'thanjavur': ('Tamil Nadu', 10.79, 79.14), 'coimbatore': ('Tamil Nadu', 11.02, 76.96),
+    'chennai': ('Tamil Nadu', 13.08, 80.27), 'madurai': ('Tamil Nadu', 9.93, 78.12),
+    'tiruchirappalli': ('Tamil Nadu', 10.79, 78.70), 'salem': ('Tamil Nadu', 11.66, 78.15),
+    'erode': ('Tamil Nadu', 11.34, 77.72), 'tirunelveli': ('Tamil Nadu', 8.71, 77.76),
+    'thrissur': ('Kerala', 10.53, 76.21), 'kochi': ('Kerala', 9.93, 76.27),
+    'thiruvananthapuram': ('Kerala', 8.52, 76.94), 'kozhikode': ('Kerala', 11.26, 75.78),
+    'palakkad': ('Kerala', 10.79, 76.65), 'alappuzha': ('Kerala', 9.50, 76.34),
+    'cuttack': ('Odisha', 20.46, 85.88), 'bhubaneswar': ('Odisha', 20.30, 85.82),
+    'sambalpur': ('Odisha', 21.47, 83.97), 'balasore': ('Odisha', 21.49, 86.93),
+    'bardhaman': ('West Bengal', 23.23, 87.86), 'kolkata': ('West Bengal', 22.57, 88.36),
+    'siliguri': ('West Bengal', 26.73, 88.40), 'malda': ('West Bengal', 25.01, 88.14),
+    'guwahati': ('Assam', 26.14, 91.74), 'dibrugarh': ('Assam', 27.47, 94.91),
+    'jorhat': ('Assam', 26.75, 94.20), 'silchar': ('Assam', 24.83, 92.78),
+    'raipur': ('Chhattisgarh', 21.25, 81.63), 'bilaspur': ('Chhattisgarh', 22.08, 82.15),
+    'ranchi': ('Jharkhand', 23.34, 85.31), 'dhanbad': ('Jharkhand', 23.80, 86.43),
+    'dehradun': ('Uttarakhand', 30.32, 78.03), 'haridwar': ('Uttarakhand', 29.95, 78.16),
+    'rudrapur': ('Uttarakhand', 28.98, 79.40), 'shimla': ('Himachal Pradesh', 31.10, 77.17),
+    'mandi': ('Himachal Pradesh', 31.71, 76.93), 'srinagar': ('Jammu and Kashmir', 34.08, 74.80),
+    'jammu': ('Jammu and Kashmir', 32.73, 74.86), 'panaji': ('Goa', 15.50, 73.83),
+    'delhi': ('Delhi', 28.61, 77.21), 'new delhi': ('Delhi', 28.61, 77.21),
+}
+
+STATE_CENTROIDS = {
+    'Andhra Pradesh': (15.9, 79.7), 'Arunachal Pradesh': (28.2, 94.7), 'Assam': (26.2, 92.9),
+    'Bihar': (25.6, 85.6), 'Chhattisgarh': (21.3, 81.9), 'Goa': (15.4, 74.0), 'Gujarat': (22.3, 71.2),
+    'Haryana': (29.1, 76.1), 'Himachal Pradesh': (31.9, 77.2), 'Jharkhand': (23.6, 85.3),
+    'Karnataka': (15.3, 75.7), 'Kerala': (10.4, 76.3), 'Madhya Pradesh': (23.5, 78.6),
+    'Maharashtra': (19.5, 75.7), 'Manipur': (24.7, 93.9), 'Meghalaya': (25.5, 91.4),
+    'Mizoram': (23.2, 92.9), 'Nagaland': (26.2, 94.6), 'Odisha': (20.5, 84.4), 'Punjab': (30.9, 75.4),
+    'Rajasthan': (26.6, 73.8), 'Sikkim': (27.5, 88.5), 'Tamil Nadu': (11.1, 78.7),
+    'Telangana': (17.9, 79.0), 'Tripura': (23.9, 91.9), 'Uttar Pradesh': (26.8, 80.9),
+    'Uttarakhand': (30.1, 79.0), 'West Bengal': (23.0, 87.8), 'Delhi': (28.6, 77.2),
+    'Jammu and Kashmir': (33.7, 75.1), 'Ladakh': (34.2, 77.6), 'Puducherry': (11.9, 79.8),
+}
+
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+_DECODE = {char: index for index, char in enumerate(_BASE32)}
+_TOWN_PATTERN = re.compile(r'\b(' + '|'.join(sorted(map(re.escape, GAZETTEER), key=len, reverse=True)) + r')\b',
+                           re.IGNORECASE)
+
+
+def geocode(location):
+    """(state, latitude, longitude) for a free-text location, or None.
+    A known town wins unless the text names a different state (so 'Azadpur
+    Mandi, Delhi' is not Mandi in Himachal); otherwise the state centroid."""
+    state = schemes.state_from_location(location)
+    for match in _TOWN_PATTERN.finditer(location or ''):
+        entry = GAZETTEER[match.group(1).lower()]
+        if state is None or entry[0] == state:
+            return entry
+    if state in STATE_CENTROIDS:
+        return (state,) + STATE_CENTROIDS[state]
+    return None
+
+
+def encode(latitude, longitude, precision=5):
+    """Standard base-32 geohash"""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        interval, coordinate = (lon_range, longitude) if even else (lat_range, latitude)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits, value = 0, 0
+    return ''.join(chars)
+
+
+def decode(geohash):
+    """Centre (latitude, longitude) of a geohash cell"""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        value = _DECODE[char]
+        for shift in range(4, -1, -1):
+            interval = lon_range if even else lat_range
+            middle = (interval[0] + interval[1]) / 2
+            if value >> shift & 1:
+                interval[0] = middle
+            else:
+                interval[1] = middle
+            even = not even
+    return (lat_range[0] + lat_range[1]) / 2, (lon_range[0] + lon_range[1]) / 2
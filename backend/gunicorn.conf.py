@@ -0,0 +1,53 @@
+"""
+AgriSmart 2.0 - Production server configuration
+Cooperative gevent workers: each waiting upstream call (weather, OpenAI,
+ElevenLabs) parks a greenlet instead of a thread, so one process holds
+thousands of slow requests and Socket.IO connections open.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+gevent monkey-patches sockets, so requests/httpx calls yield while they wait;
+SQLite calls go to gevent's thread pool (see metrics.offload). On SIGTERM a
+worker stops accepting connections, finishes in-flight requests for up to
+GRACEFUL_TIMEOUT seconds and flushes buffered counters before exiting.
+
+Socket.IO long-polling needs every request of a session to reach the same
+worker: with WEB_CONCURRENCY > 1 run behind a load balancer with sticky
+sessions (or one port per worker) and set SOCKETIO_MESSAGE_QUEUE so events
+reach clients connected to other workers.
+"""
+
+import logging
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', 1))
+worker_class = 'gevent'
+worker_connections = int(os.getenv('WORKER_CONNECTIONS', 1000))
+graceful_timeout = int(os.getenv('GRACEFUL_TIMEOUT', 30))
+timeout = 60
+keepalive = 5
+accesslog = '-'
+
+os.environ.setdefault('SOCKETIO_ASYNC_MODE', 'gevent')
+
+
+def on_starting(server):
+    if workers > 1 and not os.getenv('SOCKETIO_MESSAGE_QUEUE'):
+        logging.getLogger('gunicorn.error').warning(
+            'WEB_CONCURRENCY=%d without SOCKETIO_MESSAGE_QUEUE: Socket.IO events only reach '
+            'clients connected to the worker that emits them', workers)
+
+
+def post_worker_init(worker):
+    import gevent
+    import metrics
+    metrics.offload = gevent.get_hub().threadpool.apply
+
+
+def worker_exit(server, worker):
+    import counters
+    try:
+        counters.accumulator.flush()
+    except Exception:
+        server.log.exception('counter flush on shutdown failed')
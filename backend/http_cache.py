@@ -0,0 +1,157 @@
+"""
+AgriSmart 2.0 - HTTP Response Cache
+Serialized-response LRU for read-mostly GET endpoints, with strong ETags,
+304 Not Modified handling and Cache-Control headers
+
+Entries are keyed on the endpoint and its normalized query arguments and
+stamped with the table_versions counters of the tables the response reads.
+Any write to those tables (in any worker) bumps a counter through a trigger,
+so the next request sees a stale stamp and re-renders. Checking freshness is
+one indexed lookup instead of the full query plus JSON serialization.
+Responses that include counters written without a version bump (views,
+likes) also set a ttl, after which they are re-rendered regardless.
+"""
+
+from collections import OrderedDict
+from functools import wraps
+import hashlib
+import threading
+import time
+
+from flask import current_app, request, Response
+
+import metrics
+import serialization
+
+MAX_ENTRIES = 1024
+MAX_BYTES = 32 * 1024 * 1024
+
+metrics.registry.describe('http_cache_requests_total', 'counter', 'Cached GET requests by route and result')
+metrics.registry.describe('http_cache_bytes', 'gauge', 'Serialized response bytes held by the HTTP cache')
+
+
+class ResponseCache:
+    """Thread-safe LRU of (versions, etag, body, mimetype, encoded, stored)
+    by cache key, where ``encoded`` holds compressed bodies filled in on
+    demand and ``stored`` is the monotonic time the entry was rendered.
+
+    ``versions`` is a callable taking a tuple of table names and returning
+    their current version counters in the same order; app.py wires it to
+    the table_versions table.
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.versions = None
+
+    def get(self, key, versions, ttl=None):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] != versions:
+                return None
+            if ttl is not None and time.monotonic() - entry[5] > ttl:
+                return None
+            self.entries.move_to_end(key)
+            return entry
+
+    def put(self, key, versions, body, mimetype):
+        if len(body) > self.max_bytes:
+            return None
+        entry = (versions, hashlib.blake2b(body, digest_size=16).hexdigest(), body, mimetype, {}, time.monotonic())
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.bytes -= _size(old)
+            self.entries[key] = entry
+            self.bytes += len(body)
+            self._evict()
+        return entry
+
+    def encoded(self, key, entry, encoding):
+        """The entry's body compressed with ``encoding``, computed once"""
+        body = entry[4].get(encoding)
+        if body is None:
+            body = serialization.compress(entry[2], encoding)
+            with self.lock:
+                if encoding not in entry[4]:
+                    entry[4][encoding] = body
+                    if self.entries.get(key) is entry:
+                        self.bytes += len(body)
+                        self._evict()
+        return body
+
+    def _evict(self):
+        while self.entries and (len(self.entries) > self.max_entries or self.bytes > self.max_bytes):
+            _, evicted = self.entries.popitem(last=False)
+            self.bytes -= _size(evicted)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+
+def _size(entry):
+    return len(entry[2]) + sum(len(body) for body in entry[4].values())
+
+
+cache = ResponseCache()
+metrics.registry.gauge_callback('http_cache_bytes', lambda: cache.bytes)
+
+
+def cached(tables, args=None, max_age=60, ttl=None):
+    """Serve a GET endpoint from the response cache.
+
+    ``tables`` are the tables the response reads; ``args`` maps the query
+    arguments the view uses to their defaults, so ``?category=`` and a
+    missing category (or unrelated cache-busting args) share one entry.
+    ``ttl`` bounds how long an entry is served when its tables are
+    unchanged. Only 200 responses are cached.
+    """
+    tables = tuple(tables)
+    args = dict(serialization.FORMAT_ARGS, **(args or {}))
+    cache_control = f'public, max-age={max_age}'
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*view_args, **view_kwargs):
+            route = request.url_rule.rule if request.url_rule else request.path
+            key = (request.endpoint, tuple(sorted(view_kwargs.items())),
+                   tuple((name, request.args.get(name, default)) for name, default in sorted(args.items())))
+            versions = cache.versions(tables)
+
+            entry = cache.get(key, versions, ttl)
+            result = 'hit'
+            if entry is None:
+                result = 'miss'
+                response = current_app.make_response(view(*view_args, **view_kwargs))
+                if response.status_code != 200:
+                    return response
+                entry = cache.put(key, versions, response.get_data(), response.mimetype)
+                if entry is None:
+                    return response
+
+            # Each content coding is its own representation with its own strong ETag
+            etag, body, mimetype = entry[1], entry[2], entry[3]
+            encoding = serialization.negotiate() if len(body) >= serialization.MIN_COMPRESS_BYTES else None
+            if encoding:
+                etag = f'{etag}-{encoding}'
+            if request.if_none_match.contains(etag):
+                result = 'not_modified'
+                response = Response(status=304)
+            else:
+                response = Response(cache.encoded(key, entry, encoding) if encoding else body, mimetype=mimetype)
+                if encoding:
+                    response.headers['Content-Encoding'] = encoding
+            response.set_etag(etag)
+            response.vary.add('Accept-Encoding')
+            response.headers['Cache-Control'] = cache_control
+            metrics.registry.inc('http_cache_requests_total', (('route', route), ('result', result)))
+            return response
+        return wrapper
+    return decorator
+
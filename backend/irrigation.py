@@ -0,0 +1,322 @@
+"""
+AgriSmart 2.0 - Irrigation Planning Engine
+Vectorized crop water requirement and scheduling (FAO-56 crop coefficients)
+"""
+
+from datetime import date, datetime, timedelta
+import base64
+import json
+import math
+
+import numpy as np
+
+# Crop coefficient tables (FAO-56): Kc for initial/mid/end stages, stage
+# lengths in days (initial, development, mid-season, late), effective root
+# depth in metres and the fraction of available water that can be depleted
+# before the crop is stressed.
+CROPS = {
+    'wheat':     {'kc': (0.30, 1.15, 0.25), 'stages': (20, 25, 60, 30),   'root_depth': 1.2, 'depletion': 0.55},
+    'rice':      {'kc': (1.05, 1.20, 0.90), 'stages': (30, 30, 60, 30),   'root_depth': 0.5, 'depletion': 0.20},
+    'cotton':    {'kc': (0.35, 1.15, 0.70), 'stages': (30, 50, 55, 45),   'root_depth': 1.3, 'depletion': 0.65},
+    'sugarcane': {'kc': (0.40, 1.25, 0.75), 'stages': (35, 60, 190, 120), 'root_depth': 1.5, 'depletion': 0.65},
+    'tomato':    {'kc': (0.60, 1.15, 0.80), 'stages': (30, 40, 40, 25),   'root_depth': 0.9, 'depletion': 0.40},
+    'potato':    {'kc': (0.50, 1.15, 0.75), 'stages': (25, 30, 45, 30),   'root_depth': 0.5, 'depletion': 0.35},
+    'maize':     {'kc': (0.30, 1.20, 0.60), 'stages': (20, 35, 40, 30),   'root_depth': 1.2, 'depletion': 0.55},
+    'default':   {'kc': (0.50, 1.10, 0.70), 'stages': (25, 35, 40, 30),   'root_depth': 1.0, 'depletion': 0.50},
+}
+
+# Total available water (mm per metre of root zone) and a multiplier for
+# deep percolation losses
+SOILS = {
+    'sandy':   {'taw': 60,  'loss': 1.10},
+    'loamy':   {'taw': 140, 'loss': 1.00},
+    'silt':    {'taw': 170, 'loss': 1.00},
+    'clay':    {'taw': 200, 'loss': 1.05},
+    'default': {'taw': 140, 'loss': 1.00},
+}
+
+# Application efficiency per irrigation method
+METHODS = {
+    'drip': 0.90,
+    'sprinkler': 0.75,
+    'furrow': 0.60,
+    'flood': 0.60,
+    'default': 0.60,
+}
+
+DEFAULT_ET0 = 5.0            # mm/day reference evapotranspiration when no forecast is given
+EFFECTIVE_RAIN_FRACTION = 0.8
+LITERS_PER_MM_ACRE = 4046.86  # 1 mm of water over one acre
+SCHEDULE_SCALE = 10           # schedule depths are stored in 0.1 mm units
+SCHEDULE_VERSION = 2          # v2 also stores the daily ET0/rain inputs
+
+_CROP_NAMES = list(CROPS)
+_SOIL_NAMES = list(SOILS)
+_METHOD_NAMES = list(METHODS)
+
+
+def _build_kc_table():
+    """Daily Kc curve per crop, zero-padded to the longest season"""
+    max_days = max(sum(c['stages']) for c in CROPS.values())
+    table = np.zeros((len(CROPS), max_days), dtype=np.float32)
+    for i, crop in enumerate(CROPS.values()):
+        kc_ini, kc_mid, kc_end = crop['kc']
+        l_ini, l_dev, l_mid, l_late = crop['stages']
+        knots = np.cumsum([0, l_ini, l_dev, l_mid, l_late])
+        days = np.arange(knots[-1])
+        table[i, :knots[-1]] = np.interp(
+            days, knots, [kc_ini, kc_ini, kc_mid, kc_mid, kc_end]
+        )
+    return table
+
+
+_KC_TABLE = _build_kc_table()
+MAX_SEASON_DAYS = _KC_TABLE.shape[1]
+_SEASON_DAYS = np.array([sum(c['stages']) for c in CROPS.values()], dtype=np.int32)
+_RAW_BASE = np.array([c['root_depth'] * c['depletion'] for c in CROPS.values()], dtype=np.float32)
+_SOIL_TAW = np.array([s['taw'] for s in SOILS.values()], dtype=np.float32)
+_SOIL_LOSS = np.array([s['loss'] for s in SOILS.values()], dtype=np.float32)
+_METHOD_EFF = np.array(list(METHODS.values()), dtype=np.float32)
+
+
+def _lookup(names, keys):
+    index = {name: i for i, name in enumerate(keys)}
+    fallback = index['default']
+    return np.fromiter(
+        (index.get((name or '').lower(), fallback) for name in names),
+        dtype=np.int32, count=len(names)
+    )
+
+
+def season_days(crop_name):
+    crop = CROPS.get((crop_name or '').lower(), CROPS['default'])
+    return sum(crop['stages'])
+
+
+def et0_hargreaves(tmin, tmax, latitude, day_of_year):
+    """Reference evapotranspiration (mm/day) from daily min/max temperature.
+
+    Hargreaves equation with extraterrestrial radiation from FAO-56 eq. 21,
+    for forecasts that only carry temperatures. All arguments broadcast.
+    """
+    tmin = np.asarray(tmin, dtype=np.float64)
+    tmax = np.asarray(tmax, dtype=np.float64)
+    phi = np.radians(latitude)
+    angle = 2 * np.pi * np.asarray(day_of_year) / 365
+    dr = 1 + 0.033 * np.cos(angle)
+    delta = 0.409 * np.sin(angle - 1.39)
+    ws = np.arccos(np.clip(-np.tan(phi) * np.tan(delta), -1.0, 1.0))
+    ra = (24 * 60 / np.pi) * 0.0820 * dr * (
+        ws * np.sin(phi) * np.sin(delta) + np.cos(phi) * np.cos(delta) * np.sin(ws)
+    )
+    tmean = (tmin + tmax) / 2
+    et0 = 0.0023 * 0.408 * ra * (tmean + 17.8) * np.sqrt(np.maximum(tmax - tmin, 0.0))
+    return np.maximum(et0, 0.0).astype(np.float32)
+
+
+def _expand_series(series, n_plots, n_days, fill):
+    """Broadcast a per-day series (or per-plot matrix) to (n_plots, n_days).
+
+    Forecasts are shorter than a season, so days past the end of the series
+    fall back to ``fill``. Values are rounded to the stored 0.1 mm
+    resolution so a plan recomputed from its stored inputs comes out the same.
+    """
+    out = np.full((n_plots, n_days), fill, dtype=np.float32)
+    if series is None:
+        return out
+    arr = np.asarray(series, dtype=np.float32)
+    if arr.ndim == 1:
+        arr = arr[np.newaxis, :]
+    width = min(arr.shape[1], n_days)
+    out[:, :width] = np.rint(arr[:, :width] * SCHEDULE_SCALE) / SCHEDULE_SCALE
+    return out
+
+
+def plan_plots(crops, areas, soils, methods, et0=None, rain=None):
+    """Plan irrigation for a batch of plots in one vectorized pass.
+
+    ``crops``/``soils``/``methods`` are sequences of names, ``areas`` is in
+    acres. ``et0`` and ``rain`` are optional mm/day series, either shared by
+    every plot (1-D) or one row per plot (2-D), starting on the sowing day.
+
+    Returns a dict of arrays: ``daily`` (gross mm/day), ``events`` (gross mm
+    applied on irrigation days, zero elsewhere), ``season_days``,
+    ``total_mm``, ``total_liters`` and the ``et0``/``rain`` inputs used.
+    """
+    n = len(crops)
+    crop_idx = _lookup(crops, _CROP_NAMES)
+    soil_idx = _lookup(soils, _SOIL_NAMES)
+    method_idx = _lookup(methods, _METHOD_NAMES)
+    area = np.asarray(areas, dtype=np.float32)
+
+    days = _SEASON_DAYS[crop_idx]
+    n_days = int(days.max()) if n else 0
+
+    et0 = _expand_series(et0, n, n_days, DEFAULT_ET0)
+    rain = _expand_series(rain, n, n_days, 0.0)
+
+    # Crop evapotranspiration minus effective rainfall, zero after harvest
+    etc = _KC_TABLE[crop_idx, :n_days] * et0
+    net = np.maximum(etc - EFFECTIVE_RAIN_FRACTION * rain, 0.0)
+
+    gross_factor = (_SOIL_LOSS[soil_idx] / _METHOD_EFF[method_idx])[:, np.newaxis]
+    daily = net * gross_factor
+
+    # Irrigate whenever root-zone depletion reaches the readily available
+    # water. The day loop is sequential but every plot advances together.
+    raw = _RAW_BASE[crop_idx] * _SOIL_TAW[soil_idx]
+    depletion = np.zeros(n, dtype=np.float32)
+    events = np.zeros_like(daily)
+    for day in range(n_days):
+        depletion += net[:, day]
+        due = depletion >= raw
+        events[due, day] = depletion[due] * gross_factor[due, 0]
+        depletion[due] = 0.0
+
+    total_mm = daily.sum(axis=1)
+    return {
+        'daily': daily,
+        'events': events,
+        'season_days': days,
+        'total_mm': total_mm,
+        'total_liters': total_mm * area * LITERS_PER_MM_ACRE,
+        'et0': et0,
+        'rain': rain,
+    }
+
+
+def _pack(values):
+    scaled = np.rint(np.asarray(values) * SCHEDULE_SCALE)
+    return base64.b64encode(np.clip(scaled, 0, 65535).astype('<u2').tobytes()).decode('ascii')
+
+
+def _unpack(text):
+    return np.frombuffer(base64.b64decode(text), dtype='<u2').astype(np.float32) / SCHEDULE_SCALE
+
+
+def encode_schedule(start_date, daily, events, length, et0=None, rain=None):
+    """Serialize one plot's schedule as compact JSON for irrigation_plans.schedule.
+
+    Depths are stored as little-endian uint16 in 0.1 mm units, base64 encoded:
+    a 120-day season takes ~320 bytes instead of a JSON list of floats. The
+    ET0/rain inputs are kept too, so a re-plan only replaces forecast days.
+    """
+    daily = daily[:length]
+    event_days = np.flatnonzero(events[:length])
+    data = {
+        'v': SCHEDULE_VERSION,
+        'start': start_date.isoformat(),
+        'daily': _pack(daily),
+        'event_days': base64.b64encode(event_days.astype('<u2').tobytes()).decode('ascii'),
+        'event_mm': _pack(events[event_days]),
+    }
+    if et0 is not None:
+        data['et0'] = _pack(et0[:length])
+        data['rain'] = _pack(rain[:length])
+    return json.dumps(data, separators=(',', ':'))
+
+
+def schedule_inputs(schedule):
+    """Stored (et0, rain) series of a schedule, or None for v1 schedules"""
+    data = json.loads(schedule)
+    if 'et0' not in data:
+        return None
+    return _unpack(data['et0']), _unpack(data['rain'])
+
+
+def schedule_events(schedule):
+    """Irrigation events of a stored schedule as {day offset: depth in 0.1 mm}"""
+    data = json.loads(schedule)
+    event_days = np.frombuffer(base64.b64decode(data['event_days']), dtype='<u2')
+    event_mm = np.frombuffer(base64.b64decode(data['event_mm']), dtype='<u2')
+    return dict(zip(event_days.tolist(), event_mm.tolist()))
+
+
+def decode_schedule(schedule):
+    """Expand a stored schedule into a JSON-friendly structure"""
+    data = json.loads(schedule)
+    start = date.fromisoformat(data['start'])
+    daily = _unpack(data['daily'])
+    event_days = np.frombuffer(base64.b64decode(data['event_days']), dtype='<u2')
+    event_mm = _unpack(data['event_mm'])
+    return {
+        'start_date': start.isoformat(),
+        'daily_mm': [round(float(x), 1) for x in daily],
+        'irrigations': [
+            {'date': (start + timedelta(days=int(day))).isoformat(), 'day': int(day), 'depth_mm': round(float(mm), 1)}
+            for day, mm in zip(event_days, event_mm)
+        ],
+    }
+
+
+def next_irrigation(schedule, on_or_after):
+    """First irrigation event of a stored schedule on or after a date, or None"""
+    data = json.loads(schedule)
+    offset = (on_or_after - date.fromisoformat(data['start'])).days
+    event_days = np.frombuffer(base64.b64decode(data['event_days']), dtype='<u2')
+    upcoming = np.flatnonzero(event_days >= offset)
+    if not len(upcoming):
+        return None
+    i = upcoming[0]
+    return {
+        'date': (date.fromisoformat(data['start']) + timedelta(days=int(event_days[i]))).isoformat(),
+        'depth_mm': round(float(_unpack(data['event_mm'])[i]), 1),
+    }
+
+
+def _plot_area(plot):
+    """Area in acres, 1 when not given; ValueError unless positive"""
+    area = plot.get('area')
+    if area is None:
+        return 1.0
+    area = float(area)
+    if not math.isfinite(area) or area <= 0:
+        raise ValueError(f'area must be positive, got {area}')
+    return area
+
+
+def _plot_start(plot):
+    """Sowing date from an ISO string or date, today when not given"""
+    start = plot.get('start_date')
+    if start is None or start == '':
+        return date.today()
+    if isinstance(start, str):
+        return date.fromisoformat(start)
+    if isinstance(start, datetime):
+        return start.date()
+    if isinstance(start, date):
+        return start
+    raise ValueError(f'start_date must be an ISO date string, got {type(start).__name__}')
+
+
+def build_plans(plots, et0=None, rain=None):
+    """Plan and serialize a list of plot dicts (crop_name, area, soil_type,
+    irrigation_method, start_date). Returns one row dict per plot, ready for
+    the irrigation_plans table. Raises ValueError for a non-positive area or
+    a start_date that is neither an ISO string nor a date."""
+    areas = [_plot_area(p) for p in plots]
+    starts = [_plot_start(p) for p in plots]
+    result = plan_plots(
+        [p.get('crop_name') for p in plots],
+        areas,
+        [p.get('soil_type') for p in plots],
+        [p.get('irrigation_method') for p in plots],
+        et0=et0, rain=rain,
+    )
+    rows = []
+    for i, plot in enumerate(plots):
+        start = starts[i]
+        length = int(result['season_days'][i])
+        rows.append({
+            'crop_name': plot.get('crop_name'),
+            'area': areas[i],
+            'soil_type': plot.get('soil_type'),
+            'irrigation_method': plot.get('irrigation_method'),
+            'water_requirement': round(float(result['total_mm'][i]), 1),
+            'total_liters': round(float(result['total_liters'][i])),
+            'schedule': encode_schedule(start, result['daily'][i], result['events'][i], length,
+                                        result['et0'][i], result['rain'][i]),
+            'start_date': start.isoformat(),
+            'end_date': (start + timedelta(days=length - 1)).isoformat(),
+        })
+    return rows
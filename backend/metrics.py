@@ -0,0 +1,270 @@
+"""
+AgriSmart 2.0 - Metrics and Instrumentation
+In-process counters, gauges and latency histograms rendered in the
+Prometheus text exposition format
+
+Metrics are per process; with several workers, scrape each one (or put them
+behind a per-worker target) rather than expecting a global view.
+"""
+
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+import sqlite3
+import threading
+import time
+
+from flask import g, request
+
+# Latency buckets in seconds, from sub-millisecond queries to slow upstreams
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Registry:
+    """Counters, histograms and gauges keyed by (name, label tuple).
+
+    Each observation is a dict lookup plus a bisect under one lock, so the
+    per-request cost stays at a few microseconds.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.help = {}
+        self.counters = {}
+        self.histograms = {}
+        self.gauges = {}
+        self.gauge_callbacks = {}
+
+    def describe(self, name, kind, text):
+        self.help[name] = (kind, text)
+
+    def inc(self, name, labels=(), amount=1):
+        key = (name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def set_gauge(self, name, value, labels=()):
+        with self.lock:
+            self.gauges[(name, labels)] = value
+
+    def add_gauge(self, name, amount, labels=()):
+        key = (name, labels)
+        with self.lock:
+            self.gauges[key] = self.gauges.get(key, 0) + amount
+
+    def gauge_callback(self, name, func):
+        """Gauge sampled at scrape time; ``func`` returns a number"""
+        self.gauge_callbacks[name] = func
+
+    def observe(self, name, value, labels=()):
+        key = (name, labels)
+        index = bisect_left(BUCKETS, value)
+        with self.lock:
+            series = self.histograms.get(key)
+            if series is None:
+                series = self.histograms[key] = [[0] * (len(BUCKETS) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        with self.lock:
+            counters = dict(self.counters)
+            histograms = {k: (list(v[0]), v[1], v[2]) for k, v in self.histograms.items()}
+            gauges = dict(self.gauges)
+        for name, func in self.gauge_callbacks.items():
+            try:
+                gauges[(name, ())] = func()
+            except Exception:
+                continue
+
+        lines = []
+        seen = set()
+
+        def header(name, kind):
+            if name not in seen:
+                seen.add(name)
+                text = self.help.get(name, (kind, name))[1]
+                lines.append(f'# HELP {name} {text}')
+                lines.append(f'# TYPE {name} {kind}')
+
+        for (name, labels), value in sorted(counters.items()):
+            header(name, 'counter')
+            lines.append(f'{name}{_labels(labels)} {value}')
+        for (name, labels), value in sorted(gauges.items()):
+            header(name, 'gauge')
+            lines.append(f'{name}{_labels(labels)} {value}')
+        for (name, labels), (buckets, total, count) in sorted(histograms.items()):
+            header(name, 'histogram')
+            cumulative = 0
+            for bound, bucket in zip(BUCKETS, buckets):
+                cumulative += bucket
+                lines.append(f'{name}_bucket{_labels(labels + (("le", repr(bound)),))} {cumulative}')
+            lines.append(f'{name}_bucket{_labels(labels + (("le", "+Inf"),))} {count}')
+            lines.append(f'{name}_sum{_labels(labels)} {total:.6f}')
+            lines.append(f'{name}_count{_labels(labels)} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels) + '}'
+
+
+registry = Registry()
+registry.describe('http_requests_total', 'counter', 'HTTP requests by route, method and status')
+registry.describe('http_request_duration_seconds', 'histogram', 'HTTP request latency by route')
+registry.describe('http_requests_in_flight', 'gauge', 'HTTP requests currently being served')
+registry.describe('socketio_events_total', 'counter', 'Socket.IO events handled by event and outcome')
+registry.describe('socketio_event_duration_seconds', 'histogram', 'Socket.IO event handler latency')
+registry.describe('socketio_connections', 'gauge', 'Connected Socket.IO clients')
+registry.describe('db_query_duration_seconds', 'histogram', 'SQLite statement execution time by operation')
+registry.describe('upstream_requests_total', 'counter', 'Outbound API calls by service and outcome')
+registry.describe('upstream_request_duration_seconds', 'histogram', 'Outbound API call latency by service')
+registry.describe('upstream_fallback_total', 'counter', 'Responses served from mock data after an upstream failure')
+
+
+def init_app(app):
+    """Time every request by its URL rule (not the raw path, to bound label cardinality)"""
+
+    @app.before_request
+    def _start_timer():
+        g._metrics_start = time.perf_counter()
+        registry.add_gauge('http_requests_in_flight', 1)
+
+    @app.after_request
+    def _record_request(response):
+        start = g.pop('_metrics_start', None)
+        if start is not None:
+            route = request.url_rule.rule if request.url_rule else '<unmatched>'
+            registry.observe('http_request_duration_seconds', time.perf_counter() - start, (('route', route),))
+            registry.inc('http_requests_total', (('route', route), ('method', request.method),
+                                                 ('status', str(response.status_code))))
+            registry.add_gauge('http_requests_in_flight', -1)
+        return response
+
+    @app.teardown_request
+    def _release_in_flight(exc):
+        # after_request is skipped when a view raises; keep the gauge honest
+        if g.pop('_metrics_start', None) is not None:
+            registry.add_gauge('http_requests_in_flight', -1)
+
+
+def socket_event(name):
+    """Decorator timing a Socket.IO handler; apply beneath @socketio.on"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            outcome = 'ok'
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                outcome = 'error'
+                raise
+            finally:
+                registry.observe('socketio_event_duration_seconds', time.perf_counter() - start, (('event', name),))
+                registry.inc('socketio_events_total', (('event', name), ('outcome', outcome)))
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def upstream(service):
+    """Time an outbound call. Set ``call.outcome`` for non-exception failures
+    such as a non-200 status; exceptions are recorded as 'error'."""
+    call = _UpstreamCall()
+    start = time.perf_counter()
+    try:
+        yield call
+    except Exception:
+        call.outcome = 'error'
+        raise
+    finally:
+        registry.observe('upstream_request_duration_seconds', time.perf_counter() - start, (('service', service),))
+        registry.inc('upstream_requests_total', (('service', service), ('outcome', call.outcome)))
+
+
+class _UpstreamCall:
+    __slots__ = ('outcome',)
+
+    def __init__(self):
+        self.outcome = 'ok'
+
+
+def fallback(service):
+    registry.inc('upstream_fallback_total', (('service', service),))
+
+
+# offload(func, args) runs a blocking SQLite call and returns its result.
+# gunicorn.conf.py points it at gevent's thread pool, so a slow query or
+# commit waits in a real thread instead of stalling every greenlet; by
+# default calls run inline.
+offload = None
+
+
+def blocking(func, *args):
+    """``func(*args)``, through ``offload`` when one is set"""
+    return func(*args) if offload is None else offload(func, args)
+
+
+def _operation(sql):
+    return sql.lstrip().split(None, 1)[0].upper() if sql.strip() else 'UNKNOWN'
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    # Statements slower than slow_threshold (seconds) are passed to
+    # slow_hook(cursor, sql, parameters, elapsed); see profiler.py
+    slow_threshold = float('inf')
+    slow_hook = None
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return blocking(super().execute, sql, parameters)
+        finally:
+            elapsed = time.perf_counter() - start
+            registry.observe('db_query_duration_seconds', elapsed, (('operation', _operation(sql)),))
+            if elapsed >= self.slow_threshold and InstrumentedCursor.slow_hook:
+                InstrumentedCursor.slow_hook(self, sql, parameters, elapsed)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return blocking(super().executemany, sql, seq_of_parameters)
+        finally:
+            elapsed = time.perf_counter() - start
+            registry.observe('db_query_duration_seconds', elapsed, (('operation', _operation(sql) + '_MANY'),))
+            if elapsed >= self.slow_threshold and InstrumentedCursor.slow_hook:
+                InstrumentedCursor.slow_hook(self, sql, None, elapsed)
+
+    def fetchone(self):
+        return blocking(super().fetchone)
+
+    def fetchmany(self, size=None):
+        return blocking(super().fetchmany, self.arraysize if size is None else size)
+
+    def fetchall(self):
+        return blocking(super().fetchall)
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """sqlite3 connection factory whose cursors time every statement"""
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def commit(self):
+        blocking(super().commit)
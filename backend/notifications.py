@@ -0,0 +1,133 @@
+"""
+AgriSmart 2.0 - Notifications
+Stores notifications, maintains per-user unread counters and delivers them
+live over Socket.IO
+
+Every authenticated socket joins a private ``user_<id>`` room and a
+``region_<state>`` room. Individual notifications are inserted in batched
+transactions and emitted to each user's room; a regional alert is written
+with set-based INSERT ... SELECT statements and emitted once to the region
+room, so fanning out to 100k farmers costs two statements and one emit.
+
+The unread count is read from notification_counts, which every write path
+in this module keeps in step with the notifications table.
+"""
+
+from collections import Counter
+import itertools
+
+import schemes
+
+BATCH_SIZE = 10000
+KINDS = ('general', 'price_alert', 'scheme_deadline', 'forum_reply', 'outbreak', 'irrigation')
+
+
+def init_tables(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS notification_counts (
+            user_id INTEGER PRIMARY KEY,
+            unread INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_notifications_user ON notifications(user_id, id)')
+
+
+def user_room(user_id):
+    return f'user_{user_id}'
+
+
+def region_room(state):
+    return 'region_' + state.lower().replace(' ', '_')
+
+
+def store(cursor, notifications):
+    """Insert (user_id, title, message, type) rows and bump unread counters.
+    Does not commit, so callers can make it part of a larger transaction."""
+    cursor.executemany('INSERT INTO notifications (user_id, title, message, type) VALUES (?, ?, ?, ?)',
+                       notifications)
+    cursor.executemany('''
+        INSERT INTO notification_counts (user_id, unread) VALUES (?, ?)
+        ON CONFLICT(user_id) DO UPDATE SET unread = unread + excluded.unread
+    ''', Counter(row[0] for row in notifications).items())
+
+
+def deliver(emit, notifications):
+    for user_id, title, message, kind in notifications:
+        emit('notification', {'title': title, 'message': message, 'type': kind}, user_room(user_id))
+
+
+def send(conn, notifications, emit=None, batch_size=BATCH_SIZE):
+    """Store and deliver notifications, committing every ``batch_size`` rows.
+    ``emit(event, data, room)`` pushes live updates; returns the number sent."""
+    notifications = iter(notifications)
+    cursor = conn.cursor()
+    sent = 0
+    while True:
+        batch = list(itertools.islice(notifications, batch_size))
+        if not batch:
+            return sent
+        store(cursor, batch)
+        conn.commit()
+        if emit:
+            deliver(emit, batch)
+        sent += len(batch)
+
+
+def broadcast_region(conn, state, title, message, kind='general', emit=None):
+    """Notify every user whose location is in ``state``; returns the count"""
+    conn.create_function('state_of', 1, schemes.state_from_location, deterministic=True)
+    cursor = conn.cursor()
+    cursor.execute('DROP TABLE IF EXISTS temp.recipients')
+    cursor.execute('CREATE TEMP TABLE recipients AS SELECT id FROM users WHERE state_of(location) = ?', (state,))
+    cursor.execute('''
+        INSERT INTO notifications (user_id, title, message, type)
+        SELECT id, ?, ?, ? FROM recipients
+    ''', (title, message, kind))
+    count = cursor.rowcount
+    cursor.execute('''
+        INSERT INTO notification_counts (user_id, unread) SELECT id, 1 FROM recipients WHERE 1
+        ON CONFLICT(user_id) DO UPDATE SET unread = unread + 1
+    ''')
+    cursor.execute('DROP TABLE temp.recipients')
+    conn.commit()
+    if emit and count:
+        emit('notification', {'title': title, 'message': message, 'type': kind}, region_room(state))
+    return count
+
+
+def unread_count(cursor, user_id):
+    cursor.execute('SELECT unread FROM notification_counts WHERE user_id = ?', (user_id,))
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+
+def mark_read(conn, user_id, ids=None):
+    """Mark the given notification ids (or all, when ``ids`` is None) as read.
+    Returns how many were unread before."""
+    cursor = conn.cursor()
+    if ids is None:
+        cursor.execute('UPDATE notifications SET is_read = 1 WHERE user_id = ? AND is_read = 0', (user_id,))
+        changed = cursor.rowcount
+        cursor.execute('UPDATE notification_counts SET unread = 0 WHERE user_id = ?', (user_id,))
+    else:
+        cursor.execute('''
+            UPDATE notifications SET is_read = 1
+            WHERE user_id = ? AND is_read = 0 AND id IN (SELECT value FROM json_each(?))
+        ''', (user_id, '[' + ','.join(str(int(i)) for i in ids) + ']'))
+        changed = cursor.rowcount
+        cursor.execute('UPDATE notification_counts SET unread = MAX(unread - ?, 0) WHERE user_id = ?',
+                       (changed, user_id))
+    conn.commit()
+    return changed
+
+
+def repair_counts(conn):
+    """Rebuild notification_counts from the notifications table"""
+    cursor = conn.cursor()
+    cursor.execute('DELETE FROM notification_counts')
+    cursor.execute('''
+        INSERT INTO notification_counts (user_id, unread)
+        SELECT user_id, COUNT(*) FROM notifications WHERE is_read = 0 GROUP BY user_id
+    ''')
+    conn.commit()
+    return cursor.rowcount
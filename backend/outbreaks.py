@@ -0,0 +1,180 @@
+"""
+AgriSmart 2.0 - Disease Outbreak Aggregation
+Rolling per-region disease counts for the outbreak heatmap
+
+Each detection increments one (day, geohash cell, disease) bucket in
+outbreak_cells and one per-crop bucket in outbreak_counts, inside the same
+transaction as the detection itself. Users are geocoded once through the
+bundled gazetteer and cached in user_geo. Both tables are clustered on
+their primary key (WITHOUT ROWID) so a heatmap window is one contiguous
+range scan: its cost depends on the number of active cells and days, never
+on how many detections have been recorded.
+"""
+
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+import time
+
+import geo
+
+PRECISION = 5  # ~5 km cells; the heatmap rolls up to coarser prefixes
+RETENTION_DAYS = 120
+MAX_WINDOW_DAYS = 60  # leaves room for the previous window inside retention
+
+
+def init_tables(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user_geo (
+            user_id INTEGER PRIMARY KEY,
+            geohash TEXT,
+            state TEXT
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS outbreak_cells (
+            day DATE NOT NULL,
+            geohash TEXT NOT NULL,
+            disease TEXT NOT NULL,
+            state TEXT,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, geohash, disease)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS outbreak_counts (
+            crop TEXT NOT NULL,
+            day DATE NOT NULL,
+            geohash TEXT NOT NULL,
+            disease TEXT NOT NULL,
+            state TEXT,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (crop, day, geohash, disease)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS users_location_geo AFTER UPDATE OF location ON users
+        BEGIN
+            DELETE FROM user_geo WHERE user_id = NEW.id;
+        END
+    ''')
+
+
+def _cell(location):
+    hit = geo.geocode(location)
+    if hit is None:
+        return None, None
+    return geo.encode(hit[1], hit[2], PRECISION), hit[0]
+
+
+def _normalize_crop(crop):
+    return (crop or '').strip().lower() or 'unknown'
+
+
+def user_cell(cursor, user_id):
+    """(geohash, state) for a user, geocoding and caching on first use"""
+    row = cursor.execute('SELECT geohash, state FROM user_geo WHERE user_id = ?', (user_id,)).fetchone()
+    if row is not None:
+        return row[0], row[1]
+    user = cursor.execute('SELECT location FROM users WHERE id = ?', (user_id,)).fetchone()
+    geohash, state = _cell(user[0] if user else None)
+    cursor.execute('INSERT OR REPLACE INTO user_geo (user_id, geohash, state) VALUES (?, ?, ?)',
+                   (user_id, geohash, state))
+    return geohash, state
+
+
+def record(cursor, user_id, crop, disease):
+    """Count one detection. Does not commit; call inside the detection's transaction."""
+    geohash, state = user_cell(cursor, user_id)
+    if geohash is None or not disease:
+        return
+    cursor.execute('''
+        INSERT INTO outbreak_cells (day, geohash, disease, state, count) VALUES (date('now'), ?, ?, ?, 1)
+        ON CONFLICT(day, geohash, disease) DO UPDATE SET count = count + 1
+    ''', (geohash, disease, state))
+    cursor.execute('''
+        INSERT INTO outbreak_counts (crop, day, geohash, disease, state, count) VALUES (?, date('now'), ?, ?, ?, 1)
+        ON CONFLICT(crop, day, geohash, disease) DO UPDATE SET count = count + 1
+    ''', (_normalize_crop(crop), geohash, disease, state))
+
+
+def rebuild(conn, days=RETENTION_DAYS):
+    """Recompute every bucket from disease_detections in one grouped pass.
+    Only needed to backfill existing data or after changing the gazetteer."""
+    started = time.perf_counter()
+    cursor = conn.cursor()
+    cursor.execute('DELETE FROM user_geo')
+    cursor.execute('DELETE FROM outbreak_cells')
+    cursor.execute('DELETE FROM outbreak_counts')
+    cursor.execute('''
+        SELECT u.location, d.crop_name, d.disease_name, date(d.created_at), COUNT(*)
+        FROM disease_detections d JOIN users u ON d.user_id = u.id
+        WHERE d.created_at >= date('now', ?) AND d.disease_name IS NOT NULL
+        GROUP BY u.location, d.crop_name, d.disease_name, date(d.created_at)
+    ''', (f'-{days} days',))
+    cells = {}
+    totals = Counter()
+    buckets = Counter()
+    for location, crop, disease, day, count in cursor.fetchall():
+        if location not in cells:
+            cells[location] = _cell(location)
+        geohash, state = cells[location]
+        if geohash is not None:
+            totals[(day, geohash, disease, state)] += count
+            buckets[(_normalize_crop(crop), day, geohash, disease, state)] += count
+    cursor.executemany('INSERT INTO outbreak_cells (day, geohash, disease, state, count) VALUES (?, ?, ?, ?, ?)',
+                       [key + (count,) for key, count in sorted(totals.items())])
+    cursor.executemany('''
+        INSERT INTO outbreak_counts (crop, day, geohash, disease, state, count) VALUES (?, ?, ?, ?, ?, ?)
+    ''', [key + (count,) for key, count in sorted(buckets.items())])
+    conn.commit()
+    return {
+        'cells': len(totals),
+        'buckets': len(buckets),
+        'detections': sum(totals.values()),
+        'locations': len(cells),
+        'ungeocoded_locations': sum(1 for geohash, _ in cells.values() if geohash is None),
+        'seconds': round(time.perf_counter() - started, 3),
+    }
+
+
+def prune(conn, days=RETENTION_DAYS):
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM outbreak_cells WHERE day < date('now', ?)", (f'-{days} days',))
+    pruned = cursor.rowcount
+    cursor.execute("DELETE FROM outbreak_counts WHERE day < date('now', ?)", (f'-{days} days',))
+    conn.commit()
+    return pruned + cursor.rowcount
+
+
+def heatmap(cursor, days=14, precision=4, disease=None, crop=None, state=None, limit=500):
+    """Detection counts per cell and disease over the last ``days`` days, with
+    the count for the equally long window before it so rising clusters stand out"""
+    today = datetime.now(timezone.utc).date()
+    window = (today - timedelta(days=days - 1)).isoformat()
+    query = f'''
+        SELECT substr(geohash, 1, ?) AS cell, disease, MAX(state) AS state,
+            SUM(CASE WHEN day >= ? THEN count ELSE 0 END) AS recent,
+            SUM(CASE WHEN day < ? THEN count ELSE 0 END) AS previous
+        FROM {'outbreak_counts' if crop else 'outbreak_cells'}
+        WHERE day >= ?
+    '''
+    params = [precision, window, window, (today - timedelta(days=2 * days - 1)).isoformat()]
+    if crop:
+        query += ' AND crop = ?'
+        params.append(_normalize_crop(crop))
+    for column, value in (('disease', disease), ('state', state)):
+        if value:
+            query += f' AND {column} = ?'
+            params.append(value)
+    # Not aliased "count": in HAVING that name would mean the table column
+    query += ' GROUP BY cell, disease HAVING recent > 0 ORDER BY recent DESC LIMIT ?'
+    params.append(limit)
+
+    cells = []
+    for cell, disease_name, state_name, count, previous in cursor.execute(query, params).fetchall():
+        latitude, longitude = geo.decode(cell)
+        cells.append({
+            'geohash': cell, 'lat': round(latitude, 4), 'lon': round(longitude, 4), 'state': state_name,
+            'disease': disease_name, 'count': count, 'previous': previous,
+        })
+    return cells
@@ -0,0 +1,229 @@
+"""
+AgriSmart 2.0 - Production Profiling
+Opt-in sampling profiler emitting flamegraph-compatible collapsed stacks,
+and a slow-query log for statements issued through get_db()
+
+Both are per worker process and cheap enough to leave on: the profiler only
+walks thread stacks at its sampling interval, and the slow-query log only
+does extra work (EXPLAIN QUERY PLAN, for a sampled fraction) for statements
+that already exceeded the threshold.
+
+Under gevent (gunicorn.conf.py) requests are greenlets on one OS thread, so
+the profiler samples every suspended greenlet's frame as well, from a real
+OS thread that keeps running while the hub is busy. A patched process where
+that is not possible refuses to start, and status() says why.
+"""
+
+from collections import Counter, deque
+from datetime import datetime
+import gc
+import importlib
+import logging
+import random
+import sqlite3
+import sys
+import time
+import weakref
+
+import metrics
+
+MAX_STACK_DEPTH = 64
+GREENLET_RESCAN = 1.0   # seconds between heap scans for new greenlets
+EXPLAIN_OPERATIONS = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH')
+
+logger = logging.getLogger('agrismart.slow_query')
+metrics.registry.describe('slow_queries_total', 'counter', 'Statements over the slow-query threshold')
+metrics.registry.describe('profiler_samples_total', 'counter', 'Stack samples taken by the sampling profiler')
+
+
+def _gevent_patched():
+    monkey = sys.modules.get('gevent.monkey')
+    return monkey is not None and monkey.is_module_patched('threading')
+
+
+def _original(module, name):
+    """``module.name`` as it was before gevent monkey-patched it"""
+    if _gevent_patched():
+        from gevent import monkey
+        return monkey.get_original(module, name)
+    return getattr(importlib.import_module(module), name)
+
+
+class SamplingProfiler:
+    """Samples every thread's (and, under gevent, every greenlet's) stack at a
+    fixed interval from a background OS thread.
+
+    Output is Brendan Gregg's collapsed format (``frame;frame;frame count``),
+    ready for flamegraph.pl or speedscope.
+    """
+
+    def __init__(self):
+        # Real primitives even when gevent has patched threading: the sampler
+        # thread is not a greenlet and must not touch the hub
+        self.lock = _original('_thread', 'allocate_lock')()
+        self.stacks = Counter()
+        self.samples = 0
+        self.interval = 0.02
+        self.started_at = None
+        self.mode = None
+        self.unavailable = None
+        self._generation = 0
+        self._active = False
+        self._greenlets = weakref.WeakSet()
+        self._rescan_at = 0
+
+    @property
+    def running(self):
+        return self._active
+
+    def start(self, interval=0.02):
+        with self.lock:
+            if self._active:
+                return False
+            mode = 'greenlets' if _gevent_patched() else 'threads'
+            start_thread = _original('_thread', 'start_new_thread')
+            if getattr(start_thread, '__module__', None) and start_thread.__module__.startswith('gevent'):
+                self.unavailable = 'gevent has patched threading and no original start_new_thread is available'
+                return False
+            self.unavailable = None
+            self.mode = mode
+            self.interval = max(interval, 0.001)
+            self.started_at = time.time()
+            self._generation += 1
+            self._active = True
+            self._greenlets = weakref.WeakSet()
+            self._rescan_at = 0
+            start_thread(self._run, (self._generation, _original('time', 'sleep')))
+            return True
+
+    def stop(self):
+        # The sampler notices at its next wake-up; nothing to join, so a
+        # greenlet calling this never blocks the hub
+        with self.lock:
+            self._generation += 1
+            self._active = False
+
+    def reset(self):
+        with self.lock:
+            self.stacks.clear()
+            self.samples = 0
+
+    def _run(self, generation, sleep):
+        me = _original('_thread', 'get_ident')()
+        while True:
+            sleep(self.interval)
+            if self._generation != generation:
+                return
+            collected = [_collapse(frame) for frame in self._frames(me)]
+            with self.lock:
+                if self._generation != generation:
+                    return
+                self.stacks.update(collected)
+                self.samples += 1
+            metrics.registry.inc('profiler_samples_total')
+
+    def _frames(self, me):
+        """Current frame of every OS thread but the sampler's, plus the
+        suspended frame of every greenlet (the running one has none)"""
+        frames = [frame for thread_id, frame in sys._current_frames().items() if thread_id != me]
+        if self.mode == 'greenlets':
+            now = time.monotonic()
+            if now >= self._rescan_at:
+                # Walking the heap is the expensive part, so new greenlets
+                # are picked up at most GREENLET_RESCAN seconds late
+                import greenlet
+                self._greenlets = weakref.WeakSet(
+                    obj for obj in gc.get_objects() if isinstance(obj, greenlet.greenlet))
+                self._rescan_at = now + GREENLET_RESCAN
+            frames.extend(frame for frame in (g.gr_frame for g in list(self._greenlets)) if frame is not None)
+        return frames
+
+    def collapsed(self):
+        with self.lock:
+            items = self.stacks.most_common()
+        return ''.join(f'{stack} {count}\n' for stack, count in items)
+
+    def status(self):
+        return {
+            'running': self.running,
+            'mode': self.mode,
+            'unavailable': self.unavailable,
+            'interval_ms': round(self.interval * 1000, 3),
+            'samples': self.samples,
+            'unique_stacks': len(self.stacks),
+            'started_at': datetime.fromtimestamp(self.started_at).isoformat() if self.started_at else None,
+        }
+
+
+def _collapse(frame):
+    frames = []
+    while frame is not None and len(frames) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        frames.append(f'{code.co_filename.rsplit("/", 1)[-1]}:{code.co_name}')
+        frame = frame.f_back
+    return ';'.join(reversed(frames))
+
+
+def _params_shape(parameters):
+    """Parameter types only, never values, so the log holds no user data"""
+    if parameters is None:
+        return 'many'
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    return [type(value).__name__ for value in parameters]
+
+
+class SlowQueryLog:
+    """Ring buffer of statements slower than ``threshold_ms``.
+
+    EXPLAIN QUERY PLAN is captured for ``explain_rate`` of slow statements,
+    on a plain cursor so it is neither timed nor logged itself.
+    """
+
+    def __init__(self, size=200):
+        self.entries = deque(maxlen=size)
+        self.threshold_ms = None
+        self.explain_rate = 1.0
+
+    def install(self, threshold_ms=100, explain_rate=1.0):
+        self.threshold_ms = threshold_ms
+        self.explain_rate = explain_rate
+        metrics.InstrumentedCursor.slow_threshold = threshold_ms / 1000
+        metrics.InstrumentedCursor.slow_hook = self.record
+
+    def uninstall(self):
+        self.threshold_ms = None
+        metrics.InstrumentedCursor.slow_threshold = float('inf')
+        metrics.InstrumentedCursor.slow_hook = None
+
+    def record(self, cursor, sql, parameters, elapsed):
+        sql = ' '.join(sql.split())
+        operation = sql.split(' ', 1)[0].upper()
+        plan = None
+        if parameters is not None and operation in EXPLAIN_OPERATIONS and random.random() < self.explain_rate:
+            try:
+                rows = cursor.connection.cursor(sqlite3.Cursor).execute('EXPLAIN QUERY PLAN ' + sql, parameters)
+                plan = [row[-1] for row in rows.fetchall()]
+            except sqlite3.Error:
+                plan = None
+
+        entry = {
+            'at': datetime.now().isoformat(timespec='milliseconds'),
+            'duration_ms': round(elapsed * 1000, 3),
+            'sql': sql,
+            'params_shape': _params_shape(parameters),
+            'plan': plan,
+        }
+        self.entries.append(entry)
+        metrics.registry.inc('slow_queries_total', (('operation', operation),))
+        logger.warning('slow query %.1f ms: %s plan=%s', entry['duration_ms'], sql, plan)
+
+    def recent(self, limit=50):
+        """Newest ``limit`` entries first; nothing for limit <= 0"""
+        if limit <= 0:
+            return []
+        return list(self.entries)[-limit:][::-1]
+
+
+profiler = SamplingProfiler()
+slow_query_log = SlowQueryLog()
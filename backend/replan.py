@@ -0,0 +1,264 @@
+"""
+AgriSmart 2.0 - Forecast-aware Irrigation Re-planning Job
+Recomputes every active irrigation plan against the latest weather forecast
+
+Plans are processed in id order in fixed-size chunks. Forecasts are fetched
+once per distinct user location and reused for the whole run, each chunk is
+recomputed in a single vectorized irrigation.plan_plots() pass, and only rows
+whose schedule actually changed are written back. A checkpoint row is
+committed with every chunk so an interrupted run resumes where it stopped.
+
+Each plan keeps the daily ET0/rain it was computed from; a run replaces only
+the days the forecast covers, so a forecast window moving forward does not
+reset earlier days. Owners are notified only when an irrigation inside the
+forecast window moves or changes depth.
+
+Run it from cron or any scheduler with: flask --app app replan-irrigation
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timezone
+import os
+import time
+
+import numpy as np
+import requests
+
+import irrigation
+import metrics
+import notifications
+
+JOB_NAME = 'replan_irrigation'
+CHUNK_SIZE = 5000
+FORECAST_WORKERS = 8
+DEFAULT_LOCATION = 'Delhi'
+
+
+def init_checkpoints(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS job_checkpoints (
+            job TEXT PRIMARY KEY,
+            last_id INTEGER DEFAULT 0,
+            status TEXT,
+            run_date DATE,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.commit()
+
+
+def fetch_forecast(location, base_url):
+    """Daily (et0, rain) series starting today from the OpenWeatherMap
+    5-day/3-hour forecast, or None if the upstream call fails."""
+    api_key = os.environ.get('OPENWEATHER_API_KEY', 'demo_key')
+    try:
+        with metrics.upstream('openweather') as call:
+            response = requests.get(f'{base_url}/forecast', params={
+                'q': location, 'appid': api_key, 'units': 'metric'
+            }, timeout=5)
+            if response.status_code != 200:
+                call.outcome = f'http_{response.status_code}'
+                return None
+        return forecast_to_series(response.json())
+    except (requests.RequestException, ValueError, KeyError):
+        return None
+
+
+def forecast_to_series(forecast):
+    """Collapse 3-hourly forecast entries into daily ET0 and rainfall (mm)"""
+    city = forecast.get('city', {})
+    latitude = city.get('coord', {}).get('lat', 28.6)
+    offset = city.get('timezone', 19800)
+
+    days = {}
+    for entry in forecast.get('list', []):
+        day = datetime.fromtimestamp(entry['dt'] + offset, timezone.utc).date()
+        tmin, tmax, rain = days.get(day, (float('inf'), float('-inf'), 0.0))
+        days[day] = (
+            min(tmin, entry['main']['temp_min']),
+            max(tmax, entry['main']['temp_max']),
+            rain + entry.get('rain', {}).get('3h', 0.0),
+        )
+    if not days:
+        return None
+
+    ordered = sorted(days)
+    tmin, tmax, rain = (np.array(col) for col in zip(*(days[d] for d in ordered)))
+    doy = np.array([d.timetuple().tm_yday for d in ordered])
+    return {
+        'start': ordered[0],
+        'et0': irrigation.et0_hargreaves(tmin, tmax, latitude, doy),
+        'rain': rain.astype(np.float32),
+    }
+
+
+def _location_key(location):
+    location = (location or '').strip()
+    return (location or DEFAULT_LOCATION).lower(), location or DEFAULT_LOCATION
+
+
+def _forecast_matrices(plans, forecasts):
+    """Per-plot ET0/rain rows aligned to each plan's start date: the plan's
+    stored inputs with the forecast window dropped in at (forecast start -
+    plan start). Also returns each plan's forecast window as day offsets."""
+    n = len(plans)
+    width = irrigation.MAX_SEASON_DAYS
+    et0 = np.full((n, width), irrigation.DEFAULT_ET0, dtype=np.float32)
+    rain = np.zeros((n, width), dtype=np.float32)
+    for i, plan in enumerate(plans):
+        stored = irrigation.schedule_inputs(plan['schedule']) if plan['schedule'] else None
+        if stored:
+            days = min(len(stored[0]), width)
+            et0[i, :days] = stored[0][:days]
+            rain[i, :days] = stored[1][:days]
+    windows = [None] * n
+
+    groups = {}
+    for i, plan in enumerate(plans):
+        groups.setdefault(plan['location_key'], []).append(i)
+
+    for location, rows in groups.items():
+        forecast = forecasts[location]
+        rows = np.array(rows)
+        starts = np.array([
+            (forecast['start'] - date.fromisoformat(plans[i]['start_date'])).days for i in rows
+        ])
+        cols = starts[:, np.newaxis] + np.arange(len(forecast['et0']))
+        valid = (cols >= 0) & (cols < width)
+        row_idx = np.broadcast_to(rows[:, np.newaxis], cols.shape)[valid]
+        et0[row_idx, cols[valid]] = np.broadcast_to(forecast['et0'], cols.shape)[valid]
+        rain[row_idx, cols[valid]] = np.broadcast_to(forecast['rain'], cols.shape)[valid]
+        for i, start in zip(rows, starts):
+            windows[i] = (start, start + len(forecast['et0']))
+    return et0, rain, windows
+
+
+def _rescheduled(old, new, window):
+    """Whether any irrigation inside the forecast window moved or changed depth"""
+    if not old:
+        return True
+    first, end = window
+    old_events, new_events = irrigation.schedule_events(old), irrigation.schedule_events(new)
+    return any(old_events.get(day) != new_events.get(day)
+               for day in set(old_events) | set(new_events) if first <= day < end)
+
+
+def run(conn, fetch, emit=None, chunk_size=CHUNK_SIZE, today=None):
+    """Re-plan all active irrigation plans. Returns timing and count metrics.
+
+    ``fetch(location)`` returns a forecast series dict (see
+    forecast_to_series and fetch_forecast) or None; ``emit(event, data,
+    room)`` pushes live alerts and may be omitted when running outside the
+    Socket.IO server.
+    """
+    today = today or date.today()
+    init_checkpoints(conn)
+    cursor = conn.cursor()
+
+    # Resume an interrupted run from today, otherwise start from the beginning
+    cursor.execute('SELECT last_id, status, run_date FROM job_checkpoints WHERE job = ?', (JOB_NAME,))
+    checkpoint = cursor.fetchone()
+    last_id = 0
+    if checkpoint and checkpoint['status'] == 'running' and checkpoint['run_date'] == today.isoformat():
+        last_id = checkpoint['last_id']
+    cursor.execute('''
+        INSERT OR REPLACE INTO job_checkpoints (job, last_id, status, run_date, updated_at)
+        VALUES (?, ?, 'running', ?, CURRENT_TIMESTAMP)
+    ''', (JOB_NAME, last_id, today.isoformat()))
+    conn.commit()
+
+    stats = {
+        'resumed_from_id': last_id, 'plans_scanned': 0, 'plans_changed': 0, 'plans_rescheduled': 0,
+        'locations': 0, 'forecast_failures': 0, 'notifications': 0, 'chunks': 0,
+        'fetch_seconds': 0.0, 'compute_seconds': 0.0, 'write_seconds': 0.0, 'notify_seconds': 0.0,
+    }
+    forecasts = {}
+    started = time.perf_counter()
+
+    while True:
+        cursor.execute('''
+            SELECT p.id, p.user_id, p.crop_name, p.area, p.soil_type, p.irrigation_method,
+            p.schedule, p.start_date, u.location
+            FROM irrigation_plans p
+            JOIN users u ON p.user_id = u.id
+            WHERE p.id > ? AND p.end_date >= ?
+            ORDER BY p.id
+            LIMIT ?
+        ''', (last_id, today.isoformat(), chunk_size))
+        rows = [dict(row) for row in cursor.fetchall()]
+        if not rows:
+            break
+        last_id = rows[-1]['id']
+        stats['plans_scanned'] += len(rows)
+        stats['chunks'] += 1
+
+        # One upstream call per location for the whole run
+        t0 = time.perf_counter()
+        names = {}
+        for row in rows:
+            row['location_key'], name = _location_key(row['location'])
+            if row['location_key'] not in forecasts:
+                names[row['location_key']] = name
+        if names:
+            with ThreadPoolExecutor(max_workers=FORECAST_WORKERS) as pool:
+                for key, forecast in zip(names, pool.map(fetch, names.values())):
+                    forecasts[key] = forecast
+                    stats['locations'] += 1
+                    stats['forecast_failures'] += forecast is None
+        stats['fetch_seconds'] += time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        # Rows saved before areas were validated cannot be re-planned
+        plans = [row for row in rows if forecasts[row['location_key']] is not None
+                 and (row['area'] is None or row['area'] > 0)]
+        changed = []
+        if plans:
+            et0, rain, windows = _forecast_matrices(plans, forecasts)
+            for plan, new, window in zip(plans, irrigation.build_plans(plans, et0=et0, rain=rain), windows):
+                if new['schedule'] != plan['schedule']:
+                    changed.append((plan, new, _rescheduled(plan['schedule'], new['schedule'], window)))
+        stats['compute_seconds'] += time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        cursor.executemany(
+            'UPDATE irrigation_plans SET water_requirement = ?, schedule = ? WHERE id = ?',
+            [(new['water_requirement'], new['schedule'], plan['id']) for plan, new, _ in changed]
+        )
+        users = {}
+        for plan, new, rescheduled in changed:
+            if rescheduled:
+                users.setdefault(plan['user_id'], []).append((plan, new))
+        alerts = []
+        for user_id, updates in users.items():
+            plan, new = updates[0]
+            upcoming = irrigation.next_irrigation(new['schedule'], today)
+            message = f"{len(updates)} irrigation plan(s) adjusted for the latest {plan['location'] or DEFAULT_LOCATION} forecast."
+            if upcoming:
+                message += f" Next {plan['crop_name']} irrigation: {upcoming['depth_mm']} mm on {upcoming['date']}."
+            alerts.append((user_id, 'Irrigation schedule updated', message, 'irrigation'))
+        notifications.store(cursor, alerts)
+        cursor.execute('''
+            UPDATE job_checkpoints SET last_id = ?, updated_at = CURRENT_TIMESTAMP WHERE job = ?
+        ''', (last_id, JOB_NAME))
+        conn.commit()
+        stats['plans_changed'] += len(changed)
+        stats['plans_rescheduled'] += sum(len(updates) for updates in users.values())
+        stats['notifications'] += len(alerts)
+        stats['write_seconds'] += time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        if emit:
+            notifications.deliver(emit, alerts)
+        stats['notify_seconds'] += time.perf_counter() - t0
+
+    cursor.execute('''
+        UPDATE job_checkpoints SET status = 'done', updated_at = CURRENT_TIMESTAMP WHERE job = ?
+    ''', (JOB_NAME,))
+    conn.commit()
+
+    stats['total_seconds'] = time.perf_counter() - started
+    stats['plans_per_second'] = stats['plans_scanned'] / stats['total_seconds'] if stats['total_seconds'] else 0.0
+    for key in list(stats):
+        if key.endswith('_seconds') or key.endswith('_second'):
+            stats[key] = round(stats[key], 3)
+    return stats
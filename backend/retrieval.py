@@ -0,0 +1,294 @@
+"""
+AgriSmart 2.0 - Local Knowledge Retrieval
+TF-IDF index over farming tips and government schemes for the AI assistant
+
+Each tip or scheme is one passage. Postings are kept per term as parallel
+arrays of passage numbers and normalized TF-IDF weights, so a query costs
+one vectorized accumulate per query term and the scores are cosine
+similarities in [0, 1]. A confident top match is answered directly; weaker
+matches become context for the LLM prompt.
+
+The index follows the table_versions counters, and when they move reads the
+sync change log (which only records content columns) to see what changed:
+view/like counter flushes cost one query, rows with new ids are added in
+place, and any other change (edits, deletes, deactivated schemes) or growth
+beyond REBUILD_GROWTH of the last build triggers a full rebuild, which also
+refreshes IDF weights. Rebuilds run in a background thread; searches keep
+using the current index until the new one is swapped in.
+"""
+
+from array import array
+from collections import Counter
+import logging
+import math
+import os
+import re
+import threading
+import time
+
+import metrics
+import sync
+from translation import detect_language
+
+ANSWER_THRESHOLD = 0.45   # cosine score needed to answer without the LLM
+CONTEXT_THRESHOLD = 0.2   # minimum score for a passage to be used as context
+CONTEXT_PASSAGES = 3
+REBUILD_GROWTH = 0.2
+
+STOPWORDS = frozenset('''
+    a an and are as at be by can do does for from how i in is it its my of on or should the this
+    to we what when where which who why will with you your me about into than then there these
+    those also any all get use using
+    का के की को में से है हैं और पर भी क्या कैसे कब मैं मेरे मेरी लिए करें करना होता होती
+'''.split())
+# Letters, plus Devanagari vowel signs (which \w does not match) but not its digits or danda
+_TOKEN = re.compile(r'(?:[^\W\d_]|[\u0900-\u0963\u0970-\u097f])+')
+
+metrics.registry.describe('rag_retrieval_duration_seconds', 'histogram', 'Time to retrieve passages for a question')
+metrics.registry.describe('ai_chat_answers_total', 'counter', 'AI chat answers by source (local, llm, fallback)')
+metrics.registry.describe('ai_chat_local_answer_ratio', 'gauge', 'Fraction of AI chat questions answered locally')
+metrics.registry.describe('rag_index_passages', 'gauge', 'Passages in the local retrieval index')
+
+
+def tokenize(text):
+    """Lowercase word tokens with stopwords and one-letter words removed"""
+    return [token for token in _TOKEN.findall((text or '').lower())
+            if len(token) > 1 and token not in STOPWORDS]
+
+
+def tip_passage(row):
+    return {
+        'source': 'tip', 'id': row['id'], 'title': row['title'], 'language': row['language'] or 'en',
+        'text': row['content'],
+        'index_text': f"{row['title']} {row['title']} {row['category']} {row['tags'] or ''} {row['content']}",
+    }
+
+
+def scheme_passage(row):
+    parts = [row['description'], f"Eligibility: {row['eligibility']}" if row['eligibility'] else '',
+             f"Benefits: {row['benefits']}" if row['benefits'] else '',
+             f"How to apply: {row['application_process']}" if row['application_process'] else '']
+    return {
+        'source': 'scheme', 'id': row['id'], 'title': row['name'],
+        'language': detect_language(f"{row['name']} {row['description']}"),
+        'text': ' '.join(part for part in parts if part),
+        'index_text': f"{row['name']} {row['name']} {row['category']} {row['description']} "
+                      f"{row['eligibility']} {row['benefits']}",
+    }
+
+
+# table -> (rows to index, passage builder)
+SOURCES = {
+    'farming_tips': ('1 = 1', tip_passage),
+    'government_schemes': ('is_active = 1', scheme_passage),
+}
+# change_log domain -> indexed table
+_DOMAINS = {domain: spec[0] for domain, spec in sync.DOMAINS.items() if spec[0] in SOURCES}
+
+logger = logging.getLogger('agrismart.retrieval')
+
+
+def _rows_after(conn, table, last_id):
+    where = SOURCES[table][0]
+    return conn.execute(f'SELECT * FROM {table} WHERE {where} AND id > ? ORDER BY id', (last_id,)).fetchall()
+
+
+class KnowledgeIndex:
+    """In-memory TF-IDF index. ``connect`` returns a new database connection
+    and ``versions(tables)`` the current table_versions counters; app.py
+    wires both."""
+
+    def __init__(self):
+        self.connect = None
+        self.versions = None
+        self.lock = threading.Lock()
+        self.refresh_lock = threading.Lock()
+        self._rebuilding = None  # pid of the process running a background rebuild
+        self._reset()
+
+    def _reset(self):
+        self.passages = []
+        self.vocabulary = {}     # term -> term id
+        self.df = []             # term id -> passages containing it
+        self.postings = []       # term id -> (array of passage numbers, array of weights)
+        self.last_ids = {table: 0 for table in SOURCES}
+        self.seq = 0             # change_log sequence the index reflects
+        self.built_size = 0
+        self.version = None
+
+    def __len__(self):
+        return len(self.passages)
+
+    def _idf(self, term_id, size=None):
+        return math.log((1 + (size or len(self.passages))) / (1 + self.df[term_id])) + 1
+
+    def _add(self, passages):
+        # Weights use the IDF as of this batch; rebuild() refreshes them all
+        documents = []
+        for passage in passages:
+            counts = Counter(tokenize(passage['index_text']))
+            for term in counts:
+                term_id = self.vocabulary.get(term)
+                if term_id is None:
+                    term_id = self.vocabulary[term] = len(self.df)
+                    self.df.append(0)
+                    self.postings.append((array('I'), array('f')))
+                self.df[term_id] += 1
+            documents.append((passage, counts))
+        size = len(self.passages) + len(documents)
+        for passage, counts in documents:
+            number = len(self.passages)
+            self.passages.append(passage)
+            weights = {self.vocabulary[term]: (1 + math.log(tf)) * self._idf(self.vocabulary[term], size)
+                       for term, tf in counts.items()}
+            norm = math.sqrt(sum(weight * weight for weight in weights.values())) or 1.0
+            for term_id, weight in weights.items():
+                numbers, values = self.postings[term_id]
+                numbers.append(number)
+                values.append(weight / norm)
+
+    def rebuild(self, conn):
+        """Re-read every source table; returns the number of passages"""
+        # Changes logged after this point are looked at again by the next refresh
+        seq = sync.current_seq(conn.cursor())[0]
+        passages, last_ids = [], {}
+        for table, (_, build) in SOURCES.items():
+            rows = _rows_after(conn, table, 0)
+            passages.extend(build(row) for row in rows)
+            last_ids[table] = rows[-1]['id'] if rows else 0
+        with self.lock:
+            self._reset()
+            self._add(passages)
+            self.last_ids, self.seq = last_ids, seq
+            self.built_size = len(self.passages)
+        return len(passages)
+
+    def refresh(self, background=True):
+        """Bring the index up to date with the source tables if they changed.
+        A needed rebuild runs in a background thread unless ``background`` is
+        False; until it finishes searches use the current index."""
+        version = self.versions(tuple(SOURCES))
+        if version == self.version:
+            return
+        with self.refresh_lock:
+            if version == self.version or self._rebuilding == os.getpid():
+                return
+            if self.version is not None:
+                conn = self.connect()
+                try:
+                    if self._grow(conn):
+                        self.version = version
+                        return
+                finally:
+                    conn.close()
+            if not background:
+                self._rebuild(version)
+                return
+            self._rebuilding = os.getpid()
+        threading.Thread(target=self._rebuild, args=(version,), name='retrieval-rebuild', daemon=True).start()
+
+    def _rebuild(self, version):
+        conn = self.connect()
+        try:
+            self.rebuild(conn)
+            self.version = version
+        except Exception:
+            logger.exception('retrieval index rebuild failed')
+        finally:
+            conn.close()
+            self._rebuilding = None
+
+    def _grow(self, conn):
+        """Apply content changes logged since the index was built: True when
+        there were none or only new rows (added in place), False when a
+        rebuild is needed"""
+        seq, pruned = sync.current_seq(conn.cursor())
+        if self.seq < pruned:
+            return False
+        changes = conn.execute(f'''
+            SELECT domain, row_id, deleted FROM change_log
+            WHERE seq > ? AND seq <= ? AND domain IN ({','.join('?' * len(_DOMAINS))})
+        ''', (self.seq, seq, *_DOMAINS)).fetchall()
+        new_ids = {table: set() for table in SOURCES}
+        for domain, row_id, deleted in changes:
+            table = _DOMAINS[domain]
+            if row_id <= self.last_ids[table]:
+                return False
+            if not deleted:
+                new_ids[table].add(row_id)
+        if len(self.passages) + sum(map(len, new_ids.values())) > self.built_size * (1 + REBUILD_GROWTH):
+            return False
+        added = {table: [row for row in _rows_after(conn, table, self.last_ids[table]) if row['id'] in ids]
+                 for table, ids in new_ids.items() if ids}
+        with self.lock:
+            for table, rows in added.items():
+                if rows:
+                    self._add([SOURCES[table][1](row) for row in rows])
+                    self.last_ids[table] = rows[-1]['id']
+            self.seq = seq
+        return True
+
+    def search(self, question, k=CONTEXT_PASSAGES):
+        """Top ``k`` (score, passage) pairs for ``question``, best first"""
+        import numpy as np
+        start = time.perf_counter()
+        counts = Counter(tokenize(question))
+        with self.lock:
+            scores = np.zeros(len(self.passages), dtype=np.float32)
+            query = {}
+            for term, tf in counts.items():
+                term_id = self.vocabulary.get(term)
+                if term_id is not None:
+                    query[term_id] = (1 + math.log(tf)) * self._idf(term_id)
+            norm = math.sqrt(sum(weight * weight for weight in query.values())) or 1.0
+            for term_id, weight in query.items():
+                numbers, values = self.postings[term_id]
+                np.add.at(scores, np.frombuffer(numbers, dtype=np.uint32),
+                          np.frombuffer(values, dtype=np.float32) * (weight / norm))
+            passages = self.passages
+        if len(scores) > k:
+            top = np.argpartition(scores, -k)[-k:]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(scores[top])[::-1]]
+        results = [(float(scores[i]), passages[i]) for i in top if scores[i] > 0]
+        metrics.registry.observe('rag_retrieval_duration_seconds', time.perf_counter() - start)
+        return results
+
+
+def local_answer(results, language, threshold=ANSWER_THRESHOLD):
+    """Answer text from the best passage when it is confident and in the
+    question's language, else None"""
+    if not results:
+        return None
+    score, passage = results[0]
+    if score < threshold or passage['language'] != language:
+        return None
+    return f"{passage['title']}: {passage['text']}"
+
+
+def context_prompt(results, threshold=CONTEXT_THRESHOLD):
+    """System prompt addition listing the relevant passages, or ''"""
+    passages = [passage for score, passage in results if score >= threshold]
+    if not passages:
+        return ''
+    lines = [f"[{n}] {passage['title']}: {passage['text']}" for n, passage in enumerate(passages, 1)]
+    return ("\nUse this AgriSmart knowledge where it is relevant, and prefer it over general advice:\n"
+            + '\n'.join(lines))
+
+
+def record_answer(source):
+    metrics.registry.inc('ai_chat_answers_total', (('source', source),))
+
+
+def local_ratio():
+    with metrics.registry.lock:
+        answers = {labels: count for (name, labels), count in metrics.registry.counters.items()
+                   if name == 'ai_chat_answers_total'}
+    total = sum(answers.values())
+    return answers.get((('source', 'local'),), 0) / total if total else 0.0
+
+
+index = KnowledgeIndex()
+metrics.registry.gauge_callback('ai_chat_local_answer_ratio', local_ratio)
+metrics.registry.gauge_callback('rag_index_passages', index.__len__)
@@ -0,0 +1,245 @@
+"""
+AgriSmart 2.0 - Government Scheme Matching
+Parses free-text eligibility into structured criteria and matches farmer
+profiles against a precomputed inverted index of bitmasks
+"""
+
+from bisect import bisect_left
+from collections import OrderedDict
+import hashlib
+import json
+import re
+import threading
+
+STATES = [
+    'Andhra Pradesh', 'Arunachal Pradesh', 'Assam', 'Bihar', 'Chhattisgarh', 'Goa', 'Gujarat',
+    'Haryana', 'Himachal Pradesh', 'Jharkhand', 'Karnataka', 'Kerala', 'Madhya Pradesh',
+    'Maharashtra', 'Manipur', 'Meghalaya', 'Mizoram', 'Nagaland', 'Odisha', 'Punjab',
+    'Rajasthan', 'Sikkim', 'Tamil Nadu', 'Telangana', 'Tripura', 'Uttar Pradesh', 'Uttarakhand',
+    'West Bengal', 'Delhi', 'Jammu and Kashmir', 'Ladakh', 'Puducherry',
+]
+
+CROPS = [
+    'wheat', 'rice', 'paddy', 'cotton', 'sugarcane', 'tomato', 'potato', 'maize', 'mustard',
+    'pulses', 'soybean', 'groundnut', 'millet', 'jute', 'tea', 'coffee', 'coconut',
+]
+
+ROLES = {'farmer': 'farmer', 'cultivator': 'farmer', 'trader': 'trader', 'expert': 'expert'}
+
+ACRES_PER_HECTARE = 2.471
+# Land size categories used by Indian schemes, in acres
+SIZE_CATEGORIES = {
+    'marginal': (0, 1 * ACRES_PER_HECTARE),
+    'small': (0, 2 * ACRES_PER_HECTARE),
+}
+
+_STATE_PATTERN = re.compile(r'\b(' + '|'.join(re.escape(s) for s in STATES) + r')\b', re.IGNORECASE)
+_CROP_PATTERN = re.compile(r'\b(' + '|'.join(CROPS) + r')\b', re.IGNORECASE)
+_ROLE_PATTERN = re.compile(r'\b(' + '|'.join(ROLES) + r')s?\b', re.IGNORECASE)
+_SIZE_PATTERN = re.compile(
+    r'(up to|upto|less than|below|under|maximum of|max|above|more than|over|at least|minimum of|min)\s*'
+    r'(\d+(?:\.\d+)?)\s*(hectares?|ha|acres?)\b', re.IGNORECASE
+)
+_LAND_PATTERN = re.compile(r'\b(landholding|landholder|owning land|land owner|landowner)', re.IGNORECASE)
+_TENANT_PATTERN = re.compile(r'\b(tenant|lessee|sharecropper|landless)', re.IGNORECASE)
+_ANY_CROP_PATTERN = re.compile(r'\bnotified crops?\b|\ball crops\b', re.IGNORECASE)
+
+_STATE_NAMES = {s.lower(): s for s in STATES}
+_CANONICAL_CROPS = {'paddy': 'rice'}
+
+
+def _canonical_crop(name):
+    name = (name or '').strip().lower()
+    return _CANONICAL_CROPS.get(name, name)
+
+
+def parse_eligibility(text, state=None):
+    """Extract structured criteria from a scheme's eligibility text.
+
+    Returns a dict with ``roles``, ``states`` and ``crops`` (sets, or None for
+    no restriction), ``min_farm_size``/``max_farm_size`` in acres (or None)
+    and ``requires_land``.
+    """
+    text = text or ''
+    criteria = {
+        'roles': None, 'states': None, 'crops': None,
+        'min_farm_size': None, 'max_farm_size': None, 'requires_land': False,
+    }
+
+    roles = {ROLES[m.lower()] for m in _ROLE_PATTERN.findall(text)}
+    if roles:
+        criteria['roles'] = roles
+
+    states = {_STATE_NAMES[m.lower()] for m in _STATE_PATTERN.findall(text)}
+    if state and state != 'All':
+        states.add(_STATE_NAMES.get(state.lower(), state))
+    if states:
+        criteria['states'] = states
+
+    if not _ANY_CROP_PATTERN.search(text):
+        crops = {_canonical_crop(m) for m in _CROP_PATTERN.findall(text)}
+        if crops:
+            criteria['crops'] = crops
+
+    for word, (_, high) in SIZE_CATEGORIES.items():
+        if re.search(rf'\b{word}\b', text, re.IGNORECASE):
+            criteria['max_farm_size'] = max(criteria['max_farm_size'] or 0, high)
+    for bound, value, unit in _SIZE_PATTERN.findall(text):
+        acres = float(value) * (ACRES_PER_HECTARE if unit.lower().startswith('h') else 1)
+        if bound.lower() in ('above', 'more than', 'over', 'at least', 'minimum of', 'min'):
+            criteria['min_farm_size'] = acres
+        else:
+            criteria['max_farm_size'] = acres
+
+    criteria['requires_land'] = bool(_LAND_PATTERN.search(text)) and not _TENANT_PATTERN.search(text)
+    return criteria
+
+
+def state_from_location(location):
+    """Best-effort state name from a free-text location like 'Ludhiana, Punjab'"""
+    match = _STATE_PATTERN.search(location or '')
+    return _STATE_NAMES[match.group(1).lower()] if match else None
+
+
+def build_profile(user, crops=()):
+    """Normalized matching profile from a users row and the crops they grow"""
+    return {
+        'role': (user['role'] or 'farmer').lower(),
+        'state': state_from_location(user['location']),
+        'farm_size': float(user['farm_size'] or 0),
+        'crops': sorted({_canonical_crop(c) for c in crops if c}),
+    }
+
+
+def profile_hash(profile):
+    return hashlib.sha1(json.dumps(profile, sort_keys=True).encode()).hexdigest()
+
+
+def _bits(mask):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class SchemeIndex:
+    """Inverted index over active schemes.
+
+    Every scheme gets one bit (in list order); each criterion value maps to a
+    bitmask of the schemes that accept it, plus a wildcard mask of schemes
+    with no restriction on that dimension. Matching a profile is a handful of
+    integer ANDs, and farm-size ranges are resolved by bisecting
+    precomputed breakpoints.
+    """
+
+    def __init__(self, rows):
+        self.rows = [dict(row) for row in rows]
+        self.criteria = [parse_eligibility(r['eligibility'], r['state']) for r in self.rows]
+        self.all = (1 << len(self.rows)) - 1
+        self.postings = {'roles': {}, 'states': {}, 'crops': {}}
+        self.wildcard = {'roles': 0, 'states': 0, 'crops': 0}
+        self.requires_land = 0
+
+        for bit, criteria in enumerate(self.criteria):
+            for dim, postings in self.postings.items():
+                if criteria[dim] is None:
+                    self.wildcard[dim] |= 1 << bit
+                else:
+                    for value in criteria[dim]:
+                        postings[value] = postings.get(value, 0) | (1 << bit)
+            if criteria['requires_land']:
+                self.requires_land |= 1 << bit
+
+        points = sorted({
+            bound for c in self.criteria
+            for bound in (c['min_farm_size'], c['max_farm_size']) if bound is not None
+        })
+        self.size_points = points
+        probes = [points[0] - 1 if points else 0] + [
+            (points[i - 1] + points[i]) / 2 for i in range(1, len(points))
+        ] + [points[-1] + 1 if points else 0]
+        self.size_gap_masks = [self._size_mask(v) for v in probes]
+        self.size_point_masks = [self._size_mask(v) for v in points]
+
+    def _size_mask(self, value):
+        mask = 0
+        for bit, c in enumerate(self.criteria):
+            if (c['min_farm_size'] is None or value >= c['min_farm_size']) and \
+               (c['max_farm_size'] is None or value <= c['max_farm_size']):
+                mask |= 1 << bit
+        return mask
+
+    def match_mask(self, profile):
+        mask = self.all
+        mask &= self.postings['roles'].get(profile['role'], 0) | self.wildcard['roles']
+        mask &= self.postings['states'].get(profile['state'], 0) | self.wildcard['states']
+        # Crops are optional on profiles; unknown crops don't exclude anything
+        if profile['crops']:
+            crop_mask = self.wildcard['crops']
+            for crop in profile['crops']:
+                crop_mask |= self.postings['crops'].get(crop, 0)
+            mask &= crop_mask
+
+        size = profile['farm_size']
+        i = bisect_left(self.size_points, size)
+        if i < len(self.size_points) and self.size_points[i] == size:
+            mask &= self.size_point_masks[i]
+        else:
+            mask &= self.size_gap_masks[i]
+        if size <= 0:
+            mask &= ~self.requires_land
+        return mask
+
+    def match(self, profile):
+        return [self.rows[bit] for bit in _bits(self.match_mask(profile))]
+
+
+class SchemeMatcher:
+    """Holds the current SchemeIndex and an LRU cache of per-profile results.
+
+    The index is rebuilt whenever the government_schemes version counter
+    moves; profile changes produce a new profile hash and so a new cache key.
+    """
+
+    def __init__(self, max_profiles=10000):
+        self.max_profiles = max_profiles
+        self.index = None
+        self.version = None
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _refresh(self, conn, version):
+        rows = conn.execute(
+            'SELECT * FROM government_schemes WHERE is_active = 1 ORDER BY created_at DESC, id DESC'
+        ).fetchall()
+        index = SchemeIndex(rows)
+        with self.lock:
+            self.index = index
+            self.version = version
+            self.cache.clear()
+
+    def for_profile(self, conn, profile, version):
+        if self.index is None or version != self.version:
+            self._refresh(conn, version)
+
+        key = profile_hash(profile)
+        with self.lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                return self.cache[key]
+            index = self.index
+
+        result = index.match(profile)
+        with self.lock:
+            self.cache[key] = result
+            if len(self.cache) > self.max_profiles:
+                self.cache.popitem(last=False)
+        return result
+
+    def invalidate(self):
+        with self.lock:
+            self.index = None
+            self.cache.clear()
+
+
+matcher = SchemeMatcher()
@@ -3,10 +3,15 @@ Seed data script for AgriSmart 2.0
 Populates the database with sample data for testing
 """
 
+import argparse
+import itertools
 import sqlite3
+import time
 from datetime import datetime, timedelta
 import random
 
+from werkzeug.security import generate_password_hash
+
 def seed_database():
     conn = sqlite3.connect('agrismart.db')
     cursor = conn.cursor()
@@ -220,5 +225,160 @@ def seed_database():
     conn.close()
     print("✅ Database seeded successfully!")
 
+# Synthetic data generation for load testing
+LOCATIONS = [
+    'Ludhiana, Punjab', 'Amritsar, Punjab', 'Karnal, Haryana', 'Hisar, Haryana',
+    'Meerut, Uttar Pradesh', 'Lucknow, Uttar Pradesh', 'Varanasi, Uttar Pradesh',
+    'Patna, Bihar', 'Indore, Madhya Pradesh', 'Bhopal, Madhya Pradesh', 'Jaipur, Rajasthan',
+    'Kota, Rajasthan', 'Nashik, Maharashtra', 'Pune, Maharashtra', 'Nagpur, Maharashtra',
+    'Rajkot, Gujarat', 'Anand, Gujarat', 'Guntur, Andhra Pradesh', 'Warangal, Telangana',
+    'Mysuru, Karnataka', 'Belagavi, Karnataka', 'Thanjavur, Tamil Nadu', 'Coimbatore, Tamil Nadu',
+    'Thrissur, Kerala', 'Cuttack, Odisha', 'Bardhaman, West Bengal', 'Guwahati, Assam', 'Delhi',
+]
+CROPS = ['wheat', 'rice', 'cotton', 'sugarcane', 'tomato', 'potato', 'maize', 'mustard']
+DISEASES = [
+    ('Leaf Blight', 'Apply copper-based fungicide', 'Ensure proper drainage and spacing'),
+    ('Powdery Mildew', 'Use sulfur-based spray', 'Reduce humidity, improve air circulation'),
+    ('Bacterial Spot', 'Remove infected leaves, apply bactericide', 'Use disease-free seeds'),
+    ('Rust', 'Spray propiconazole', 'Grow resistant varieties'),
+]
+PRODUCT_CATEGORIES = ['Grains', 'Vegetables', 'Fruits', 'Dairy', 'Poultry', 'Fertilizers', 'Pesticides']
+FORUM_CATEGORIES = ['Crops', 'Pest Control', 'Irrigation', 'Government Schemes', 'Soil', 'Market Prices']
+CHAT_ROOMS = ['general', 'crops', 'market', 'weather', 'hindi']
+LOAD_TEST_PASSWORD = 'password123'
+
+def _batched(rows, size):
+    rows = iter(rows)
+    while True:
+        batch = list(itertools.islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+def _skewed_ids(rng, count, population, skew=1.2):
+    """Ids drawn from a Zipf-like distribution: a few hot ids get most rows"""
+    weights = list(itertools.accumulate(1 / (rank ** skew) for rank in range(1, population + 1)))
+    ids = list(range(1, population + 1))
+    rng.shuffle(ids)
+    while count > 0:
+        chunk = min(count, 100000)
+        for i in rng.choices(range(population), cum_weights=weights, k=chunk):
+            yield ids[i]
+        count -= chunk
+
+def generate_database(db_path='agrismart.db', users=10000, products=20000, posts=20000,
+                      comments=100000, messages=100000, detections=50000,
+                      batch_size=10000, seed=42):
+    """Bulk-generate synthetic rows for load testing.
+
+    Each table is filled with batched executemany calls inside a single
+    transaction. Forum comments follow a Zipf-like distribution over posts so
+    a few threads are very hot. Generated users are loadtest<N>@example.com
+    and all share LOAD_TEST_PASSWORD, hashed once.
+    """
+    if users < 1:
+        raise ValueError('generate_database needs at least one user to own the generated rows')
+    rng = random.Random(seed)
+    conn = sqlite3.connect(db_path)
+    conn.execute('PRAGMA synchronous = OFF')
+    cursor = conn.cursor()
+    cursor.execute('SELECT COALESCE(MAX(id), 0) FROM users')
+    first_user = cursor.fetchone()[0] + 1
+    cursor.execute('SELECT COALESCE(MAX(id), 0) FROM forum_posts')
+    first_post = cursor.fetchone()[0] + 1
+    password = generate_password_hash(LOAD_TEST_PASSWORD)
+    now = datetime.now()
+
+    def timestamp(max_days):
+        return (now - timedelta(seconds=rng.randint(0, max_days * 86400))).strftime('%Y-%m-%d %H:%M:%S')
+
+    def user_id():
+        return rng.randint(first_user, first_user + users - 1)
+
+    user_rows = (
+        (f'Farmer {i}', f'loadtest{i}@example.com', password, f'+91 9{i:09d}',
+         rng.choices(['farmer', 'expert', 'trader'], weights=[90, 5, 5])[0],
+         rng.choices(['en', 'hi'], weights=[60, 40])[0], rng.choice(LOCATIONS),
+         round(rng.uniform(0.5, 25), 1), timestamp(365))
+        for i in range(first_user, first_user + users)
+    )
+    product_rows = (
+        (user_id(), f'{rng.choice(CROPS).title()} lot {i}', rng.choice(PRODUCT_CATEGORIES),
+         f'Fresh produce lot {i} directly from farm', round(rng.uniform(5, 200), 2),
+         rng.randint(10, 1000), rng.randint(0, 1), timestamp(180))
+        for i in range(products)
+    )
+    post_rows = (
+        (user_id(), f'Question {i} about {rng.choice(CROPS)}',
+         'Looking for advice from fellow farmers on this season. ' * rng.randint(1, 5),
+         rng.choice(FORUM_CATEGORIES), ','.join(rng.sample(CROPS, 2)),
+         rng.randint(0, 500), rng.randint(0, 50), timestamp(365))
+        for i in range(posts)
+    )
+    comment_rows = (
+        (first_post + post - 1, user_id(), 'Try neem oil and check soil moisture first.', timestamp(365))
+        for post in (_skewed_ids(rng, comments, posts) if posts else ())
+    )
+    message_rows = (
+        (user_id(), f'Message {i}: mandi prices are up today', rng.choice(CHAT_ROOMS),
+         rng.choice(['en', 'hi']), timestamp(365))
+        for i in range(messages)
+    )
+    detection_rows = (
+        (user_id(), rng.choice(CROPS), name, round(rng.uniform(0.6, 0.99), 2), treatment, prevention,
+         timestamp(365))
+        for name, treatment, prevention in (rng.choice(DISEASES) for _ in range(detections))
+    )
+
+    tables = [
+        ('users', 'INSERT INTO users (name, email, password, phone, role, language, location, farm_size, created_at) '
+                  'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', user_rows),
+        ('products', 'INSERT INTO products (seller_id, name, category, description, price, unit, quantity, '
+                     'is_organic, status, created_at) VALUES (?, ?, ?, ?, ?, "kg", ?, ?, "active", ?)', product_rows),
+        ('forum_posts', 'INSERT INTO forum_posts (user_id, title, content, category, tags, views, likes, created_at) '
+                        'VALUES (?, ?, ?, ?, ?, ?, ?, ?)', post_rows),
+        ('forum_comments', 'INSERT INTO forum_comments (post_id, user_id, content, created_at) '
+                           'VALUES (?, ?, ?, ?)', comment_rows),
+        ('chat_messages', 'INSERT INTO chat_messages (sender_id, message, room, language, created_at) '
+                          'VALUES (?, ?, ?, ?, ?)', message_rows),
+        ('disease_detections', 'INSERT INTO disease_detections (user_id, crop_name, disease_name, confidence, '
+                               'image, treatment, preventive_measures, created_at) '
+                               'VALUES (?, ?, ?, ?, "", ?, ?, ?)', detection_rows),
+    ]
+
+    counts = {}
+    for table, sql, rows in tables:
+        start = time.perf_counter()
+        total = 0
+        for batch in _batched(rows, batch_size):
+            cursor.executemany(sql, batch)
+            total += len(batch)
+        counts[table] = total
+        print(f"  {table}: {total} rows in {time.perf_counter() - start:.1f}s")
+
+    conn.commit()
+    conn.close()
+    return counts
+
 if __name__ == '__main__':
-    seed_database()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Seed the AgriSmart database')
+    parser.add_argument('--generate', action='store_true', help='bulk-generate synthetic load-test data')
+    parser.add_argument('--db', default='agrismart.db')
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--products', type=int, default=20000)
+    parser.add_argument('--posts', type=int, default=20000)
+    parser.add_argument('--comments', type=int, default=100000)
+    parser.add_argument('--messages', type=int, default=100000)
+    parser.add_argument('--detections', type=int, default=50000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    if args.generate and args.users < 1:
+        parser.error('--users must be at least 1')
+
+    if args.generate:
+        generate_database(args.db, users=args.users, products=args.products, posts=args.posts,
+                          comments=args.comments, messages=args.messages,
+                          detections=args.detections, seed=args.seed)
+        print("✅ Synthetic data generated successfully!")
+    else:
+        seed_database()
\ No newline at end of file
@@ -0,0 +1,194 @@
+"""
+AgriSmart 2.0 - Delta Sync
+Change feed for offline-first clients over tips, schemes, products and
+forum posts
+
+Triggers record every insert, content update and delete in change_log as
+(domain, row id) -> (sequence number, deleted flag). Each row keeps only its
+latest change, so a post edited fifty times is sent once, and the sequence
+comes from a single counter so it only ever increases. Clients remember the
+``seq`` of their last sync and ask for changes after it.
+
+View and like counters are excluded from the triggered columns: they change
+constantly and clients refresh them when an item is opened. Rows that stop
+being listed (sold-out products, inactive schemes) are sent as deletions.
+Author and seller names are read at sync time; renaming a user does not
+resend their rows.
+"""
+
+import time
+
+# domain -> (table, columns whose updates count as changes, row query, related
+# (table, foreign key) whose inserts/deletes touch the row)
+DOMAINS = {
+    'tips': (
+        'farming_tips', ('title', 'category', 'content', 'tags', 'language', 'image', 'video_url'),
+        '''SELECT t.id, t.title, t.category, t.content, t.tags, t.language, t.image, t.video_url, t.created_at,
+                  u.name AS author_name
+           FROM farming_tips t LEFT JOIN users u ON t.author_id = u.id WHERE t.id IN ({ids})''',
+        None,
+    ),
+    'schemes': (
+        'government_schemes', ('name', 'category', 'description', 'eligibility', 'benefits',
+                               'application_process', 'contact_info', 'state', 'is_active'),
+        'SELECT * FROM government_schemes WHERE is_active = 1 AND id IN ({ids})',
+        None,
+    ),
+    'products': (
+        'products', ('name', 'category', 'description', 'price', 'unit', 'quantity', 'is_organic', 'image',
+                     'rating', 'reviews_count', 'status'),
+        '''SELECT p.id, p.seller_id, p.name, p.category, p.description, p.price, p.unit, p.quantity,
+                  p.is_organic, p.image, p.rating, p.reviews_count, p.created_at, u.name AS seller_name
+           FROM products p JOIN users u ON p.seller_id = u.id WHERE p.status = 'active' AND p.id IN ({ids})''',
+        None,
+    ),
+    'forum': (
+        'forum_posts', ('title', 'content', 'category', 'tags', 'is_pinned'),
+        '''SELECT p.id, p.user_id, p.title, p.content, p.category, p.tags, p.is_pinned, p.created_at,
+                  u.name AS author_name, u.role, u.profile_image,
+                  (SELECT COUNT(*) FROM forum_comments c WHERE c.post_id = p.id) AS comments_count
+           FROM forum_posts p JOIN users u ON p.user_id = u.id WHERE p.id IN ({ids})''',
+        ('forum_comments', 'post_id'),
+    ),
+}
+
+MAX_CHANGES = 5000
+TOMBSTONE_RETENTION_DAYS = 90
+
+
+def _log(domain, row_id, deleted):
+    return f'''
+        UPDATE sync_sequence SET seq = seq + 1, changed_at = CAST(strftime('%s', 'now') AS INTEGER);
+        INSERT OR REPLACE INTO change_log (domain, row_id, seq, deleted, changed_at)
+        SELECT '{domain}', {row_id}, seq, {deleted}, changed_at FROM sync_sequence;
+    '''
+
+
+def init_tables(cursor):
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'change_log'")
+    backfill = cursor.fetchone() is None
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sync_sequence (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            seq INTEGER NOT NULL DEFAULT 0,
+            changed_at INTEGER,
+            pruned_seq INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute('INSERT OR IGNORE INTO sync_sequence (id, seq) VALUES (1, 0)')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS change_log (
+            domain TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            seq INTEGER NOT NULL,
+            deleted INTEGER NOT NULL DEFAULT 0,
+            changed_at INTEGER,
+            PRIMARY KEY (domain, row_id)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_change_log_seq ON change_log(seq)')
+
+    for domain, (table, columns, _, related) in DOMAINS.items():
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_insert_sync AFTER INSERT ON {table}
+            BEGIN {_log(domain, 'NEW.id', 0)} END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_update_sync AFTER UPDATE OF {', '.join(columns)} ON {table}
+            BEGIN {_log(domain, 'NEW.id', 0)} END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_delete_sync AFTER DELETE ON {table}
+            BEGIN {_log(domain, 'OLD.id', 1)} END
+        ''')
+        if related:
+            related_table, key = related
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {related_table}_insert_sync AFTER INSERT ON {related_table}
+                BEGIN {_log(domain, f'NEW.{key}', 0)} END
+            ''')
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {related_table}_delete_sync AFTER DELETE ON {related_table}
+                BEGIN {_log(domain, f'OLD.{key}', 0)} END
+            ''')
+
+        if backfill:
+            # Rows that predate the triggers, so a first sync from 0 sees everything
+            cursor.execute(f'''
+                INSERT OR IGNORE INTO change_log (domain, row_id, seq, deleted, changed_at)
+                SELECT ?, id, (SELECT seq FROM sync_sequence) + ROW_NUMBER() OVER (ORDER BY id), 0,
+                       CAST(strftime('%s', 'now') AS INTEGER)
+                FROM {table}
+            ''', (domain,))
+            cursor.execute('UPDATE sync_sequence SET seq = (SELECT COALESCE(MAX(seq), 0) FROM change_log)')
+
+
+def current_seq(cursor):
+    cursor.execute('SELECT seq, pruned_seq FROM sync_sequence WHERE id = 1')
+    return tuple(cursor.fetchone())
+
+
+def changes(cursor, since, domains=None, limit=MAX_CHANGES):
+    """Changes after ``since`` as {'seq', 'more', 'reset', 'domains'}.
+
+    Each domain maps to {'fields', 'rows', 'deleted'} with rows as value
+    lists. ``seq`` is the cursor for the next call and ``more`` says whether
+    it will return anything; keep the same ``domains`` between calls.
+    ``reset`` means tombstones the client needed were pruned: it should drop
+    its copy and apply this response as a full sync. Full syncs (from 0)
+    carry no tombstones and are not split into pages.
+    """
+    latest, pruned = current_seq(cursor)
+    reset = since > latest or 0 < since < pruned
+    if reset:
+        since = 0
+
+    domains = [domain for domain in (domains or DOMAINS) if domain in DOMAINS]
+    query = f'''
+        SELECT domain, row_id, seq, deleted FROM change_log
+        WHERE seq > ? AND domain IN ({','.join('?' * len(domains))})
+    '''
+    if since == 0:
+        cursor.execute(query + ' AND deleted = 0 ORDER BY seq', (since, *domains))
+        log, more = cursor.fetchall(), False
+    else:
+        cursor.execute(query + ' ORDER BY seq LIMIT ?', (since, *domains, limit + 1))
+        log = cursor.fetchall()
+        more = len(log) > limit
+        log = log[:limit]
+
+    result = {}
+    for domain in domains:
+        changed = [row[1] for row in log if row[0] == domain and not row[3]]
+        deleted = [row[1] for row in log if row[0] == domain and row[3]]
+        fields, rows = [], []
+        if changed:
+            cursor.execute(DOMAINS[domain][2].format(ids='SELECT value FROM json_each(?)'),
+                           ('[' + ','.join(map(str, changed)) + ']',))
+            fields = [column[0] for column in cursor.description]
+            rows = [list(row) for row in cursor.fetchall()]
+            if since:
+                # Changed but no longer listed (inactive, sold out): a deletion for the client
+                found = {row[0] for row in rows}
+                deleted.extend(row_id for row_id in changed if row_id not in found)
+        if rows or deleted:
+            result[domain] = {'fields': fields, 'rows': rows, 'deleted': sorted(deleted)}
+
+    seq = log[-1][2] if more else max([latest, since] + [row[2] for row in log[-1:]])
+    return {'seq': seq, 'more': more, 'reset': reset, 'domains': result}
+
+
+def prune_tombstones(conn, days=TOMBSTONE_RETENTION_DAYS):
+    """Drop deletion records older than ``days``; clients that last synced
+    before the newest dropped one get a full resync. Returns rows removed."""
+    cutoff = int(time.time()) - days * 86400
+    cursor = conn.cursor()
+    cursor.execute('SELECT MAX(seq) FROM change_log WHERE deleted = 1 AND changed_at < ?', (cutoff,))
+    newest = cursor.fetchone()[0]
+    if newest is None:
+        return 0
+    cursor.execute('DELETE FROM change_log WHERE deleted = 1 AND seq <= ?', (newest,))
+    removed = cursor.rowcount
+    cursor.execute('UPDATE sync_sequence SET pruned_seq = MAX(pruned_seq, ?) WHERE id = 1', (newest,))
+    conn.commit()
+    return removed
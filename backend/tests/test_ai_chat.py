@@ -0,0 +1,41 @@
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app
+import retrieval
+
+
+def stub_openai(monkeypatch, reply):
+    openai = pytest.importorskip('openai')
+    requests = []
+
+    class FakeClient:
+        def __init__(self, api_key=None):
+            self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+        def create(self, **kwargs):
+            requests.append(kwargs)
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=reply))])
+
+    monkeypatch.setattr(openai, 'OpenAI', FakeClient)
+    return requests
+
+
+def test_llm_answer_puts_retrieved_context_in_system_prompt(monkeypatch):
+    requests = stub_openai(monkeypatch, ' Irrigate at crown root initiation. ')
+    passage = {'title': 'Wheat irrigation', 'text': 'First irrigation 20-25 days after sowing.'}
+    context = retrieval.context_prompt([(0.9, passage)])
+
+    answer = app._llm_answer('When should I water wheat?', 'hi', context)
+
+    assert answer == ('Irrigate at crown root initiation.', 'llm')
+    system, user = requests[0]['messages']
+    assert system['role'] == 'system'
+    assert '[1] Wheat irrigation: First irrigation 20-25 days after sowing.' in system['content']
+    assert 'Respond in Hindi language.' in system['content']
+    assert user == {'role': 'user', 'content': 'When should I water wheat?'}
@@ -0,0 +1,32 @@
+import os
+import sqlite3
+import sys
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import outbreaks
+
+
+def make_db():
+    conn = sqlite3.connect(':memory:')
+    conn.execute('CREATE TABLE users (id INTEGER PRIMARY KEY, location TEXT)')
+    outbreaks.init_tables(conn.cursor())
+    return conn
+
+
+def test_heatmap_skips_cells_with_reports_only_in_previous_window():
+    conn = make_db()
+    today = datetime.now(timezone.utc).date()
+    conn.executemany(
+        'INSERT INTO outbreak_cells (day, geohash, disease, state, count) VALUES (?, ?, ?, ?, ?)', [
+            ((today - timedelta(days=20)).isoformat(), 'ttnfv', 'Leaf Blight', 'Delhi', 7),
+            (today.isoformat(), 'tsq4p', 'Rust', 'Punjab', 3),
+            ((today - timedelta(days=20)).isoformat(), 'tsq4p', 'Rust', 'Punjab', 2),
+        ])
+
+    cells = outbreaks.heatmap(conn.cursor(), days=14, precision=5)
+
+    assert [(cell['geohash'], cell['disease'], cell['count'], cell['previous']) for cell in cells] == [
+        ('tsq4p', 'Rust', 3, 2),
+    ]
@@ -0,0 +1,81 @@
+import os
+import sqlite3
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import translation
+
+
+class FakeTranslator:
+    name = 'fake'
+
+    def __init__(self):
+        self.calls = []
+
+    def translate(self, texts, source, target):
+        self.calls.append((list(texts), source, target))
+        return [f'[{target}] {text}' for text in texts]
+
+
+def make_queue(monkeypatch, tmp_path, translator):
+    path = str(tmp_path / 'translations.db')
+    conn = sqlite3.connect(path)
+    translation.init_tables(conn.cursor())
+    conn.close()
+    monkeypatch.setattr(translation.translation_queue, 'translator', translator)
+    monkeypatch.setattr(translation.translation_queue, 'connect', lambda: sqlite3.connect(path))
+    return translation.translation_queue, path
+
+
+def test_process_writes_translations_once_per_text(monkeypatch, tmp_path):
+    translator = FakeTranslator()
+    jobs, path = make_queue(monkeypatch, tmp_path, translator)
+
+    written = jobs.process([('Water wheat', 'en', 'hi'), ('Water wheat', 'en', 'hi'), ('Sow rice', 'en', 'hi')])
+
+    assert written == 2
+    assert translator.calls == [(['Water wheat', 'Sow rice'], 'en', 'hi')]
+    conn = sqlite3.connect(path)
+    rows = conn.execute('SELECT content_hash, target, source, text, backend FROM translations ORDER BY text').fetchall()
+    conn.close()
+    assert rows == [
+        (translation.content_hash('Sow rice'), 'hi', 'en', '[hi] Sow rice', 'fake'),
+        (translation.content_hash('Water wheat'), 'hi', 'en', '[hi] Water wheat', 'fake'),
+    ]
+
+    # Texts already in translation memory are not sent to the backend again
+    assert jobs.process([('Water wheat', 'en', 'hi')]) == 0
+    assert len(translator.calls) == 1
+
+
+def test_process_without_backend_writes_nothing(monkeypatch, tmp_path):
+    jobs, path = make_queue(monkeypatch, tmp_path, None)
+
+    assert jobs.process([('Water wheat', 'en', 'hi')]) == 0
+    conn = sqlite3.connect(path)
+    assert conn.execute('SELECT COUNT(*) FROM translations').fetchone()[0] == 0
+    conn.close()
+
+
+def test_openai_translator_uses_chat_completions_client(monkeypatch):
+    openai = pytest.importorskip('openai')
+    requests = []
+
+    class FakeClient:
+        def __init__(self, api_key=None):
+            self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+        def create(self, **kwargs):
+            requests.append(kwargs)
+            message = SimpleNamespace(content=' गेहूं को पानी दें \n')
+            return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+    monkeypatch.setattr(openai, 'OpenAI', FakeClient)
+
+    assert translation.OpenAITranslator().translate(['Water wheat'], 'en', 'hi') == ['गेहूं को पानी दें']
+    assert requests[0]['messages'][1] == {'role': 'user', 'content': 'Water wheat'}
+    assert 'from English to Hindi' in requests[0]['messages'][0]['content']
@@ -0,0 +1,291 @@
+"""
+AgriSmart 2.0 - Translation Memory
+Pluggable machine translation with a persistent cache, filled in the
+background so request handlers never wait on a translator
+
+Translations are stored in the translations table keyed by (hash of the
+source text, target language), so identical text is only ever translated
+once per language no matter where it appears. Handlers look translations up
+with lookup() and enqueue() whatever is missing; the queue's worker thread
+translates in batches and writes the results back.
+
+Backends are chosen with TRANSLATOR: 'openai', or 'stub' (offline glossary
+substitution, for tests only). With no backend nothing is queued and
+content is served in its source language, marked untranslated; stub output
+is never served unless the stub is the configured backend.
+"""
+
+import hashlib
+import logging
+import os
+import queue
+import re
+import threading
+import time
+
+import metrics
+
+LANGUAGES = ('en', 'hi')
+BATCH_SIZE = 20
+
+# Translatable text columns of each content table
+CONTENT = {
+    'farming_tips': ('title', 'content'),
+    'government_schemes': ('name', 'description', 'eligibility', 'benefits'),
+    'forum_posts': ('title', 'content'),
+}
+
+logger = logging.getLogger('agrismart.translation')
+metrics.registry.describe('translation_lookups_total', 'counter', 'Translation memory lookups by result')
+metrics.registry.describe('translations_total', 'counter', 'Texts translated by backend and outcome')
+metrics.registry.describe('translation_queue_depth', 'gauge', 'Texts waiting to be translated')
+
+
+def init_tables(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS translations (
+            content_hash TEXT NOT NULL,
+            target TEXT NOT NULL,
+            source TEXT,
+            text TEXT NOT NULL,
+            backend TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (content_hash, target)
+        ) WITHOUT ROWID
+    ''')
+
+
+def content_hash(text):
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+
+def detect_language(text):
+    """'hi' for text containing Devanagari, else 'en'"""
+    return 'hi' if re.search('[ऀ-ॿ]', text or '') else 'en'
+
+
+class StubTranslator:
+    """Offline glossary substitution so tests can exercise the pipeline
+    without an API key. Its output is placeholder text, not a translation."""
+
+    name = 'stub'
+    GLOSSARY = {
+        'wheat': 'गेहूं', 'rice': 'चावल', 'paddy': 'धान', 'cotton': 'कपास', 'sugarcane': 'गन्ना',
+        'tomato': 'टमाटर', 'potato': 'आलू', 'maize': 'मक्का', 'mustard': 'सरसों', 'crop': 'फसल',
+        'crops': 'फसलें', 'farmer': 'किसान', 'farmers': 'किसान', 'soil': 'मिट्टी', 'water': 'पानी',
+        'irrigation': 'सिंचाई', 'seed': 'बीज', 'seeds': 'बीज', 'fertilizer': 'उर्वरक', 'pest': 'कीट',
+        'pests': 'कीट', 'disease': 'रोग', 'harvest': 'कटाई', 'rain': 'बारिश', 'scheme': 'योजना',
+        'subsidy': 'सब्सिडी', 'loan': 'ऋण', 'insurance': 'बीमा', 'market': 'मंडी', 'price': 'मूल्य',
+        'organic': 'जैविक', 'spray': 'छिड़काव', 'field': 'खेत', 'weather': 'मौसम', 'and': 'और',
+    }
+
+    def __init__(self):
+        self.tables = {'hi': self.GLOSSARY, 'en': {hi: en for en, hi in self.GLOSSARY.items()}}
+        self.patterns = {
+            target: re.compile(r'\b(' + '|'.join(map(re.escape, table)) + r')\b', re.IGNORECASE)
+            for target, table in self.tables.items()
+        }
+
+    def translate(self, texts, source, target):
+        if target not in self.tables:
+            return list(texts)
+        table, pattern = self.tables[target], self.patterns[target]
+        return [pattern.sub(lambda m: table.get(m.group(1).lower(), m.group(1)), text) for text in texts]
+
+
+class OpenAITranslator:
+    name = 'openai'
+    NAMES = {'en': 'English', 'hi': 'Hindi'}
+
+    def translate(self, texts, source, target):
+        import openai
+        client = openai.OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+        results = []
+        for text in texts:
+            with metrics.upstream('openai'):
+                response = client.chat.completions.create(
+                    model='gpt-3.5-turbo',
+                    messages=[
+                        {'role': 'system', 'content': f"Translate the user's farming text from "
+                         f"{self.NAMES.get(source, source)} to {self.NAMES.get(target, target)}. "
+                         "Reply with the translation only, keeping crop and product names accurate."},
+                        {'role': 'user', 'content': text},
+                    ],
+                    temperature=0,
+                )
+            results.append(response.choices[0].message.content.strip())
+        return results
+
+
+BACKENDS = {'stub': StubTranslator, 'openai': OpenAITranslator}
+
+
+def lookup(cursor, texts, target):
+    """{text: translation} for the texts already in translation memory"""
+    hashes = {content_hash(text): text for text in texts if text}
+    if not hashes:
+        return {}
+    query = f'''
+        SELECT content_hash, text FROM translations WHERE target = ? AND content_hash IN ({','.join('?' * len(hashes))})
+    '''
+    if not isinstance(translation_queue.translator, StubTranslator):
+        query += " AND backend IS NOT 'stub'"
+    cursor.execute(query, [target, *hashes])
+    found = {hashes[row[0]]: row[1] for row in cursor.fetchall()}
+    metrics.registry.inc('translation_lookups_total', (('result', 'hit'),), len(found))
+    metrics.registry.inc('translation_lookups_total', (('result', 'miss'),), len(hashes) - len(found))
+    return found
+
+
+class TranslationQueue:
+    """Deduplicating background queue of (text, source, target) jobs.
+    ``connect`` returns a new database connection; app.py wires it to get_db()."""
+
+    def __init__(self):
+        self.connect = None
+        self.translator = None
+        self.jobs = queue.Queue()
+        self.pending = set()
+        self.lock = threading.Lock()
+        self._pid = None
+
+    def configure(self, backend):
+        """Select a backend by name; None disables translation"""
+        self.translator = BACKENDS[backend]() if backend else None
+
+    def enqueue(self, texts, source, target):
+        if source == target or self.translator is None:
+            return
+        self._ensure_worker()
+        with self.lock:
+            for text in texts:
+                key = (content_hash(text), target)
+                if text and key not in self.pending:
+                    self.pending.add(key)
+                    self.jobs.put((text, source, target))
+
+    def depth(self):
+        return self.jobs.qsize()
+
+    def _ensure_worker(self):
+        if self._pid == os.getpid():
+            return
+        with self.lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self.jobs, self.pending = queue.Queue(), set()
+                threading.Thread(target=self._run, name='translation-worker', daemon=True).start()
+
+    def _run(self):
+        while True:
+            batch = [self.jobs.get()]
+            while len(batch) < BATCH_SIZE:
+                try:
+                    batch.append(self.jobs.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self.process(batch)
+            except Exception:
+                logger.exception('translation batch failed')
+                time.sleep(1)
+            finally:
+                with self.lock:
+                    self.pending.difference_update((content_hash(text), target) for text, _, target in batch)
+
+    def process(self, batch):
+        """Translate and store a batch of (text, source, target) jobs"""
+        translator = self.translator
+        if translator is None:
+            return 0
+        groups = {}
+        for text, source, target in batch:
+            groups.setdefault((source, target), []).append(text)
+        conn = self.connect()
+        try:
+            rows = []
+            for (source, target), texts in groups.items():
+                found = lookup(conn.cursor(), texts, target)
+                missing = list(dict.fromkeys(text for text in texts if text not in found))
+                if not missing:
+                    continue
+                try:
+                    translated = translator.translate(missing, source, target)
+                except Exception:
+                    metrics.registry.inc('translations_total', (('backend', translator.name), ('outcome', 'error')),
+                                         len(missing))
+                    raise
+                metrics.registry.inc('translations_total', (('backend', translator.name), ('outcome', 'ok')),
+                                     len(missing))
+                rows.extend((content_hash(text), target, source, result, translator.name)
+                            for text, result in zip(missing, translated))
+            conn.executemany('''
+                INSERT OR IGNORE INTO translations (content_hash, target, source, text, backend)
+                VALUES (?, ?, ?, ?, ?)
+            ''', rows)
+            conn.commit()
+        finally:
+            conn.close()
+        return len(rows)
+
+
+def source_language(row, fields):
+    """The row's language column, else detected from its text"""
+    if 'language' in row.keys() and row['language']:
+        return row['language']
+    return detect_language(' '.join(row[field] or '' for field in fields))
+
+
+def enqueue_content(texts, source):
+    """Queue new content for translation into every other language"""
+    for target in LANGUAGES:
+        translation_queue.enqueue(texts, source, target)
+
+
+def translate_backlog(conn, batch_size=200):
+    """Synchronously fill translation memory for all existing content;
+    returns the number of translations written"""
+    cursor = conn.cursor()
+    jobs = []
+    for table, fields in CONTENT.items():
+        cursor.execute(f'SELECT * FROM {table}')
+        for row in cursor.fetchall():
+            source = source_language(row, fields)
+            jobs.extend((row[field], source, target) for field in fields if row[field]
+                        for target in LANGUAGES if target != source)
+    written = 0
+    for start in range(0, len(jobs), batch_size):
+        written += translation_queue.process(jobs[start:start + batch_size])
+    return written
+
+
+def localize(cursor, rows, fields, target):
+    """Swap ``fields`` of dict rows for cached ``target`` translations.
+
+    Rows whose fields are all cached come back translated (``translated``
+    set); the rest come back unchanged and their texts are queued, so the
+    caller never waits on a translator.
+    """
+    sources = [source_language(row, fields) for row in rows]
+    texts = [row[field] for row, source in zip(rows, sources) if source != target for field in fields if row[field]]
+    found = lookup(cursor, texts, target)
+    missing = {}
+    for row, source in zip(rows, sources):
+        row['translated'] = False
+        if source == target:
+            continue
+        values = [row[field] for field in fields if row[field]]
+        if all(value in found for value in values):
+            for field in fields:
+                if row[field]:
+                    row[field] = found[row[field]]
+            row['translated'] = True
+        else:
+            missing.setdefault(source, []).extend(value for value in values if value not in found)
+    for source, texts in missing.items():
+        translation_queue.enqueue(texts, source, target)
+    return rows
+
+
+translation_queue = TranslationQueue()
+metrics.registry.gauge_callback('translation_queue_depth', translation_queue.depth)
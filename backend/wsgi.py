@@ -0,0 +1,9 @@
+"""
+AgriSmart 2.0 - WSGI entry point
+Used by Vercel and WSGI servers; run `flask --app app init-db` once to create the schema
+(set AUTO_INIT_DB=1 to create it on the first request instead)
+"""
+
+from app import create_app
+
+app = create_app()